@@ -2,7 +2,13 @@ import os
 import pickle
 import json
 import requests
+from http_client import http, HTTP_RETRIES
+from github_star_lists import get_star_lists_by_repo_id
+from deploy_hook import DeployCoordinator
 import base64
+import time
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 # Conditional import for dotenv
 try:
     from dotenv import load_dotenv
@@ -14,6 +20,9 @@ from pathlib import Path
 try:
     import psycopg2
     from psycopg2.extras import execute_values, Json
+    from psycopg2.pool import ThreadedConnectionPool
+    from db_sync import reconcile, fingerprint, upsert_counts, format_counts, load_sync_state, save_sync_state
+    from sync_runner import run_sources, print_timings
     HAS_PSYCOPG2 = True
 except ModuleNotFoundError:
     HAS_PSYCOPG2 = False
@@ -59,22 +68,6 @@ X_CLIENT_SECRET = os.getenv("X_CLIENT_SECRET")
 X_REFRESH_TOKEN = os.getenv("X_REFRESH_TOKEN")
 X_TOKEN_URL = "https://api.x.com/2/oauth2/token"
 
-def trigger_vercel_deploy(hook_url):
-    if not hook_url:
-        print("Info: VERCEL_DEPLOY_HOOK_URL not set. Skipping Vercel build trigger.", file=sys.stderr)
-        return
-    try:
-        print(f"Attempting to trigger Vercel deploy hook: {hook_url[:30]}... (URL truncated for safety)")
-        response = requests.post(hook_url) # No data/payload needed for Vercel deploy hooks
-        response.raise_for_status() # Raises an HTTPError for bad responses (4XX or 5XX)
-        print(f"Vercel deploy hook triggered successfully. Status: {response.status_code}")
-        # Example response from Vercel: {"job": {"id": "...", "state": "PENDING", "createdAt": ...}}
-        print(f"Vercel response: {response.json()}")
-    except requests.exceptions.RequestException as e:
-        print(f"Error triggering Vercel deploy hook: {e}", file=sys.stderr)
-    except json.JSONDecodeError as e:
-        print(f"Error decoding Vercel deploy hook response: {e}. Response text: {response.text[:200]}", file=sys.stderr)
-
 def get_authenticated_service():
     client_id = os.environ.get("GOOGLE_CLIENT_ID")
     client_secret = os.environ.get("GOOGLE_CLIENT_SECRET")
@@ -136,22 +129,35 @@ def get_authenticated_service():
         print("Authentication successful using local files.")
         return build(API_SERVICE_NAME, API_VERSION, credentials=credentials)
 
-def get_liked_videos(youtube):
+# Partial response: only what get_liked_videos reads (the videoId is in snippet.resourceId, so contentDetails is not needed)
+LIKED_VIDEOS_FIELDS = ("nextPageToken,items/snippet(title,videoOwnerChannelId,videoOwnerChannelTitle,publishedAt,"
+                       "resourceId/videoId,thumbnails(default/url,medium/url,high/url))")
+
+def get_liked_videos(youtube, known_urls=None):
+    """
+    Pages the "LL" playlist, most recently liked first. With known_urls, stops after the first page
+    holding an already-synced video, since everything past it is older.
+    Returns (videos, complete, quota units used); each playlistItems.list call costs 1 unit.
+    """
     liked_videos = []
     next_page_token = None
+    calls = 0
     while True:
         request = youtube.playlistItems().list(
-            part="snippet,contentDetails",
+            part="snippet",
             playlistId="LL",
             maxResults=50,
-            pageToken=next_page_token
+            pageToken=next_page_token,
+            fields=LIKED_VIDEOS_FIELDS
         )
-        response = request.execute()
+        # googleapiclient has its own httplib2 transport; num_retries gives it the same retry policy
+        response = request.execute(num_retries=HTTP_RETRIES)
+        calls += 1
+        reached_known = False
         for item in response.get("items", []):
             snippet = item.get("snippet", {})
-            content_details = item.get("contentDetails", {})
             thumbnails = snippet.get("thumbnails", {})
-            video_id = content_details.get("videoId")
+            video_id = snippet.get("resourceId", {}).get("videoId")
             video_title = snippet.get("title", "No Title")
             video_url = f"https://www.youtube.com/watch?v={video_id}" if video_id else "No URL"
             video_owner_channel_id = snippet.get("videoOwnerChannelId", "No Owner Channel ID")
@@ -169,12 +175,35 @@ def get_liked_videos(youtube):
                     "published_at": published_at,
                     "thumbnail_url": thumbnail_url
                 })
+                reached_known = reached_known or (known_urls is not None and video_url in known_urls)
         next_page_token = response.get("nextPageToken")
+        if reached_known and next_page_token:
+            print("Reached liked videos already synced; stopping.")
+            return liked_videos, False, calls
         if not next_page_token:
             break # Exit the loop if there are no more pages
-    return liked_videos
+    return liked_videos, True, calls
 
-def get_github_stars(username, token):
+def parse_iso_time(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
+
+def full_sync_due(state, days):
+    """True with --full, or when the last full pass saved in `state` is missing or `days` old."""
+    last_full = parse_iso_time(state.get('last_full'))
+    return '--full' in sys.argv or last_full is None or datetime.now(timezone.utc) - last_full >= timedelta(days=days)
+
+def get_github_stars(username, token, stop_at=None, pages=None):
+    """
+    Pages the user's stars newest first (sort=created). With stop_at, stops after the first page
+    that reaches a star at or before that time, since everything past it is already stored.
+
+    `pages` ({url: {'etag', 'repos', 'next'}}) is the page cache of the previous run: each page is
+    requested with If-None-Match, and a 304 reuses the cached page without counting against the
+    rate limit. Returns (repos, complete, pages seen this run); complete is False after a stop.
+    """
+    pages = pages or {}
+    seen_pages = {}
+    not_modified = 0
     all_repos = []
     url = f"https://api.github.com/users/{username}/starred?per_page=100&sort=created&direction=desc"
     headers = {
@@ -187,39 +216,47 @@ def get_github_stars(username, token):
     while url:
         try:
             print(f"Fetching GitHub stars page: {url}")
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            page_data = response.json()
-            if not isinstance(page_data, list):
-                print(f"Warning: Expected a list but got {type(page_data)}. Stopping pagination.", file=sys.stderr)
-                break
-            for repo_raw in page_data:
-                repo_minimal = {
-                    "id": repo_raw.get("repo", {}).get("id"),
-                    "full_name": repo_raw.get("repo", {}).get("full_name"),
-                    "html_url": repo_raw.get("repo", {}).get("html_url"),
-                    "description": repo_raw.get("repo", {}).get("description"),
-                    "language": repo_raw.get("repo", {}).get("language"),
-                    "stargazers_count": repo_raw.get("repo", {}).get("stargazers_count"),
-                    "forks_count": repo_raw.get("repo", {}).get("forks_count"),
-                    "pushed_at": repo_raw.get("repo", {}).get("pushed_at"),
-                    "owner": {
-                        "login": repo_raw.get("repo", {}).get("owner", {}).get("login"),
-                        "avatar_url": repo_raw.get("repo", {}).get("owner", {}).get("avatar_url")
-                    },
-                    "starred_at": repo_raw.get("starred_at")
-                }
-                if repo_minimal["id"] and repo_minimal["html_url"]:
-                     all_repos.append(repo_minimal)
-                else:
-                    print(f"Warning: Skipping repo due to missing id or html_url. Raw data snippet: {str(repo_raw)[:200]}...", file=sys.stderr)
-
-            if 'Link' in response.headers:
-                links = requests.utils.parse_header_links(response.headers['Link'])
-                next_link = next((link['url'] for link in links if link.get('rel') == 'next'), None)
-                url = next_link
+            cached = pages.get(url)
+            request_headers = dict(headers, **({"If-None-Match": cached["etag"]} if cached else {}))
+            response = http.get(url, headers=request_headers)
+            if response.status_code == 304 and cached:
+                not_modified += 1
+                page_repos, next_link = cached["repos"], cached["next"]
+                seen_pages[url] = cached
             else:
-                url = None
+                response.raise_for_status()
+                page_data = response.json()
+                if not isinstance(page_data, list):
+                    print(f"Warning: Expected a list but got {type(page_data)}. Stopping pagination.", file=sys.stderr)
+                    break
+                page_repos = []
+                for repo_raw in page_data:
+                    repo_minimal = {
+                        "id": repo_raw.get("repo", {}).get("id"),
+                        "full_name": repo_raw.get("repo", {}).get("full_name"),
+                        "html_url": repo_raw.get("repo", {}).get("html_url"),
+                        "description": repo_raw.get("repo", {}).get("description"),
+                        "language": repo_raw.get("repo", {}).get("language"),
+                        "stargazers_count": repo_raw.get("repo", {}).get("stargazers_count"),
+                        "forks_count": repo_raw.get("repo", {}).get("forks_count"),
+                        "pushed_at": repo_raw.get("repo", {}).get("pushed_at"),
+                        "owner": {
+                            "login": repo_raw.get("repo", {}).get("owner", {}).get("login"),
+                            "avatar_url": repo_raw.get("repo", {}).get("owner", {}).get("avatar_url")
+                        },
+                        "starred_at": repo_raw.get("starred_at")
+                    }
+                    if repo_minimal["id"] and repo_minimal["html_url"]:
+                         page_repos.append(repo_minimal)
+                    else:
+                        print(f"Warning: Skipping repo due to missing id or html_url. Raw data snippet: {str(repo_raw)[:200]}...", file=sys.stderr)
+
+                next_link = None
+                if 'Link' in response.headers:
+                    links = requests.utils.parse_header_links(response.headers['Link'])
+                    next_link = next((link['url'] for link in links if link.get('rel') == 'next'), None)
+                if response.headers.get('ETag'):
+                    seen_pages[url] = {"etag": response.headers['ETag'], "repos": page_repos, "next": next_link}
         except requests.exceptions.RequestException as e:
             print(f"Error during GitHub API request: {e}", file=sys.stderr)
             raise
@@ -227,14 +264,23 @@ def get_github_stars(username, token):
             print(f"Error decoding JSON response from GitHub: {e}", file=sys.stderr)
             print(f"Response content: {response.text[:500]}...", file=sys.stderr)
             raise
-    return all_repos
+
+        all_repos.extend(page_repos)
+        if stop_at and any(parse_iso_time(r.get("starred_at")) <= stop_at for r in page_repos if r.get("starred_at")):
+            print(f"Reached stars already synced (starred at or before {stop_at.isoformat()}); stopping.")
+            break
+        url = next_link
+    if not_modified:
+        print(f"{not_modified} GitHub stars pages unchanged since the last run (304, not counted against the rate limit).")
+    return all_repos, url is None, seen_pages
 
 def get_github_star_lists_by_repo_id(username, token):
     """
     Build a map of REST repo id (GitHub databaseId) -> Star List names for that user.
 
     The REST API for starred repos does not include GitHub "Stars lists" membership.
-    That data is only available via the GraphQL API (UserList / Repository).
+    That data is only available via the GraphQL API (UserList / Repository), fetched with
+    batched, concurrent queries by github_star_lists.py.
 
     Returns:
         dict[int, list[str]] on success (may be empty if the user has no lists).
@@ -247,121 +293,7 @@ def get_github_star_lists_by_repo_id(username, token):
         )
         return None
 
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-    }
-    endpoint = "https://api.github.com/graphql"
-    repo_to_lists = {}
-
-    lists_query = """
-    query ($login: String!, $after: String) {
-      user(login: $login) {
-        lists(first: 50, after: $after) {
-          pageInfo {
-            hasNextPage
-            endCursor
-          }
-          nodes {
-            id
-            name
-          }
-        }
-      }
-    }
-    """
-
-    items_query = """
-    query ($id: ID!, $after: String) {
-      node(id: $id) {
-        ... on UserList {
-          items(first: 100, after: $after) {
-            pageInfo {
-              hasNextPage
-              endCursor
-            }
-            nodes {
-              ... on Repository {
-                databaseId
-              }
-            }
-          }
-        }
-      }
-    }
-    """
-
-    lists_after = None
-    try:
-        while True:
-            r = requests.post(
-                endpoint,
-                json={"query": lists_query, "variables": {"login": username, "after": lists_after}},
-                headers=headers,
-                timeout=90,
-            )
-            r.raise_for_status()
-            payload = r.json()
-            if payload.get("errors"):
-                print(
-                    f"GitHub GraphQL (lists) errors: {payload['errors']}",
-                    file=sys.stderr,
-                )
-                return None
-            user_data = (payload.get("data") or {}).get("user")
-            if not user_data:
-                print("GitHub GraphQL: user not found or lists unavailable.", file=sys.stderr)
-                return None
-            conn = user_data.get("lists") or {}
-            for node in conn.get("nodes") or []:
-                list_id = node.get("id")
-                list_name = node.get("name")
-                if not list_id or not list_name:
-                    continue
-                items_after = None
-                while True:
-                    r2 = requests.post(
-                        endpoint,
-                        json={
-                            "query": items_query,
-                            "variables": {"id": list_id, "after": items_after},
-                        },
-                        headers=headers,
-                        timeout=90,
-                    )
-                    r2.raise_for_status()
-                    payload2 = r2.json()
-                    if payload2.get("errors"):
-                        print(
-                            f"GitHub GraphQL (list items) errors: {payload2['errors']}",
-                            file=sys.stderr,
-                        )
-                        return None
-                    node_data = (payload2.get("data") or {}).get("node") or {}
-                    items_conn = node_data.get("items") or {}
-                    for item in items_conn.get("nodes") or []:
-                        rid = item.get("databaseId")
-                        if rid is None:
-                            continue
-                        rid = int(rid)
-                        repo_to_lists.setdefault(rid, set()).add(list_name)
-                    pinfo = items_conn.get("pageInfo") or {}
-                    if pinfo.get("hasNextPage") and pinfo.get("endCursor"):
-                        items_after = pinfo["endCursor"]
-                    else:
-                        break
-
-            lp = conn.get("pageInfo") or {}
-            if lp.get("hasNextPage") and lp.get("endCursor"):
-                lists_after = lp["endCursor"]
-            else:
-                break
-    except requests.exceptions.RequestException as e:
-        print(f"GitHub GraphQL request failed: {e}", file=sys.stderr)
-        return None
-
-    # sorted stable output for DB / diffs
-    return {k: sorted(v) for k, v in repo_to_lists.items()}
+    return get_star_lists_by_repo_id(username, token)
 
 def update_env_file(key, value):
     """Updates or adds a key-value pair in the root .env file."""
@@ -406,7 +338,7 @@ def refresh_x_token():
         "client_id": X_CLIENT_ID
     }
     
-    resp = requests.post(X_TOKEN_URL, headers=headers, data=data)
+    resp = http.post(X_TOKEN_URL, headers=headers, data=data)
     if resp.status_code == 200:
         new_token_data = resp.json()
         new_refresh = new_token_data.get("refresh_token")
@@ -425,28 +357,75 @@ def refresh_x_token():
         print(f"Error refreshing X token: {resp.text}", file=sys.stderr)
         return None
 
-def fetch_latest_x_timeline(url, access_token, max_results=50):
+def wait_for_x_reset(resp):
+    """Sleeps until the x-rate-limit-reset of `resp`; False (not slept) if that is more than X_RATE_LIMIT_MAX_WAIT away."""
+    reset = resp.headers.get("x-rate-limit-reset")
+    delay = max(float(reset) - time.time(), 0) + 1 if reset else 60
+    if delay > X_RATE_LIMIT_MAX_WAIT:
+        print(f"X rate limit resets in {delay:.0f}s, longer than X_RATE_LIMIT_MAX_WAIT; stopping here.", file=sys.stderr)
+        return False
+    print(f"X rate limit reached; waiting {delay:.0f}s for the window to reset.")
+    time.sleep(delay)
+    return True
+
+def fetch_x_timeline(url, access_token, since_id=None, stop_ids=()):
+    """
+    Pages an X timeline newest first, X_PAGE_SIZE tweets per request. Stops at the end, or after the
+    page holding since_id's successor (the API filters with since_id where it supports it) or any of
+    `stop_ids`, tweets already synced from this timeline. When the rate-limit window is spent it
+    waits for x-rate-limit-reset, up to X_RATE_LIMIT_MAX_WAIT.
+
+    Returns (tweets, newest id seen, complete); complete is False if paging was cut short by an
+    error or rate limit, in which case the caller must not advance its watermark.
+    """
     headers = {"Authorization": f"Bearer {access_token}"}
     params = {
-        "max_results": max_results,
+        "max_results": X_PAGE_SIZE,
         "tweet.fields": "created_at,text,public_metrics,entities,referenced_tweets",
         "expansions": "author_id",
         "user.fields": "name,username"
     }
-    resp = requests.get(url, headers=headers, params=params)
-    if resp.status_code == 200:
-        return resp.json().get("data", [])
-    else:
-        print(f"Error fetching X timeline: {resp.text}", file=sys.stderr)
-        return []
+    if since_id:
+        params["since_id"] = since_id
+    tweets = []
+    newest_id = None
+    while True:
+        resp = http.get(url, headers=headers, params=params)
+        if resp.status_code == 429:
+            if wait_for_x_reset(resp):
+                continue
+            return tweets, newest_id, False
+        if resp.status_code != 200:
+            print(f"Error fetching X timeline: {resp.text}", file=sys.stderr)
+            return tweets, newest_id, False
+        body = resp.json()
+        page = body.get("data", [])
+        meta = body.get("meta", {})
+        # Only the user tweets timeline reports meta.newest_id; liked_tweets and bookmarks return just
+        # result_count and next_token, so fall back to the first tweet fetched (pages are newest first)
+        if newest_id is None:
+            newest_id = meta.get("newest_id") or (page[0].get("id") if page else None)
+        tweets.extend(page)
+        next_token = meta.get("next_token")
+        if not next_token or any(t.get("id") in stop_ids for t in page):
+            return tweets, newest_id, True
+        params["pagination_token"] = next_token
+        if resp.headers.get("x-rate-limit-remaining") == "0" and not wait_for_x_reset(resp):
+            return tweets, newest_id, False
 
 def update_x_tweets_to_db(cur, new_tweets, is_bookmark=False, is_like=False, is_retweet=False):
+    """Upserts tweets, skipping those whose content and flags are unchanged. Returns db_sync.upsert_counts."""
     if not new_tweets:
-        return 0, 0
+        return upsert_counts([], 0)
     
     tuples = []
+    seen_ids = set()
     for tweet in new_tweets:
         tweet_id = str(tweet.get("id"))
+        # Paged timelines can repeat a tweet; one upsert statement may touch each row only once
+        if tweet_id in seen_ids:
+            continue
+        seen_ids.add(tweet_id)
         
         # Extract author_id
         # For retweets, we prefer the original author's ID if possible (matching import-retweets.js logic)
@@ -477,18 +456,21 @@ def update_x_tweets_to_db(cur, new_tweets, is_bookmark=False, is_like=False, is_
         
         entities = tweet.get("entities", {})
         
+        edit_history = edit_history if isinstance(edit_history, list) else [edit_history]
+        # The flags are OR-ed into the stored row, so they are compared on their own rather than hashed
+        content_hash = fingerprint((author_id, text, created_at, edit_history, retweet_count, reply_count, like_count,
+                                    quote_count, bookmark_count, impression_count, article_title, entities))
         tuples.append((
-            tweet_id, is_bookmark, is_like, is_retweet, author_id, text, created_at,
-            edit_history if isinstance(edit_history, list) else [edit_history],
+            tweet_id, is_bookmark, is_like, is_retweet, author_id, text, created_at, edit_history,
             retweet_count, reply_count, like_count, quote_count, bookmark_count,
-            impression_count, article_title, Json(entities)
+            impression_count, article_title, Json(entities), content_hash
         ))
         
     query = """
         INSERT INTO x_tweets (
             id, is_bookmark, is_like, is_retweet, author_id, text, created_at, edit_history_tweet_ids,
             retweet_count, reply_count, like_count, quote_count, bookmark_count, impression_count,
-            article_title, entities
+            article_title, entities, content_hash
         ) VALUES %s
         ON CONFLICT (id) DO UPDATE SET
             is_bookmark = x_tweets.is_bookmark OR EXCLUDED.is_bookmark,
@@ -505,20 +487,284 @@ def update_x_tweets_to_db(cur, new_tweets, is_bookmark=False, is_like=False, is_
             bookmark_count = EXCLUDED.bookmark_count,
             impression_count = EXCLUDED.impression_count,
             article_title = EXCLUDED.article_title,
-            entities = EXCLUDED.entities
+            entities = EXCLUDED.entities,
+            content_hash = EXCLUDED.content_hash
+        WHERE x_tweets.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+           OR (EXCLUDED.is_bookmark AND NOT x_tweets.is_bookmark)
+           OR (EXCLUDED.is_like AND NOT x_tweets.is_like)
+           OR (EXCLUDED.is_retweet AND NOT x_tweets.is_retweet)
         RETURNING (xmax = 0);
     """
     results = execute_values(cur, query, tuples, fetch=True)
-    
-    synced = 0
-    updated = 0
-    for res in results:
-        if res[0]:
-            synced += 1
+    return upsert_counts(results, len(tuples))
+
+# Sources run concurrently (one thread each); they write through a pool of at most DB_POOL_SIZE connections
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "3"))
+# X timelines are paged back to the newest tweet of the previous run (kept in sync_state), so the
+# sync runs daily; a rate-limit window is waited out if it resets within X_RATE_LIMIT_MAX_WAIT seconds
+X_PAGE_SIZE = 100
+X_RATE_LIMIT_MAX_WAIT = float(os.getenv("X_RATE_LIMIT_MAX_WAIT", "900"))
+# Between full passes GitHub stars are fetched incrementally, which cannot see unstars or metadata
+# drift (stargazers_count, description...); a full pass runs at least this often, or with --full
+GITHUB_FULL_SYNC_DAYS = float(os.getenv("GITHUB_FULL_SYNC_DAYS", "7"))
+# Likewise liked videos are fetched up to the first known one; the full pass also finds unlikes
+YOUTUBE_FULL_SYNC_DAYS = float(os.getenv("YOUTUBE_FULL_SYNC_DAYS", "7"))
+
+
+def prepare_youtube(cur):
+    state = load_sync_state(cur, 'liked_videos')
+    cur.execute("SELECT url FROM liked_videos")
+    return state, {row[0] for row in cur.fetchall()}
+
+
+def fetch_youtube(prepared):
+    """
+    Returns the liked videos, whether the playlist was read in full, and the sync state to save,
+    or None (skipped, so nothing is deleted) when YouTube auth fails.
+    """
+    state, known_urls = prepared
+    full = not known_urls or full_sync_due(state, YOUTUBE_FULL_SYNC_DAYS)
+    youtube_service = get_authenticated_service()
+    if not youtube_service:
+        print("Failed to get authenticated YouTube service. Skipping YouTube sync.", file=sys.stderr)
+        return None
+    print(f"YouTube authentication successful. Fetching liked videos ({'full pass' if full else 'new likes only'})...")
+    videos, complete, quota = get_liked_videos(youtube_service, known_urls=None if full else known_urls)
+    print(f"Found {len(videos)} liked videos from API. YouTube quota used: {quota} units.")
+    if complete:
+        state = dict(state, last_full=datetime.now(timezone.utc).isoformat())
+    return videos, complete, state
+
+
+def write_youtube(conn, data):
+    videos, complete, state = data
+    cur = conn.cursor()
+    counts = upsert_counts([], 0)
+    video_data_tuples = []
+    for video in videos:
+        if video.get('url') == "No URL":
+            print(f"Skipping video due to missing URL: {video.get('title')}", file=sys.stderr)
+            continue
+        published_at_dt = video.get("published_at")
+        if published_at_dt == "No Date": published_at_dt = None
+        thumbnail_url_val = video.get("thumbnail_url")
+        if thumbnail_url_val == "No Thumbnail": thumbnail_url_val = None
+        values = (
+            video.get("title", "No Title"),
+            video.get("url"),
+            video.get("video_owner_channel_id"),
+            video.get("video_owner_channel_title"),
+            published_at_dt,
+            thumbnail_url_val
+        )
+        video_data_tuples.append(values + (fingerprint(values),))
+    if video_data_tuples:
+        sql_youtube_upsert = """
+            INSERT INTO liked_videos (title, url, video_owner_channel_id, video_owner_channel_title, published_at, thumbnail_url, content_hash)
+            VALUES %s
+            ON CONFLICT (url) DO UPDATE SET
+                title = EXCLUDED.title,
+                video_owner_channel_id = EXCLUDED.video_owner_channel_id,
+                video_owner_channel_title = EXCLUDED.video_owner_channel_title,
+                published_at = EXCLUDED.published_at,
+                thumbnail_url = EXCLUDED.thumbnail_url,
+                content_hash = EXCLUDED.content_hash,
+                updated_at = now()
+            WHERE liked_videos.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+            RETURNING (xmax = 0);
+        """
+        results = execute_values(cur, sql_youtube_upsert, video_data_tuples, fetch=True)
+        counts = upsert_counts(results, len(video_data_tuples))
+        conn.commit()
+        print(f"YouTube liked videos upsert complete: {format_counts(counts)}.")
+    elif videos:
+        print("No valid YouTube video data to upsert after filtering.")
+
+    deleted = 0
+    if complete:
+        current_urls = {video['url'] for video in videos if video.get('url') != "No URL"}
+        deleted = reconcile(cur, 'liked_videos', 'url', current_urls)
+        if deleted:
+            print(f"Deletion of YouTube videos complete. Deleted: {deleted}.")
         else:
-            updated += 1
-            
-    return synced, updated
+            print("No YouTube videos to delete. Database is in sync with API or API returned no items.")
+    save_sync_state(cur, 'liked_videos', state)
+    return [("YouTube Liked Videos", counts, deleted)]
+
+
+def prepare_github(cur):
+    state = load_sync_state(cur, 'github_stars')
+    cur.execute("SELECT max(starred_at) FROM github_stars")
+    return state, cur.fetchone()[0]
+
+
+def fetch_github(username, token, prepared):
+    """
+    Returns the starred repos, the star lists by repo id (or None), whether the stars were read in
+    full, and the sync state to save. The REST and GraphQL calls run side by side.
+    """
+    state, latest_starred_at = prepared
+    full = latest_starred_at is None or full_sync_due(state, GITHUB_FULL_SYNC_DAYS)
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix='github') as executor:
+        lists_future = executor.submit(get_github_star_lists_by_repo_id, username, token)
+        print(f"Fetching GitHub starred repositories ({'full pass' if full else 'new stars only'}) and Star Lists (GraphQL)...")
+        repos, complete, pages = get_github_stars(username, token, stop_at=None if full else latest_starred_at,
+                                                  pages=state.get('pages'))
+        star_lists_by_repo = lists_future.result()
+    if complete:
+        state = {'last_full': datetime.now(timezone.utc).isoformat(), 'pages': pages}
+    else:
+        state = dict(state, pages={**state.get('pages', {}), **pages})
+    print(f"Found {len(repos)} starred repositories from API.")
+    if star_lists_by_repo is not None:
+        print(f"Star Lists: mapped {len(star_lists_by_repo)} repositories to at least one list.")
+    else:
+        print(
+            "Star Lists: GraphQL fetch failed or skipped; existing star_list_names preserved on update.",
+            file=sys.stderr,
+        )
+    return repos, star_lists_by_repo, complete, state
+
+
+def write_github(conn, data):
+    repos, star_lists_by_repo, complete, state = data
+    cur = conn.cursor()
+    counts = upsert_counts([], 0)
+    repo_data_tuples = []
+    for repo in repos:
+        if not repo.get('id'):
+            print(f"Skipping repository due to missing ID: {repo.get('full_name')}", file=sys.stderr)
+            continue
+        rid = repo.get("id")
+        list_names = None
+        if star_lists_by_repo is not None:
+            list_names = star_lists_by_repo.get(rid, [])
+        values = (
+            rid, repo.get("full_name"), repo.get("html_url"),
+            repo.get("description"), repo.get("language"), repo.get("stargazers_count"),
+            repo.get("forks_count"), repo.get("pushed_at"), repo.get("owner", {}).get("login"),
+            repo.get("owner", {}).get("avatar_url"), repo.get("starred_at"),
+        )
+        # star_list_names is merged (kept when the lists fetch failed), so it is compared on its own
+        repo_data_tuples.append(values + (list_names, fingerprint(values)))
+    if repo_data_tuples:
+        sql_github_upsert = """
+            INSERT INTO github_stars (repo_id, full_name, html_url, description, language,
+                                    stargazers_count, forks_count, pushed_at, owner_login,
+                                    owner_avatar_url, starred_at, star_list_names, content_hash)
+            VALUES %s
+            ON CONFLICT (repo_id) DO UPDATE SET
+                full_name = EXCLUDED.full_name, html_url = EXCLUDED.html_url,
+                description = EXCLUDED.description, language = EXCLUDED.language,
+                stargazers_count = EXCLUDED.stargazers_count, forks_count = EXCLUDED.forks_count,
+                pushed_at = EXCLUDED.pushed_at, owner_login = EXCLUDED.owner_login,
+                owner_avatar_url = EXCLUDED.owner_avatar_url, starred_at = EXCLUDED.starred_at,
+                star_list_names = COALESCE(EXCLUDED.star_list_names, github_stars.star_list_names),
+                content_hash = EXCLUDED.content_hash
+            WHERE github_stars.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+               OR (EXCLUDED.star_list_names IS NOT NULL
+                   AND EXCLUDED.star_list_names IS DISTINCT FROM github_stars.star_list_names)
+            RETURNING (xmax = 0);
+        """
+        results = execute_values(cur, sql_github_upsert, repo_data_tuples, fetch=True)
+        counts = upsert_counts(results, len(repo_data_tuples))
+        conn.commit()
+        print(f"GitHub starred repositories upsert complete: {format_counts(counts)}.")
+    elif repos:
+        print("No valid GitHub repository data to upsert after filtering.")
+
+    deleted = 0
+    if complete:
+        current_repo_ids = {repo['id'] for repo in repos if repo.get('id')}
+        deleted = reconcile(cur, 'github_stars', 'repo_id', current_repo_ids, key_type='bigint')
+        if deleted:
+            print(f"Deletion of GitHub repos complete. Deleted: {deleted}.")
+        else:
+            print("No GitHub repos to delete. Database is in sync with API or API returned no items.")
+    elif star_lists_by_repo is not None:
+        # The upsert only saw the newest stars; list membership of the older ones may have changed too
+        cur.execute("""
+            UPDATE github_stars AS g
+            SET star_list_names = l.names
+            FROM (SELECT s.repo_id, ARRAY(SELECT jsonb_array_elements_text(m.value)) AS names
+                  FROM github_stars AS s LEFT JOIN jsonb_each(%s::jsonb) AS m ON m.key = s.repo_id::text) AS l
+            WHERE g.repo_id = l.repo_id AND g.star_list_names IS DISTINCT FROM l.names
+        """, (Json({str(rid): names for rid, names in star_lists_by_repo.items()}),))
+        if cur.rowcount:
+            print(f"Star Lists changed for {cur.rowcount} previously synced repositories.")
+        counts['changed'] += cur.rowcount
+        counts['touched'] += cur.rowcount
+    save_sync_state(cur, 'github_stars', state)
+    return [("GitHub Starred Repos", counts, deleted)]
+
+
+def prepare_x(cur):
+    """The saved newest id per timeline, and the ids already stored from each (to stop paging at)."""
+    state = load_sync_state(cur, 'x_tweets')
+    cur.execute("SELECT id, is_bookmark, is_like, is_retweet FROM x_tweets")
+    known = {'bookmarks': set(), 'likes': set(), 'tweets': set()}
+    for tweet_id, is_bookmark, is_like, is_retweet in cur.fetchall():
+        for timeline, flag in (('bookmarks', is_bookmark), ('likes', is_like), ('tweets', is_retweet)):
+            if flag:
+                known[timeline].add(tweet_id)
+    return state, known
+
+
+def fetch_x(prepared):
+    """
+    Returns {'bookmarks', 'likes', 'retweets', 'state'} with what is new on each timeline since the
+    last run (fetched concurrently), or None if X is unavailable. A timeline's watermark only
+    advances when it was paged back to the previous one.
+    """
+    state, known = prepared
+    access_token = refresh_x_token()
+    if not access_token:
+        return None
+    me_resp = http.get("https://api.x.com/2/users/me", headers={"Authorization": f"Bearer {access_token}"})
+    if me_resp.status_code != 200:
+        print(f"Error fetching X user info: {me_resp.text}", file=sys.stderr)
+        return None
+    x_user_id = me_resp.json()["data"]["id"]
+
+    print("Fetching new X Bookmarks, Likes and Retweets...")
+    urls = {
+        'bookmarks': f"https://api.x.com/2/users/{x_user_id}/bookmarks",
+        'likes': f"https://api.x.com/2/users/{x_user_id}/liked_tweets",
+        'tweets': f"https://api.x.com/2/users/{x_user_id}/tweets",
+    }
+    with ThreadPoolExecutor(max_workers=len(urls), thread_name_prefix='x') as executor:
+        futures = {}
+        for key, url in urls.items():
+            watermark = state.get(key)
+            # Only the user tweets timeline accepts since_id; the others stop at the watermark tweet
+            futures[key] = executor.submit(fetch_x_timeline, url, access_token,
+                                           since_id=watermark if key == 'tweets' else None,
+                                           stop_ids=known[key] | ({watermark} if watermark else set()))
+        timelines = {}
+        new_state = dict(state)
+        for key, future in futures.items():
+            tweets, newest_id, complete = future.result()
+            timelines[key] = tweets
+            print(f"X {key}: {len(tweets)} tweets fetched{'' if complete else ' (incomplete; watermark kept)'}.")
+            if complete and newest_id:
+                new_state[key] = newest_id
+            elif complete:
+                print(f"X {key}: timeline finished without a newest tweet id; watermark kept at {state.get(key)}.")
+    retweets = [t for t in timelines['tweets'] if "referenced_tweets" in t and any(r["type"] == "retweeted" for r in t["referenced_tweets"])]
+    return {'bookmarks': timelines['bookmarks'], 'likes': timelines['likes'], 'retweets': retweets, 'state': new_state}
+
+
+def write_x(conn, timelines):
+    cur = conn.cursor()
+    bookmarks = update_x_tweets_to_db(cur, timelines['bookmarks'], is_bookmark=True, is_like=False, is_retweet=False)
+    print(f"X Bookmarks upsert complete: {format_counts(bookmarks)}.")
+    likes = update_x_tweets_to_db(cur, timelines['likes'], is_bookmark=False, is_like=True, is_retweet=False)
+    print(f"X Likes upsert complete: {format_counts(likes)}.")
+    retweets = update_x_tweets_to_db(cur, timelines['retweets'], is_bookmark=False, is_like=False, is_retweet=True)
+    print(f"X Retweets upsert complete: {format_counts(retweets)}.")
+    save_sync_state(cur, 'x_tweets', timelines['state'])
+    return [("X Bookmarks", bookmarks, None), ("X Likes", likes, None), ("X Retweets", retweets, None)]
+
 
 if __name__ == "__main__":
     if not HAS_PSYCOPG2:
@@ -529,291 +775,71 @@ if __name__ == "__main__":
         print("Error: Database credentials (SUPABASE_DB_HOST, SUPABASE_DB_PASSWORD) not set in environment variables.", file=sys.stderr)
         sys.exit(1)
 
-    conn = None
-    youtube_synced_count = 0
-    youtube_updated_count = 0
-    youtube_deleted_count = 0
-    github_synced_count = 0
-    github_updated_count = 0
-    github_deleted_count = 0
-    x_bookmarks_synced = 0
-    x_bookmarks_updated = 0
-    x_likes_synced = 0
-    x_likes_updated = 0
-    x_retweets_synced = 0
-    x_retweets_updated = 0
+    sources = {'YouTube': (fetch_youtube, write_youtube, prepare_youtube)}
 
+    github_user = os.environ.get("GH_USER")
+    github_token = os.environ.get("GH_TOKEN")
+    if not github_user:
+        print("\nError: GH_USER environment variable not set. Skipping GitHub sync.", file=sys.stderr)
+    else:
+        if not github_token: # Token is optional, but print warning
+            print("\nWarning: GH_TOKEN environment variable not set. API calls may be rate-limited or fail for private data.", file=sys.stderr)
+        sources['GitHub'] = (lambda prepared: fetch_github(github_user, github_token, prepared), write_github, prepare_github)
+
+    if not X_REFRESH_TOKEN:
+        print("Info: X_REFRESH_TOKEN not set in environment. Skipping X sync.", file=sys.stderr)
+    else:
+        sources['X'] = (fetch_x, write_x, prepare_x)
+
+    pool = None
+    results = []
+    started = time.perf_counter()
     try:
         print(f"Attempting to connect to database {DB_NAME} on {DB_HOST}:{DB_PORT}...")
-        conn = psycopg2.connect(
+        pool = ThreadedConnectionPool(
+            1, min(DB_POOL_SIZE, len(sources)),
             host=DB_HOST,
             dbname=DB_NAME,
             user=DB_USER,
             password=DB_PASSWORD,
             port=DB_PORT
         )
-        cur = conn.cursor()
         print("Successfully connected to the database.")
-
-        # --- YouTube Liked Videos ---
-        all_liked_videos_from_api = []
-        current_youtube_urls_from_api = set()
-        youtube_service_active = False
-        try:
-            youtube_service = get_authenticated_service()
-            if not youtube_service:
-                 print("Failed to get authenticated YouTube service. Skipping YouTube sync.", file=sys.stderr)
-            else:
-                youtube_service_active = True
-                print("YouTube authentication successful. Fetching liked videos...")
-                all_liked_videos_from_api = get_liked_videos(youtube_service)
-                print(f"Found {len(all_liked_videos_from_api)} liked videos from API.")
-                current_youtube_urls_from_api = {video['url'] for video in all_liked_videos_from_api if video.get('url') != "No URL"}
-
-                if all_liked_videos_from_api:
-                    video_data_tuples = []
-                    for video in all_liked_videos_from_api:
-                        if video.get('url') == "No URL":
-                            print(f"Skipping video due to missing URL: {video.get('title')}", file=sys.stderr)
-                            continue
-                        published_at_dt = video.get("published_at")
-                        if published_at_dt == "No Date": published_at_dt = None
-                        thumbnail_url_val = video.get("thumbnail_url")
-                        if thumbnail_url_val == "No Thumbnail": thumbnail_url_val = None
-                        video_data_tuples.append((
-                            video.get("title", "No Title"),
-                            video.get("url"),
-                            video.get("video_owner_channel_id"),
-                            video.get("video_owner_channel_title"),
-                            published_at_dt,
-                            thumbnail_url_val
-                        ))
-                    if video_data_tuples:
-                        sql_youtube_upsert = """
-                            INSERT INTO liked_videos (title, url, video_owner_channel_id, video_owner_channel_title, published_at, thumbnail_url)
-                            VALUES %s
-                            ON CONFLICT (url) DO UPDATE SET
-                                title = EXCLUDED.title,
-                                video_owner_channel_id = EXCLUDED.video_owner_channel_id,
-                                video_owner_channel_title = EXCLUDED.video_owner_channel_title,
-                                published_at = EXCLUDED.published_at,
-                                thumbnail_url = EXCLUDED.thumbnail_url
-                            RETURNING (xmax = 0);
-                        """
-                        results = execute_values(cur, sql_youtube_upsert, video_data_tuples, fetch=True)
-                        temp_synced = 0
-                        temp_updated = 0
-                        for result in results:
-                            if result[0]: temp_synced += 1
-                            else: temp_updated += 1
-                        youtube_synced_count = temp_synced
-                        youtube_updated_count = temp_updated
-                        conn.commit()
-                        print(f"YouTube liked videos upsert complete. Added: {youtube_synced_count}, Updated: {youtube_updated_count}.")
-                    else:
-                        print("No valid YouTube video data to upsert after filtering.")
-
-                if youtube_service_active:
-                    cur.execute("SELECT url FROM liked_videos")
-                    db_youtube_urls = {row[0] for row in cur.fetchall()}
-                    youtube_urls_to_delete = db_youtube_urls - current_youtube_urls_from_api
-
-                    if youtube_urls_to_delete:
-                        print(f"Found {len(youtube_urls_to_delete)} YouTube videos to delete from database.")
-                        deleted_this_batch = 0
-                        for url_to_delete in list(youtube_urls_to_delete): # Iterate over a copy
-                            cur.execute("DELETE FROM liked_videos WHERE url = %s", (url_to_delete,))
-                            deleted_this_batch += cur.rowcount
-                        if deleted_this_batch > 0:
-                            youtube_deleted_count = deleted_this_batch
-                            conn.commit()
-                            print(f"Deletion of YouTube videos complete. Deleted: {youtube_deleted_count}.")
-                        else:
-                            print("No YouTube videos were actually deleted (rowcount was 0 for all attempts or no items to delete).")
-                    else:
-                        print("No YouTube videos to delete. Database is in sync with API or API returned no items.")
-        except Exception as e_yt:
-            print(f"An error occurred during YouTube liked videos processing: {e_yt}", file=sys.stderr)
-            if conn: conn.rollback()
-
-        # --- GitHub Stars ---
-        all_starred_repos_from_api = []
-        current_github_repo_ids_from_api = set()
-        github_user = os.environ.get("GH_USER")
-        github_token = os.environ.get("GH_TOKEN")
-
-        if not github_user:
-            print("\nError: GH_USER environment variable not set. Skipping GitHub sync.", file=sys.stderr)
-        else:
-            if not github_token: # Token is optional, but print warning
-                print("\nWarning: GH_TOKEN environment variable not set. API calls may be rate-limited or fail for private data.", file=sys.stderr)
-            try:
-                print("\nFetching GitHub starred repositories...")
-                all_starred_repos_from_api = get_github_stars(github_user, github_token)
-                print(f"Found {len(all_starred_repos_from_api)} starred repositories from API.")
-                current_github_repo_ids_from_api = {repo['id'] for repo in all_starred_repos_from_api if repo.get('id')}
-
-                print("Fetching GitHub Star Lists (GraphQL)...")
-                star_lists_by_repo = get_github_star_lists_by_repo_id(github_user, github_token)
-                if star_lists_by_repo is not None:
-                    n = len(star_lists_by_repo)
-                    print(f"Star Lists: mapped {n} repositories to at least one list.")
-                else:
-                    print(
-                        "Star Lists: GraphQL fetch failed or skipped; existing star_list_names preserved on update.",
-                        file=sys.stderr,
-                    )
-
-                if all_starred_repos_from_api:
-                    repo_data_tuples = []
-                    for repo in all_starred_repos_from_api:
-                        if not repo.get('id'):
-                            print(f"Skipping repository due to missing ID: {repo.get('full_name')}", file=sys.stderr)
-                            continue
-                        rid = repo.get("id")
-                        list_names = None
-                        if star_lists_by_repo is not None:
-                            list_names = star_lists_by_repo.get(rid, [])
-                        repo_data_tuples.append((
-                            rid, repo.get("full_name"), repo.get("html_url"),
-                            repo.get("description"), repo.get("language"), repo.get("stargazers_count"),
-                            repo.get("forks_count"), repo.get("pushed_at"), repo.get("owner", {}).get("login"),
-                            repo.get("owner", {}).get("avatar_url"), repo.get("starred_at"),
-                            list_names,
-                        ))
-                    if repo_data_tuples:
-                        sql_github_upsert = """
-                            INSERT INTO github_stars (repo_id, full_name, html_url, description, language,
-                                                    stargazers_count, forks_count, pushed_at, owner_login,
-                                                    owner_avatar_url, starred_at, star_list_names)
-                            VALUES %s
-                            ON CONFLICT (repo_id) DO UPDATE SET
-                                full_name = EXCLUDED.full_name, html_url = EXCLUDED.html_url,
-                                description = EXCLUDED.description, language = EXCLUDED.language,
-                                stargazers_count = EXCLUDED.stargazers_count, forks_count = EXCLUDED.forks_count,
-                                pushed_at = EXCLUDED.pushed_at, owner_login = EXCLUDED.owner_login,
-                                owner_avatar_url = EXCLUDED.owner_avatar_url, starred_at = EXCLUDED.starred_at,
-                                star_list_names = COALESCE(EXCLUDED.star_list_names, github_stars.star_list_names)
-                            RETURNING (xmax = 0);
-                        """
-                        results = execute_values(cur, sql_github_upsert, repo_data_tuples, fetch=True)
-                        temp_synced = 0
-                        temp_updated = 0
-                        for result in results:
-                            if result[0]: temp_synced += 1
-                            else: temp_updated += 1
-                        github_synced_count = temp_synced
-                        github_updated_count = temp_updated
-                        conn.commit()
-                        print(f"GitHub starred repositories upsert complete. Added: {github_synced_count}, Updated: {github_updated_count}.")
-                    else:
-                        print("No valid GitHub repository data to upsert after filtering.")
-
-                # Deletion logic for GitHub (runs if GH_USER is set)
-                cur.execute("SELECT repo_id FROM github_stars")
-                db_github_repo_ids = {row[0] for row in cur.fetchall()}
-                github_ids_to_delete = db_github_repo_ids - current_github_repo_ids_from_api
-
-                if github_ids_to_delete:
-                    print(f"Found {len(github_ids_to_delete)} GitHub repos to delete from database.")
-                    deleted_this_batch = 0
-                    for repo_id_to_delete in list(github_ids_to_delete): # Iterate over a copy
-                        cur.execute("DELETE FROM github_stars WHERE repo_id = %s", (repo_id_to_delete,))
-                        deleted_this_batch += cur.rowcount
-                    if deleted_this_batch > 0:
-                        github_deleted_count = deleted_this_batch
-                        conn.commit()
-                        print(f"Deletion of GitHub repos complete. Deleted: {github_deleted_count}.")
-                    else:
-                         print("No GitHub repos were actually deleted (rowcount was 0 for all attempts or no items to delete).")
-                else:
-                    print("No GitHub repos to delete. Database is in sync with API or API returned no items.")
-            except psycopg2.Error as e_gh_db: # Catch psycopg2 errors specifically if they occur in GitHub block
-                print(f"A database error occurred during GitHub stars processing: {e_gh_db}", file=sys.stderr)
-                if conn: conn.rollback()
-            except Exception as e_gh:
-                print(f"An error occurred during GitHub stars processing: {e_gh}", file=sys.stderr)
-                if conn: conn.rollback() # General rollback for other exceptions in GitHub block
-
-        # --- X (Twitter) Bookmarks & Likes ---
-        # Only run on weekly sync days (1, 8, 15, 22, 29) to avoid hammering the API daily
-        X_SYNC_DAYS = {1, 8, 15, 22, 29}
-        from datetime import date as _date
-        today_day = _date.today().day
-        x_sync_due = today_day in X_SYNC_DAYS
-        try:
-            if not x_sync_due:
-                print(f"\nSkipping X (Twitter) sync (today is day {today_day}; runs on days {sorted(X_SYNC_DAYS)}).")
-            else:
-                print(f"\nFetching X (Twitter) interactions (day {today_day} is a sync day)...")
-            if x_sync_due and not X_REFRESH_TOKEN:
-                print("Info: X_REFRESH_TOKEN not set in environment. Skipping X sync.", file=sys.stderr)
-            elif x_sync_due:
-                access_token = refresh_x_token()
-                
-                if access_token:
-                    # Get user ID
-                    me_resp = requests.get("https://api.x.com/2/users/me", headers={"Authorization": f"Bearer {access_token}"})
-                    if me_resp.status_code == 200:
-                        x_user_id = me_resp.json()["data"]["id"]
-                        
-                        # Sync Bookmarks
-                        print("Fetching X Bookmarks...")
-                        bookmarks = fetch_latest_x_timeline(f"https://api.x.com/2/users/{x_user_id}/bookmarks", access_token, max_results=50)
-                        x_bookmarks_synced, x_bookmarks_updated = update_x_tweets_to_db(cur, bookmarks, is_bookmark=True, is_like=False, is_retweet=False)
-                        print(f"X Bookmarks upsert complete. Added: {x_bookmarks_synced}, Updated: {x_bookmarks_updated}.")
-                        
-                        # Sync Likes
-                        print("Fetching X Likes...")
-                        likes = fetch_latest_x_timeline(f"https://api.x.com/2/users/{x_user_id}/liked_tweets", access_token, max_results=50)
-                        x_likes_synced, x_likes_updated = update_x_tweets_to_db(cur, likes, is_bookmark=False, is_like=True, is_retweet=False)
-                        print(f"X Likes upsert complete. Added: {x_likes_synced}, Updated: {x_likes_updated}.")
-                        
-                        # Sync Retweets
-                        print("Fetching X Retweets from timeline...")
-                        timeline = fetch_latest_x_timeline(f"https://api.x.com/2/users/{x_user_id}/tweets", access_token, max_results=50)
-                        retweets = [t for t in timeline if "referenced_tweets" in t and any(r["type"] == "retweeted" for r in t["referenced_tweets"])]
-                        x_retweets_synced, x_retweets_updated = update_x_tweets_to_db(cur, retweets, is_bookmark=False, is_like=False, is_retweet=True)
-                        print(f"X Retweets upsert complete. Added: {x_retweets_synced}, Updated: {x_retweets_updated}.")
-                        
-                        conn.commit()
-                    else:
-                        print(f"Error fetching X user info: {me_resp.text}", file=sys.stderr)
-        except Exception as e_x:
-            print(f"An error occurred during X (Twitter) processing: {e_x}", file=sys.stderr)
-            if conn: conn.rollback()
-
+        # Each source commits on its own connection, so one failing never discards another's work
+        results = run_sources(sources, pool)
     except psycopg2.Error as e_db:
         print(f"Database connection or operational error: {e_db}", file=sys.stderr)
-        if conn: conn.rollback()
     except Exception as e_main:
         print(f"An unexpected error occurred in the main block: {e_main}", file=sys.stderr)
-        if conn: conn.rollback()
     finally:
-        if conn:
-            conn.close()
+        if pool:
+            pool.closeall()
             print("Database connection closed.")
         print("\n--- Sync Summary ---")
-        print(f"YouTube Liked Videos: {youtube_synced_count} added, {youtube_updated_count} updated, {youtube_deleted_count} deleted.")
-        print(f"GitHub Starred Repos: {github_synced_count} added, {github_updated_count} updated, {github_deleted_count} deleted.")
-        print(f"X Bookmarks: {x_bookmarks_synced} added, {x_bookmarks_updated} updated.")
-        print(f"X Likes: {x_likes_synced} added, {x_likes_updated} updated.")
-        print(f"X Retweets: {x_retweets_synced} added, {x_retweets_updated} updated.")
-
-        # Trigger Vercel build if any changes were made
-        changes_made = any([
-            youtube_synced_count > 0, youtube_updated_count > 0, youtube_deleted_count > 0,
-            github_synced_count > 0, github_updated_count > 0, github_deleted_count > 0,
-            x_bookmarks_synced > 0, x_bookmarks_updated > 0, x_likes_synced > 0, x_likes_updated > 0,
-            x_retweets_synced > 0, x_retweets_updated > 0
-        ])
+        rows = [row for result in results for row in result['rows']]
+        for label, counts, deleted in rows:
+            print(f"{label}: {format_counts(counts)}" + (f", {deleted} deleted." if deleted is not None else "."))
+        print(f"\n--- Timings ({time.perf_counter() - started:.1f}s total) ---")
+        print_timings(results)
+        http.print_stats()
+
+        # Trigger Vercel build only if rows were actually added, changed or deleted (touched-but-unchanged rows don't count)
+        changes_made = any(
+            counts['inserted'] > 0 or counts['changed'] > 0 or (deleted or 0) > 0
+            for _, counts, deleted in rows
+        )
 
         if changes_made:
-            vercel_hook_url = os.getenv("VERCEL_DEPLOY_HOOK_URL")
-            if vercel_hook_url:
-                print("\nAttempting to trigger Vercel deployment...")
-                trigger_vercel_deploy(vercel_hook_url)
-            else:
-                print("\nInfo: VERCEL_DEPLOY_HOOK_URL not set in environment. Skipping Vercel build trigger despite changes.", file=sys.stderr)
+            # The batch and last build time live in sync_state, shared with the Chrome sync and earlier CI runs
+            deploys = DeployCoordinator.from_env(lambda: psycopg2.connect(
+                host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, port=DB_PORT))
+            try:
+                deploys.request('curated_db_update', sum(
+                    counts['inserted'] + counts['changed'] + (deleted or 0) for _, counts, deleted in rows))
+                deploys.print_stats()
+            except psycopg2.Error as e_deploy:
+                print(f"Could not record the deploy request: {e_deploy}", file=sys.stderr)
+            finally:
+                deploys.close()
         else:
             print("\nNo changes detected in database. Skipping Vercel build trigger.")
@@ -0,0 +1,103 @@
+"""Set-based helpers shared by the sync scripts (get_chrome_bookmarks.py, curated_db_update.py)."""
+import io
+import json
+import hashlib
+
+from psycopg2 import sql
+from psycopg2.extras import Json
+
+STAGING_TABLE = "sync_current_keys"
+
+
+def copy_text(value):
+    """Escapes a value for PostgreSQL's COPY text format."""
+    if value is None:
+        return "\\N"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+class IterStream(io.RawIOBase):
+    """Read-only file object over an iterable of str lines, so COPY can stream a generator."""
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer:
+            line = next(self._lines, None)
+            if line is None:
+                return 0
+            self._buffer = line.encode("utf-8")
+        n = min(len(target), len(self._buffer))
+        target[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def reconcile(cur, table, key_column, current_keys, key_type="text", scope=None, scope_params=()):
+    """
+    Deletes the rows of `table` whose `key_column` is not among `current_keys`, optionally only
+    those matching the SQL condition `scope` (with %s placeholders bound to scope_params).
+
+    The keys are streamed into a temporary staging table with COPY and the orphans removed
+    with one anti-join DELETE, so the cost is three statements whatever the number of rows.
+    Returns the exact number of rows deleted. Runs in the caller's transaction.
+    """
+    # Always schema-qualified, so neither DROP can reach a permanent table of the same name
+    staging = sql.Identifier("pg_temp", STAGING_TABLE)
+    cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(staging))
+    cur.execute(sql.SQL("CREATE TEMP TABLE {} (key {} PRIMARY KEY) ON COMMIT DROP").format(staging, sql.SQL(key_type)))
+    lines = (copy_text(key) + "\n" for key in set(current_keys) if key is not None)
+    cur.copy_expert(sql.SQL("COPY {} (key) FROM STDIN").format(staging).as_string(cur), IterStream(lines))
+    cur.execute(sql.SQL("ANALYZE {}").format(staging))
+
+    query = sql.SQL("DELETE FROM {table} AS t WHERE NOT EXISTS (SELECT 1 FROM {staging} AS k WHERE k.key = t.{key})").format(
+        table=sql.Identifier(table), staging=staging, key=sql.Identifier(key_column))
+    if scope:
+        query = query + sql.SQL(" AND ({})").format(sql.SQL(scope))
+    cur.execute(query, scope_params)
+    deleted = cur.rowcount
+    cur.execute(sql.SQL("DROP TABLE {}").format(staging))
+    return deleted
+
+
+def fingerprint(values):
+    """Stable content hash of a row's synced values, stored in content_hash to skip no-op updates."""
+    content = json.dumps(list(values), ensure_ascii=False, default=str, separators=(",", ":"))
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def upsert_counts(results, touched):
+    """
+    Splits the RETURNING (xmax = 0) rows of a fingerprint-guarded upsert into inserted and
+    changed; rows whose fingerprint matched were skipped by the DO UPDATE ... WHERE and
+    return nothing, so they are the unchanged remainder of `touched`.
+    """
+    inserted = sum(1 for row in results if row[0])
+    changed = len(results) - inserted
+    return {'touched': touched, 'inserted': inserted, 'changed': changed, 'unchanged': touched - inserted - changed}
+
+
+def format_counts(counts):
+    return (f"{counts['inserted']} added, {counts['changed']} changed, {counts['unchanged']} unchanged "
+            f"({counts['touched']} touched)")
+
+
+def load_sync_state(cur, key):
+    """The JSON state an incremental sync saved under `key` in sync_state, or {}."""
+    cur.execute("SELECT value FROM sync_state WHERE key = %s", (key,))
+    row = cur.fetchone()
+    return row[0] if row else {}
+
+
+def save_sync_state(cur, key, value):
+    """Saves the state in the caller's transaction, so it only advances together with the rows it describes."""
+    cur.execute(
+        "INSERT INTO sync_state (key, value) VALUES (%s, %s) "
+        "ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, updated_at = now()",
+        (key, Json(value)))
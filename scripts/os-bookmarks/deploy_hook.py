@@ -0,0 +1,317 @@
+"""
+Coalesced Vercel deploy-hook trigger shared by the sync scripts.
+
+    from deploy_hook import DeployCoordinator
+    DeployCoordinator.from_env(get_db_connection).request("youtube", changes=12)
+
+A sync that changed rows records its changes as pending instead of firing the hook itself. The
+hook then fires once for everything pending, when both:
+  - nothing new has been recorded for DEPLOY_QUIET_SECONDS, so back-to-back syncs form one batch;
+  - DEPLOY_MIN_INTERVAL_SECONDS have passed since the last build.
+A batch that keeps growing still fires once its oldest change is DEPLOY_MAX_DELAY_SECONDS old.
+
+The pending batch, the last build time and the counters live in the database (sync_state, key
+"deploy"), not on the machine: curated_db_update runs on a fresh CI runner every time and the
+Chrome sync runs locally, and both must see the same batch and the same last build. Updates
+take a row lock (SELECT ... FOR UPDATE). A due batch is claimed under the lock (moved to
+"firing"), the hook is called without it, and the outcome is saved in a second transaction, so
+a slow or retrying hook never blocks other syncs from recording. Only one batch fires at a time;
+one left "firing" by a crashed run is pending again after DEPLOY_FIRING_TIMEOUT_SECONDS.
+
+request() records the changes and fires the hook only if the batch is already due; it does not
+wait, since the batch is rarely due before the quiet period and a CI job would be billed for the
+sleep. A batch left pending is built by the next flush, whoever runs it: the next sync's
+request(), the Chrome watch mode's background flusher, or the hourly scheduled
+`python deploy_hook.py` (.github/workflows/flush_deploys.yml). With DEPLOY_WAIT=1, request()
+instead waits until its batch is built. A failed hook call puts the batch back to pending for
+the next attempt.
+
+    python deploy_hook.py [--wait]    fire pending changes if due (or wait until they are)
+    python deploy_hook.py status      pending batch and build counts
+    python deploy_hook.py bench [--syncs 12] [--gap 0.05]
+                                      back-to-back syncs against a local stand-in for the hook,
+                                      recorded under the separate key "deploy_bench"
+"""
+import os
+import sys
+import json
+import time
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+import psycopg2
+import requests
+from psycopg2.extras import Json
+
+from http_client import http
+from db_sync import save_sync_state
+
+DEPLOY_STATE_KEY = "deploy"
+
+
+def empty_state():
+    return {"pending": None, "firing": None, "last_build_at": None,
+            "stats": {"requests": 0, "builds": 0, "failed": 0, "avoided": 0}}
+
+
+def merge_batches(batch, other):
+    """One pending batch holding both; either may be None."""
+    if batch is None or other is None:
+        merged = dict(batch or other)
+    else:
+        sources = dict(batch["sources"])
+        for source, changes in other["sources"].items():
+            sources[source] = sources.get(source, 0) + changes
+        merged = {"since": min(batch["since"], other["since"]),
+                  "last_change_at": max(batch["last_change_at"], other["last_change_at"]),
+                  "requests": batch["requests"] + other["requests"],
+                  "changes": batch["changes"] + other["changes"],
+                  "sources": sources}
+    merged.pop("started_at", None)
+    return merged
+
+
+def connect_from_env():
+    return psycopg2.connect(
+        host=os.getenv("SUPABASE_DB_HOST"),
+        dbname=os.getenv("SUPABASE_DB_NAME", "postgres"),
+        user=os.getenv("SUPABASE_DB_USER", "postgres"),
+        password=os.getenv("SUPABASE_DB_PASSWORD"),
+        port=os.getenv("SUPABASE_DB_PORT", "5432"),
+        sslmode=os.getenv("SUPABASE_DB_SSLMODE", "prefer"),
+        connect_timeout=os.getenv("SUPABASE_DB_CONNECT_TIMEOUT", "10"),
+    )
+
+
+class DeployCoordinator:
+    def __init__(self, hook_url, connect=connect_from_env, state_key=DEPLOY_STATE_KEY, quiet=60.0,
+                 min_interval=300.0, max_delay=1800.0, firing_timeout=600.0, wait=False, poll_interval=5.0):
+        self.hook_url = hook_url
+        self.connect = connect
+        self.state_key = state_key
+        self.quiet = quiet
+        self.min_interval = min_interval
+        self.max_delay = max_delay
+        self.firing_timeout = firing_timeout
+        self.wait = wait
+        self.poll_interval = poll_interval
+        self.conn = None
+
+    @classmethod
+    def from_env(cls, connect=connect_from_env):
+        """Built at call time, after the calling script has loaded its .env."""
+        return cls(
+            hook_url=os.getenv("VERCEL_DEPLOY_HOOK_URL"),
+            connect=connect,
+            quiet=float(os.getenv("DEPLOY_QUIET_SECONDS", "60")),
+            min_interval=float(os.getenv("DEPLOY_MIN_INTERVAL_SECONDS", "300")),
+            max_delay=float(os.getenv("DEPLOY_MAX_DELAY_SECONDS", "1800")),
+            firing_timeout=float(os.getenv("DEPLOY_FIRING_TIMEOUT_SECONDS", "600")),
+            wait=os.getenv("DEPLOY_WAIT", "0") != "0",
+        )
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    @contextmanager
+    def locked_state(self):
+        """Yields the state with its sync_state row locked, and saves it when the block completes."""
+        if self.conn is None or self.conn.closed:
+            self.conn = self.connect()
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("INSERT INTO sync_state (key, value) VALUES (%s, %s) ON CONFLICT (key) DO NOTHING",
+                            (self.state_key, Json(empty_state())))
+                cur.execute("SELECT value FROM sync_state WHERE key = %s FOR UPDATE", (self.state_key,))
+                state = {**empty_state(), **cur.fetchone()[0]}
+                if state["firing"] and time.time() - state["firing"]["started_at"] > self.firing_timeout:
+                    # The run that claimed it never reported back
+                    state["pending"] = merge_batches(state["firing"], state["pending"])
+                    state["firing"] = None
+                yield state
+                save_sync_state(cur, self.state_key, state)
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+
+    def due_at(self, state):
+        pending = state["pending"]
+        due = min(pending["last_change_at"] + self.quiet, pending["since"] + self.max_delay)
+        if state["last_build_at"] is not None:
+            due = max(due, state["last_build_at"] + self.min_interval)
+        return due
+
+    def record(self, source, changes):
+        """Adds `changes` changed rows from `source` to the pending batch; returns the batch's start time, its id."""
+        now = time.time()
+        with self.locked_state() as state:
+            pending = state["pending"] or {"since": now, "requests": 0, "changes": 0, "sources": {}}
+            pending["last_change_at"] = now
+            pending["requests"] += 1
+            pending["changes"] += changes
+            pending["sources"][source] = pending["sources"].get(source, 0) + changes
+            state["pending"] = pending
+            state["stats"]["requests"] += 1
+        return pending["since"]
+
+    def fire(self):
+        """Calls the hook once. Returns True on success."""
+        try:
+            print(f"Attempting to trigger Vercel deploy hook: {self.hook_url[:30]}... (URL truncated for safety)")
+            response = http.post(self.hook_url, retry=True) # No data/payload needed for Vercel deploy hooks
+            response.raise_for_status() # Raises an HTTPError for bad responses (4XX or 5XX)
+            print(f"Vercel deploy hook triggered successfully. Status: {response.status_code}")
+            return True
+        except requests.exceptions.RequestException as e:
+            print(f"Error triggering Vercel deploy hook: {e}", file=sys.stderr)
+            return False
+
+    def flush(self, wait=False, batch=None):
+        """
+        Fires the hook if the pending batch is due. With wait, sleeps until it is (re-checking,
+        since other runs may extend, claim or build the batch meanwhile). With `batch` (from
+        record), stops once that batch has been built, whoever built it. Returns True if this
+        call triggered a build.
+        """
+        ours = lambda b: b is not None and (batch is None or b["since"] == batch)
+        while True:
+            claimed = None
+            with self.locked_state() as state:
+                if not ours(state["pending"]) and not ours(state["firing"]):
+                    return False
+                delay = self.poll_interval
+                if state["pending"] and not state["firing"]:
+                    delay = self.due_at(state) - time.time()
+                    if delay <= 0:
+                        claimed = state["firing"] = dict(state["pending"], started_at=time.time())
+                        state["pending"] = None
+            if claimed:
+                return self.finish(claimed, self.fire())
+            if not wait:
+                print(f"Deploy pending; due in {max(delay, 0):.0f}s.")
+                return False
+            time.sleep(min(delay, self.poll_interval))
+
+    def finish(self, claimed, built):
+        """Saves the outcome of firing `claimed`: a build, or the batch pending again."""
+        with self.locked_state() as state:
+            state["firing"] = None
+            if built:
+                state["last_build_at"] = time.time()
+                state["stats"]["builds"] += 1
+                state["stats"]["avoided"] += claimed["requests"] - 1
+            else:
+                state["stats"]["failed"] += 1
+                state["pending"] = merge_batches(claimed, state["pending"])
+        if built:
+            print(f"One build for {claimed['requests']} sync(s) with changes "
+                  f"({', '.join(f'{s}: {n}' for s, n in sorted(claimed['sources'].items()))}).")
+        return built
+
+    def request(self, source, changes, wait=None):
+        """Records a sync's changes and fires the hook once the batch is due (see the module docstring)."""
+        if not self.hook_url:
+            print("\nInfo: VERCEL_DEPLOY_HOOK_URL not set in environment. Skipping Vercel build trigger despite changes.", file=sys.stderr)
+            return False
+        batch = self.record(source, changes)
+        print("\nRecorded changes for the next Vercel deployment...")
+        return self.flush(self.wait if wait is None else wait, batch)
+
+    def status(self):
+        with self.locked_state() as state:
+            return state
+
+    def print_stats(self):
+        state = self.status()
+        s = state["stats"]
+        line = f"Deploys: {s['builds']} builds for {s['requests']} syncs with changes ({s['avoided']} avoided, {s['failed']} failed hook calls)"
+        if state["firing"]:
+            line += f"; {state['firing']['requests']} firing"
+        if state["pending"]:
+            line += f"; {state['pending']['requests']} pending, due in {max(self.due_at(state) - time.time(), 0):.0f}s"
+        print(line)
+
+
+def serve_stand_in():
+    """Starts a local stand-in for the deploy hook; returns (server, url, hits) where hits lists call times."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            hits.append(time.time())
+            payload = json.dumps({"job": {"id": str(len(hits)), "state": "PENDING"}}).encode("utf-8")
+            self.send_response(201)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/hook", hits
+
+
+def benchmark(syncs, gap, connect=connect_from_env):
+    """Runs `syncs` back-to-back syncs (two scripts alternating) against the stand-in and counts builds."""
+    server, url, hits = serve_stand_in()
+    coordinators = []
+    make = lambda: DeployCoordinator(url, connect, state_key="deploy_bench", quiet=gap * 4, min_interval=gap * 20,
+                                     max_delay=gap * 100, poll_interval=gap / 2)
+    try:
+        recorder = make()
+        coordinators.append(recorder)
+        with recorder.locked_state() as state:
+            state.clear()
+            state.update(empty_state())
+        waiters = []
+        for i in range(syncs):
+            source = ("get_chrome_bookmarks", "curated_db_update")[i % 2]
+            batch = recorder.record(source, 1)
+            # Each waiter is a separate run with its own connection
+            coordinators.append(make())
+            waiter = threading.Thread(target=coordinators[-1].flush, kwargs={"wait": True, "batch": batch})
+            waiter.start()
+            waiters.append(waiter)
+            time.sleep(gap)
+        for waiter in waiters:
+            waiter.join()
+        print(f"{syncs} syncs with changes: {len(hits)} build(s) instead of {syncs}.")
+        recorder.print_stats()
+    finally:
+        server.shutdown()
+        for coordinator in coordinators:
+            coordinator.close()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=Path(__file__).resolve().parent / ".env")
+    args = sys.argv[1:]
+    option = lambda name, default: type(default)(args[args.index(name) + 1]) if name in args else default
+    if args and args[0] == "bench":
+        benchmark(option("--syncs", 12), option("--gap", 0.05))
+    elif args and args[0] == "status":
+        coordinator = DeployCoordinator.from_env()
+        print(json.dumps(coordinator.status(), indent=2))
+        coordinator.print_stats()
+        coordinator.close()
+    elif not args or args == ["--wait"]:
+        coordinator = DeployCoordinator.from_env()
+        if not coordinator.hook_url:
+            print("VERCEL_DEPLOY_HOOK_URL not set.", file=sys.stderr)
+            sys.exit(1)
+        coordinator.flush(wait="--wait" in args)
+        coordinator.print_stats()
+        coordinator.close()
+    else:
+        print(__doc__)
+        sys.exit(1)
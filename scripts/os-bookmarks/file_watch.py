@@ -0,0 +1,162 @@
+"""
+Blocks until one of a set of files changes, for long-running sync scripts.
+
+    with watch_files([path], debounce=2.0) as changes:
+        sync(path)
+        for _ in changes:
+            sync(path)
+
+On Linux the files' directories are watched with inotify (through libc, no extra dependency), so
+an idle watcher sleeps in select() and costs nothing. Elsewhere, or if inotify is unavailable,
+the files' mtime and size are polled every poll_interval seconds. Editors and browsers save by
+writing a temporary file and renaming it over the original, which is why the directory is
+watched rather than the file itself.
+
+A change is reported once the files have been quiet for `debounce` seconds, so a burst of saves
+(Chrome rewrites its Bookmarks file for every edit of a drag-and-drop reorganisation) yields once.
+The watch starts when watch_files is called, so start it before the initial sync: a change made
+while that sync runs is then reported by the first iteration.
+"""
+import os
+import sys
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+import platform
+
+WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", "2"))
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def open_inotify(directories):
+    """
+    Returns (fd, {watch descriptor: directory}) for an inotify instance watching `directories`
+    for writes and renames, or (None, None) if inotify is unavailable.
+    """
+    if platform.system() != "Linux":
+        return None, None
+    fd = -1
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        directory_by_wd = {}
+        for directory in directories:
+            wd = libc.inotify_add_watch(fd, os.fsencode(directory), mask)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+            directory_by_wd[wd] = directory
+        return fd, directory_by_wd
+    except (OSError, AttributeError) as e:
+        if fd >= 0:
+            os.close(fd)
+        print(f"inotify unavailable ({e}); polling every {WATCH_POLL_INTERVAL:g}s instead.", file=sys.stderr)
+        return None, None
+
+
+def read_event_paths(fd, directory_by_wd):
+    """Drains pending inotify events and returns the paths they concern."""
+    paths = set()
+    while True:
+        try:
+            data = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            return paths
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            paths.add(os.path.join(directory_by_wd.get(wd, ""), name))
+            offset += length
+
+
+def stat_signature(paths):
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return signature
+
+
+class FileWatch:
+    """
+    Iterator over the debounced changes of a set of files, returned by watch_files. The watch is
+    set up when it is created, so changes made before the first next() (during an initial sync,
+    say) are reported by that next() rather than lost.
+    """
+
+    def __init__(self, paths, debounce=2.0, poll_interval=WATCH_POLL_INTERVAL):
+        self.paths = [os.path.abspath(p) for p in paths]
+        self.watched = set(self.paths)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.fd, self.directory_by_wd = open_inotify(sorted({os.path.dirname(p) for p in self.paths}))
+        self.last = stat_signature(self.paths) if self.fd is None else None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """Blocks until any of the files has changed and then all stayed unchanged for `debounce` seconds."""
+        if self.fd is not None:
+            self._wait_inotify()
+        else:
+            self._wait_polling()
+
+    def _wait_inotify(self):
+        while True:
+            select.select([self.fd], [], [])
+            if self.watched & read_event_paths(self.fd, self.directory_by_wd):
+                break
+        # Wait out the burst: only further events on a watched file restart the quiet period,
+        # not the browser's constant writes to other files in the profile directory
+        quiet_until = time.monotonic() + self.debounce
+        while time.monotonic() < quiet_until:
+            ready = select.select([self.fd], [], [], max(quiet_until - time.monotonic(), 0))[0]
+            if ready and self.watched & read_event_paths(self.fd, self.directory_by_wd):
+                quiet_until = time.monotonic() + self.debounce
+
+    def _wait_polling(self):
+        while True:
+            current = stat_signature(self.paths)
+            if current != self.last:
+                break
+            time.sleep(self.poll_interval)
+        while True:
+            time.sleep(self.debounce)
+            settled = stat_signature(self.paths)
+            if settled == current:
+                break
+            current = settled
+        self.last = current
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def watch_files(paths, debounce=2.0, poll_interval=WATCH_POLL_INTERVAL):
+    """Starts watching `paths` now and returns a FileWatch yielding once per debounced change. Close it when done."""
+    return FileWatch(paths, debounce, poll_interval)
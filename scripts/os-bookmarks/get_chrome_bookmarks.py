@@ -1,11 +1,22 @@
 import json
 import os
+import re
+import time
+import hashlib
 import platform
 import sys
+import threading
 from pathlib import Path
+from collections import deque
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
 import psycopg2 # Added for PostgreSQL
+from psycopg2.extras import execute_values
 from dotenv import load_dotenv # Added for .env file loading
-import requests # Added for Vercel deploy hook
+
+from http_client import http
+from deploy_hook import DeployCoordinator
+from file_watch import watch_files
 
 # Load .env file from the script's directory or current working directory
 script_dir = Path(__file__).resolve().parent
@@ -44,403 +55,599 @@ def get_db_connection():
         connect_timeout=DB_CONNECT_TIMEOUT,
     )
 
-def trigger_vercel_deploy(hook_url):
-    """Triggers a Vercel deployment hook."""
-    if not hook_url:
-        print("Info: VERCEL_DEPLOY_HOOK_URL not set. Skipping Vercel build trigger.", file=sys.stderr)
-        return
-    try:
-        print(f"Attempting to trigger Vercel deploy hook: {hook_url[:30]}... (URL truncated for safety)")
-        response = requests.post(hook_url) # No data/payload needed for Vercel deploy hooks
-        response.raise_for_status() # Raises an HTTPError for bad responses (4XX or 5XX)
-        print(f"Vercel deploy hook triggered successfully. Status: {response.status_code}")
-        # Example response from Vercel: {"job": {"id": "...", "state": "PENDING", "createdAt": ...}}
-        print(f"Vercel response: {response.json()}")
-    except requests.exceptions.RequestException as e:
-        print(f"Error triggering Vercel deploy hook: {e}", file=sys.stderr)
-    except json.JSONDecodeError as e:
-        print(f"Error decoding Vercel deploy hook response: {e}. Response text: {response.text[:200]}", file=sys.stderr)
-
-def get_chrome_bookmarks_path():
-    """Gets the path to the Chrome bookmarks file based on the OS, checking profiles."""
+def get_browser_data_dirs():
+    """User data directories of the Chrome and Chromium installs on this OS, as [(browser, path)]."""
     system = platform.system()
-    base_path = None
-
     if system == "Windows":
         # Path: %LOCALAPPDATA%\Google\Chrome\User Data\Default\Bookmarks
         app_data = os.getenv('LOCALAPPDATA')
-        if app_data:
-            base_path = Path(app_data) / "Google" / "Chrome" / "User Data"
+        if not app_data:
+            return []
+        candidates = [("chrome", Path(app_data) / "Google" / "Chrome" / "User Data"),
+                      ("chromium", Path(app_data) / "Chromium" / "User Data")]
     elif system == "Darwin": # macOS
         # Path: ~/Library/Application Support/Google/Chrome/Default/Bookmarks
-        home = Path.home()
-        base_path = home / "Library" / "Application Support" / "Google" / "Chrome"
+        support = Path.home() / "Library" / "Application Support"
+        candidates = [("chrome", support / "Google" / "Chrome"), ("chromium", support / "Chromium")]
     elif system == "Linux":
         # Path: ~/.config/google-chrome/Default/Bookmarks
-        home = Path.home()
         # Paths can vary: google-chrome, google-chrome-stable, chromium
-        for browser in ["google-chrome", "google-chrome-stable", "chromium"]:
-            potential_path = home / ".config" / browser
-            if potential_path.exists():
-                base_path = potential_path
-                break
+        candidates = [(browser, Path.home() / ".config" / browser)
+                      for browser in ["google-chrome", "google-chrome-stable", "chromium"]]
     else:
-        return None # Unsupported OS
+        return [] # Unsupported OS
+
+    data_dirs = []
+    seen = set()
+    for browser, path in candidates:
+        # google-chrome-stable is often a symlink to google-chrome
+        if path.is_dir() and path.resolve() not in seen:
+            seen.add(path.resolve())
+            data_dirs.append((browser, path))
+    if not data_dirs:
+        print(f"Error: No Chrome or Chromium user data directory found at the expected locations for {system}.", file=sys.stderr)
+    return data_dirs
 
-    if not base_path or not base_path.exists():
-        print(f"Error: Chrome User Data directory not found at expected location for {system}.", file=sys.stderr)
-        return None
 
-    # 1. Check Default profile first
-    default_bookmarks = base_path / "Default" / "Bookmarks"
-    if default_bookmarks.exists():
-        print(f"Found bookmarks in Default profile: {default_bookmarks}")
-        return default_bookmarks
+def profile_sort_key(profile_dir):
+    # Default first, then Profile 1, Profile 2, ... in numeric order
+    if profile_dir.name == "Default":
+        return (0, 0)
+    number = profile_dir.name[len("Profile "):]
+    return (1, int(number)) if number.isdigit() else (2, profile_dir.name)
 
-    # 2. If not in Default, check other Profile directories
-    print("Bookmarks not found in Default profile, checking other profiles (Profile 1, Profile 2, etc.)...")
+
+def find_bookmark_files():
+    """
+    Every profile's Bookmarks file across the Chrome and Chromium installs, as [(profile, path)]
+    where profile is "<browser>/<profile directory>", e.g. "google-chrome/Profile 2". Browsers
+    are listed in get_browser_data_dirs' order, each with Default first; merge_profile_rows
+    lets earlier profiles win when the same node appears in several.
+    """
+    bookmark_files = []
+    for browser, base_path in get_browser_data_dirs():
+        try:
+            profile_dirs = [item for item in base_path.iterdir()
+                            if item.is_dir() and (item.name == "Default" or item.name.startswith("Profile "))]
+        except OSError as e:
+            print(f"Error scanning profile directories in {base_path}: {e}", file=sys.stderr)
+            continue
+        for profile_dir in sorted(profile_dirs, key=profile_sort_key):
+            bookmarks = profile_dir / "Bookmarks"
+            if bookmarks.exists():
+                print(f"Found bookmarks in {browser} profile '{profile_dir.name}': {bookmarks}")
+                bookmark_files.append((f"{browser}/{profile_dir.name}", bookmarks))
+    if not bookmark_files:
+        print("No Bookmarks file found in any Default or Profile directory.", file=sys.stderr)
+    return bookmark_files
+
+PATH_SEPARATOR = ">>"
+# Signature (mtime, size, Chrome checksum) of each Bookmarks file at its last successful sync
+STATE_PATH = script_dir / 'chrome_bookmarks.state.json'
+# Rows per INSERT/UPDATE statement
+SYNC_PAGE_SIZE = 1000
+
+
+def parse_date_added(value, name):
+    if value is None:
+        return None
     try:
-        for item in base_path.iterdir():
-            if item.is_dir() and item.name.startswith("Profile "):
-                profile_bookmarks = item / "Bookmarks"
-                if profile_bookmarks.exists():
-                    print(f"Found bookmarks in profile '{item.name}': {profile_bookmarks}")
-                    return profile_bookmarks
-    except OSError as e:
-        print(f"Error scanning profile directories: {e}", file=sys.stderr)
-        # Continue execution, maybe Default was the only one intended
-
-    print("No Bookmarks file found in Default or other Profile directories.", file=sys.stderr)
-    return None
-
-def extract_bookmarks(node, allowed_folders):
-    """Recursively extracts bookmarks, filtering by allowed folder names."""
-    if not isinstance(node, dict):
+        return int(value)
+    except ValueError:
+        print(f"Warning: Could not convert date_added '{value}' to int for '{name}'. Setting to NULL.", file=sys.stderr)
         return None
 
-    node_type = node.get('type')
-    node_name = node.get('name')
 
-    if node_type == 'url':
-        # Keep URL if its parent folder was allowed (this is determined by the caller)
-        if 'name' in node and 'url' in node:
-            output = {'type': 'url', 'name': node.get('name'), 'url': node.get('url')}
-            if 'date_added' in node: output['date_added'] = node.get('date_added')
-            return output
-        else:
-            return None # Skip malformed URL entries
-
-    elif node_type == 'folder':
-        # Only process this folder fully if its name is in the allowed list
-        if node_name in allowed_folders:
-            if 'children' in node:
-                processed_children = []
-                for child in node.get('children', []):
-                    # Recursively call for children.
-                    # The recursive call handles whether the child should be kept.
-                    processed_child = extract_bookmarks(child, allowed_folders)
-                    # Keep direct URLs or subfolders that are *also* allowed
-                    if processed_child:
-                         if processed_child.get('type') == 'url':
-                             processed_children.append(processed_child)
-                         # Only include sub-folders if they passed the name check in their own call
-                         elif processed_child.get('type') == 'folder':
-                             processed_children.append(processed_child)
-
-                # Construct the output for the allowed folder
-                output = {'type': 'folder', 'name': node_name, 'children': processed_children}
-                if 'date_added' in node: output['date_added'] = node.get('date_added')
-                return output
-            else:
-                 # Skip malformed folder entries even if name matches
-                 return None
-        else:
-            # Folder name not allowed, return None to prune this branch
-            return None
-    else:
-        # Unknown type, ignore
-        return None
+def bookmark_hash(row):
+    """
+    Fingerprint of the node's own columns, so unchanged rows are never rewritten. The path is
+    left out: it is derived from the ancestors, and a rename or move rewrites it for the whole
+    subtree in one statement (see sync_bookmark_rows) rather than row by row.
+    """
+    content = json.dumps([row['name'], row['type'], row['url'], row['date_added'], row['source'], row['profile']])
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
 
-# Global counters and sets for reporting and sync logic
-newly_added_count_global = 0
-processed_count_global = 0
-deleted_count_global = 0 # New counter for deletions
-processed_paths_this_run = set() # New set to track all valid paths from current Chrome run
 
-def insert_or_get_id(node_data, parent_id_in_db, parent_full_path, source_key, existing_paths_in_db_set, cursor, connection):
+def node_guid(node, source_key, profile=None, is_root=False):
     """
-    Inserts a bookmark/folder if it doesn't exist based on its path, or gets its ID if it exists.
-    Updates existing_paths_in_db_set, newly_added_count_global, and processed_paths_this_run.
+    Chrome's stable guid for the node. Files that predate guids fall back to the node id, which is
+    only unique within a profile; roots keep a profile-free key so every profile shares them.
     """
-    global newly_added_count_global, processed_paths_this_run
+    if node.get('guid'):
+        return node['guid']
+    if is_root or profile is None:
+        return f"{source_key}:{node.get('id')}"
+    return f"{profile}:{source_key}:{node.get('id')}"
 
-    node_name = node_data.get('name')
-    node_type = node_data.get('type')
-    node_url = node_data.get('url', None)
-    node_date_added = node_data.get('date_added')
-    if node_date_added is not None:
-        try:
-            node_date_added = int(node_date_added)
-        except ValueError:
-            print(f"Warning: Could not convert date_added '{node_date_added}' to int for '{node_name}'. Setting to NULL.", file=sys.stderr)
-            node_date_added = None
 
-    current_full_path = f"{parent_full_path}>>{node_name}" if parent_full_path else node_name
-    item_db_id = None
+def flatten_tree(root_node, source_key, allowed_folders, profile=None):
+    """
+    Flattens one of Chrome's roots straight from the parsed file into one row per kept node with
+    its guid, its parent's guid, full path and depth. Under the root, URLs are kept and folders
+    only when their name is in allowed_folders, at every level. Nodes are identified by guid, so
+    two same-named items in one folder are both kept (with the same path).
+    The walk is breadth first over an explicit queue, so rows come out parents before children,
+    already sorted by depth, and folder nesting is not limited by Python's recursion depth.
+    """
+    rows = []
+    seen_guids = set()
+    queue = deque([(root_node, root_node.get('name', source_key), None, None, 0)])
+    while queue:
+        node, name, parent_guid, parent_path, depth = queue.popleft()
+        guid = node_guid(node, source_key, profile, is_root=depth == 0)
+        if guid in seen_guids:
+            continue
+        seen_guids.add(guid)
+        path = f"{parent_path}{PATH_SEPARATOR}{name}" if parent_path else name
+        row = {
+            'guid': guid,
+            'parent_guid': parent_guid,
+            'name': name,
+            'type': node.get('type'),
+            'url': node.get('url'),
+            'date_added': parse_date_added(node.get('date_added'), name),
+            'source': source_key,
+            'profile': profile,
+            'path': path,
+            'parent_path': parent_path,
+            'depth': depth,
+        }
+        row['hash'] = bookmark_hash(row)
+        rows.append(row)
+        for child in node.get('children', []) if node.get('type') == 'folder' else []:
+            if not isinstance(child, dict):
+                continue
+            if child.get('type') == 'url' and 'name' in child and 'url' in child:
+                queue.append((child, child['name'], guid, path, depth + 1))
+            elif child.get('type') == 'folder' and child.get('name') in allowed_folders and 'children' in child:
+                queue.append((child, child['name'], guid, path, depth + 1))
+    return rows
+
+
+def read_checksum(bookmarks_path):
+    """Chrome's own MD5 of the bookmark tree, read from the head of the file where Chrome writes it first."""
+    with open(bookmarks_path, 'r', encoding='utf-8') as f:
+        match = re.search(r'"checksum"\s*:\s*"([0-9a-fA-F]+)"', f.read(4096))
+    return match.group(1) if match else None
+
+
+def file_signature(bookmarks_path, allowed_folders):
+    stat = os.stat(bookmarks_path)
+    return {
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'checksum': read_checksum(bookmarks_path),
+        # A different folder filter changes the synced rows even for an unchanged file
+        'filter': hashlib.sha1(json.dumps(sorted(allowed_folders)).encode('utf-8')).hexdigest(),
+    }
 
-    if current_full_path in existing_paths_in_db_set:
-        try:
-            cursor.execute("SELECT id FROM chrome_bookmarks WHERE path = %s", (current_full_path,))
-            result = cursor.fetchone()
-            if result:
-                item_db_id = result[0]
-                processed_paths_this_run.add(current_full_path) # Mark as processed this run
-            else:
-                print(f"Info: Path '{current_full_path}' was in initial DB set but no ID found. Attempting insert.", file=sys.stderr)
-        except psycopg2.Error as e:
-            print(f"Error fetching ID for existing path '{current_full_path}': {e}. Attempting insert.", file=sys.stderr)
-            connection.rollback()
-    
-    if item_db_id is None:
-        sql = """
-            INSERT INTO chrome_bookmarks (name, type, url, date_added, parent_id, source, path, parent_path)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (path) DO UPDATE SET
-                name = EXCLUDED.name,
-                type = EXCLUDED.type,
-                url = EXCLUDED.url,
-                date_added = EXCLUDED.date_added,
-                parent_id = EXCLUDED.parent_id,
-                source = EXCLUDED.source,
-                parent_path = EXCLUDED.parent_path
-            RETURNING id, (xmax = 0);
-        """
-        try:
-            cursor.execute(sql, (
-                node_name, node_type, node_url, node_date_added,
-                parent_id_in_db, source_key, current_full_path,
-                parent_full_path if parent_full_path else None
-            ))
-            result = cursor.fetchone()
-            item_db_id = result[0]
-            was_inserted = result[1] 
-            
-            if was_inserted:
-                 newly_added_count_global += 1
-            
-            existing_paths_in_db_set.add(current_full_path) # Add to set of paths known to be in DB (either old or new)
-            processed_paths_this_run.add(current_full_path) # Mark as processed this run
 
-        except psycopg2.Error as e:
-            print(f"Database error (INSERT/UPDATE) for '{current_full_path}': {e}", file=sys.stderr)
-            connection.rollback()
-            raise 
-    
-    return item_db_id
+def unchanged_since_last_sync(previous, signature):
+    """True if the file is the one last synced: same mtime and size, or same Chrome checksum."""
+    if not previous or previous.get('filter') != signature['filter']:
+        return False
+    if (previous.get('mtime_ns'), previous.get('size')) == (signature['mtime_ns'], signature['size']):
+        return True
+    return signature['checksum'] is not None and previous.get('checksum') == signature['checksum']
+
+
+def profiles_unchanged(file_state, signatures):
+    """True if the same set of Bookmarks files as last time is found and none has changed."""
+    return set(file_state) == set(signatures) and all(
+        unchanged_since_last_sync(file_state[path], signature) for path, signature in signatures.items())
+
+
+def load_file_state():
+    try:
+        with open(STATE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_file_state(state):
+    tmp_path = STATE_PATH.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_PATH)
+
 
-def process_filtered_structure_for_db(node_data, parent_id_in_db, parent_full_path, source_key, existing_paths_in_db_set, cursor, connection):
+def load_existing_bookmarks(cur):
     """
-    Recursively traverses the filtered bookmark structure and inserts items into the database.
-    node_data comes from the output of extract_bookmarks.
+    Reads the synced state of chrome_bookmarks: {guid: (id, parent_id, content_hash, path, name, source)},
+    plus {path: [entries]} for rows from before guids were stored.
     """
-    global processed_count_global
-    processed_count_global += 1
+    cur.execute("SELECT guid, path, id, parent_id, content_hash, name, source FROM chrome_bookmarks")
+    existing = {}
+    legacy_by_path = {}
+    for guid, path, row_id, parent_id, content_hash, name, source in cur.fetchall():
+        if guid is not None:
+            existing[guid] = (row_id, parent_id, content_hash, path, name, source)
+        elif path is not None:
+            legacy_by_path.setdefault(path, []).append((row_id, parent_id, None, path, name, source))
+    print(f"Fetched {len(existing) + sum(map(len, legacy_by_path.values()))} existing bookmarks from the database.")
+    return existing, legacy_by_path
+
+
+def sync_bookmark_rows(cur, rows, managed_sources, existing=None, legacy_by_path=None):
+    """
+    Brings chrome_bookmarks in line with rows (from flatten_tree), matching nodes on Chrome's
+    guid so a renamed or moved node keeps its row. The existing table is read in one query, or
+    taken from `existing` (load_existing_bookmarks' result), which is then updated in place to
+    the synced state so a long-running caller never re-reads the table. The in-memory diff is
+    applied as one batched INSERT per tree level (so parent ids are known before their children
+    are written), one recursive UPDATE that rewrites path/parent_path below every renamed or
+    moved node, batched UPDATEs for the nodes whose own fingerprint, parent or path changed, and
+    one DELETE for the managed sources' rows that are no longer in the tree. Reorganising a
+    folder therefore sends one row for the folder, however large its subtree.
+    Rows written before guids were stored are matched on path once and take over the guid.
+    Returns {'processed', 'inserted', 'updated', 'repathed', 'unchanged', 'deleted'}, where
+    repathed counts descendants whose path was rewritten under a renamed or moved ancestor.
+    """
+    if existing is None:
+        existing, legacy_by_path = load_existing_bookmarks(cur)
+    legacy_by_path = legacy_by_path or {}
+
+    stored = {}
+    adopted = set()
+    for row in rows:
+        entry = existing.get(row['guid'])
+        if entry is None and legacy_by_path.get(row['path']):
+            entry = legacy_by_path[row['path']].pop(0)
+            adopted.add(row['guid'])
+        if entry is not None:
+            stored[row['guid']] = entry
+    id_by_guid = {guid: entry[0] for guid, entry in stored.items()}
+
+    counts = {'processed': len(rows), 'inserted': 0, 'updated': 0, 'repathed': 0, 'unchanged': 0, 'deleted': 0}
+    updates = []
+    moved = []  # (id, new path, new parent_path) of nodes renamed or moved themselves
+    detached = []  # ids whose parent changed; their stored children are not theirs to repath
+    new_by_depth = {}
+    for row in rows:
+        entry = stored.get(row['guid'])
+        if entry is None:
+            new_by_depth.setdefault(row['depth'], []).append(row)
+            continue
+        row_id, parent_id, content_hash, path, name = entry[:5]
+        parent_changed = parent_id != id_by_guid.get(row['parent_guid'])
+        path_changed = path != row['path']
+        parent_entry = stored.get(row['parent_guid'])
+        # A path that changed only because an ancestor's did is rewritten under that ancestor
+        is_moved = path_changed and (parent_changed or name != row['name'] or parent_entry is None
+                                     or parent_entry[3] == row['parent_path'])
+        if parent_changed:
+            detached.append(row_id)
+        if is_moved:
+            moved.append((row_id, row['path'], row['parent_path']))
+        if content_hash != row['hash'] or parent_changed or is_moved or row['guid'] in adopted:
+            updates.append(row)
+        elif not path_changed:
+            counts['unchanged'] += 1
+
+    insert_sql = """
+        INSERT INTO chrome_bookmarks (guid, name, type, url, date_added, parent_id, source, profile, path, parent_path, content_hash)
+        VALUES %s
+        ON CONFLICT (guid) DO UPDATE SET
+            name = EXCLUDED.name,
+            type = EXCLUDED.type,
+            url = EXCLUDED.url,
+            date_added = EXCLUDED.date_added,
+            parent_id = EXCLUDED.parent_id,
+            source = EXCLUDED.source,
+            profile = EXCLUDED.profile,
+            path = EXCLUDED.path,
+            parent_path = EXCLUDED.parent_path,
+            content_hash = EXCLUDED.content_hash
+        RETURNING guid, id;
+    """
+    for depth in sorted(new_by_depth):
+        level = new_by_depth[depth]
+        values = [(r['guid'], r['name'], r['type'], r['url'], r['date_added'], id_by_guid.get(r['parent_guid']),
+                   r['source'], r['profile'], r['path'], r['parent_path'], r['hash']) for r in level]
+        for guid, row_id in execute_values(cur, insert_sql, values, page_size=SYNC_PAGE_SIZE, fetch=True):
+            id_by_guid[guid] = row_id
+        counts['inserted'] += len(level)
+
+    if moved:
+        # Walks the stored tree down from each moved node, stopping at nodes that moved
+        # themselves (they are seeds of their own) or left their stored parent
+        cur.execute("""
+            WITH RECURSIVE moved(id, path) AS (
+                SELECT * FROM unnest(%(ids)s::integer[], %(paths)s::text[])
+            ), subtree(id, path, parent_path) AS (
+                SELECT c.id, m.path || %(sep)s || c.name, m.path
+                FROM moved AS m JOIN chrome_bookmarks AS c ON c.parent_id = m.id
+                WHERE c.id <> ALL(%(skip)s::integer[])
+              UNION ALL
+                SELECT c.id, s.path || %(sep)s || c.name, s.path
+                FROM subtree AS s JOIN chrome_bookmarks AS c ON c.parent_id = s.id
+                WHERE c.id <> ALL(%(skip)s::integer[])
+            )
+            UPDATE chrome_bookmarks AS b SET path = s.path, parent_path = s.parent_path
+            FROM subtree AS s
+            WHERE b.id = s.id AND (b.path IS DISTINCT FROM s.path OR b.parent_path IS DISTINCT FROM s.parent_path);
+        """, {'ids': [m[0] for m in moved], 'paths': [m[1] for m in moved], 'sep': PATH_SEPARATOR,
+              'skip': [m[0] for m in moved] + detached})
+        counts['repathed'] = cur.rowcount
+
+    if updates:
+        # Parents of updated rows either existed already or were inserted above
+        values = [(id_by_guid[r['guid']], r['guid'], r['name'], r['type'], r['url'], r['date_added'],
+                   id_by_guid.get(r['parent_guid']), r['source'], r['profile'], r['path'], r['parent_path'], r['hash']) for r in updates]
+        execute_values(cur, """
+            UPDATE chrome_bookmarks AS b SET
+                guid = v.guid, name = v.name, type = v.type, url = v.url, date_added = v.date_added, parent_id = v.parent_id,
+                source = v.source, profile = v.profile, path = v.path, parent_path = v.parent_path, content_hash = v.content_hash
+            FROM (VALUES %s) AS v(id, guid, name, type, url, date_added, parent_id, source, profile, path, parent_path, content_hash)
+            WHERE b.id = v.id;
+        """, values, template="(%s::integer, %s, %s, %s, %s, %s::bigint, %s::integer, %s, %s, %s, %s, %s)", page_size=SYNC_PAGE_SIZE)
+        counts['updated'] = len(updates)
+
+    synced = {r['guid'] for r in rows}
+    gone = [guid for guid, entry in existing.items() if entry[5] in managed_sources and guid not in synced]
+    stale_ids = [existing[guid][0] for guid in gone] + [e[0] for entries in legacy_by_path.values() for e in entries if e[5] in managed_sources]
+    if stale_ids:
+        cur.execute("DELETE FROM chrome_bookmarks WHERE id = ANY(%s)", (stale_ids,))
+        counts['deleted'] = cur.rowcount
+
+    for guid in gone:
+        del existing[guid]
+    for r in rows:
+        existing[r['guid']] = (id_by_guid[r['guid']], id_by_guid.get(r['parent_guid']), r['hash'], r['path'], r['name'], r['source'])
+    return counts
+
+ALLOWED_FOLDERS = {
+    "AI",
+    "Tech & Engineering",
+    "Coding Games",
+    "No-Code",
+    "Data Science & Machine Learning",
+    "Startups & Business",
+    "Research",
+    "Academic Tools",
+    "Reference/Citation Map",
+    "Digital Humanities",
+    "Media Analytics",
+    "Design & Creative",
+    "Education",
+    "Journalism"
+}
+# Seconds the Bookmarks files must stay quiet before watch mode syncs a burst of edits
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("CHROME_WATCH_DEBOUNCE_SECONDS", "3"))
+
+
+def read_bookmark_rows(bookmarks_path, allowed_folders, profile=None):
+    """
+    Parses a Bookmarks file and flattens every valid root. Returns (rows, managed sources).
+    Raises OSError or ValueError (json.JSONDecodeError included) for an unreadable file.
+    """
+    with open(bookmarks_path, 'r', encoding='utf-8') as f:
+        bookmarks_data = json.load(f)
+    roots = bookmarks_data.get('roots')
+    if not roots or not isinstance(roots, dict):
+        raise ValueError("'roots' key not found or not a dictionary in bookmarks file.")
+
+    rows = []
+    source_keys_processed_this_run = set() # Track which roots we are managing
+    for root_key, root_node_from_chrome in roots.items():
+        if not root_node_from_chrome or root_node_from_chrome.get('type') != 'folder':
+            print(f"Skipping root '{root_key}' as it's not a valid folder or is missing.", file=sys.stderr)
+        elif root_node_from_chrome.get('name', root_key):
+            root_rows = flatten_tree(root_node_from_chrome, root_key, allowed_folders, profile)
+            print(f"Flattened {len(root_rows)} items for root: {root_rows[0]['name']} (Source: {root_key}, profile: {profile})")
+            rows.extend(root_rows)
+            source_keys_processed_this_run.add(root_key)
+    return rows, source_keys_processed_this_run
+
+
+def merge_profile_rows(results):
+    """
+    Merges read_bookmark_rows results of several profiles, in priority order, into one tree.
+    Nodes are deduplicated on guid, so roots (which carry the same fixed guid in every profile)
+    and folders synced between profiles appear once, from the first profile that has them.
+    A node's path is rebuilt from the parent it ends up under, which may come from an earlier
+    profile. Returns (rows, managed sources), parents before children.
+    """
+    merged = {}
+    sources = set()
+    for rows, profile_sources in results:
+        sources |= profile_sources
+        for row in rows:
+            if row['guid'] in merged:
+                continue
+            parent = merged.get(row['parent_guid'])
+            if parent is not None:
+                row['parent_path'] = parent['path']
+                row['path'] = f"{parent['path']}{PATH_SEPARATOR}{row['name']}"
+                row['depth'] = parent['depth'] + 1
+            merged[row['guid']] = row
+    return list(merged.values()), sources
+
+
+def read_profiles(bookmark_files, allowed_folders):
+    """
+    Reads every (profile, path) from find_bookmark_files and merges them. Several profiles are
+    parsed in parallel worker processes (JSON parsing holds the GIL), so the wall time is close
+    to that of the largest file. With one file or one CPU they are read in this process, where
+    workers would only add the cost of sending rows back. Any unreadable file fails the whole
+    read: syncing without it would delete its bookmarks.
+    """
+    profiles = [profile for profile, _ in bookmark_files]
+    paths = [path for _, path in bookmark_files]
+    workers = min(len(bookmark_files), os.cpu_count() or 1)
+    if workers <= 1:
+        results = list(map(read_bookmark_rows, paths, repeat(allowed_folders), profiles))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(read_bookmark_rows, paths, repeat(allowed_folders), profiles))
+    return merge_profile_rows(results)
+
 
-    current_item_db_id = None
-    node_name = node_data.get('name') # For constructing the child's parent_full_path
+def print_summary(counts):
+    print("\n--- Sync Summary ---")
+    print(f"Total items processed from Chrome data (after filtering): {counts['processed']}")
+    print(f"New items added to the database: {counts['inserted']}")
+    print(f"Existing items updated: {counts['updated']} ({counts['repathed']} descendant paths rewritten, {counts['unchanged']} unchanged)")
+    print(f"Items deleted from the database: {counts['deleted']}")
 
-    current_item_db_id = insert_or_get_id(node_data, parent_id_in_db, parent_full_path, source_key, existing_paths_in_db_set, cursor, connection)
+    if counts['processed'] == 0:
+        print("No bookmarks matched the allowed folder names or roots were empty.")
+
+
+def deploy_if_changed(counts, wait=None):
+    # Request a Vercel build if any changes were made; deploy_hook coalesces it with other syncs
+    changes = counts['inserted'] + counts['updated'] + counts['deleted']
+
+    if changes:
+        deploys = DeployCoordinator.from_env(get_db_connection)
+        try:
+            deploys.request('chrome_bookmarks', changes, wait=wait)
+            deploys.print_stats()
+        except psycopg2.Error as e:
+            print(f"Could not record the deploy request: {e}", file=sys.stderr)
+        finally:
+            deploys.close()
+    else:
+        print("\nNo changes detected in database. Skipping Vercel build trigger.")
+
+
+def flush_deploys():
+    """Waits for the pending deploy batch and builds it, on a connection of its own."""
+    deploys = DeployCoordinator.from_env(get_db_connection)
+    try:
+        deploys.flush(wait=True)
+    except psycopg2.Error as e:
+        print(f"Could not flush the pending deploy: {e}", file=sys.stderr)
+    finally:
+        deploys.close()
+
+
+def watch(bookmark_files, allowed_folders):
+    """
+    Keeps chrome_bookmarks in sync with the profiles' Bookmarks files until interrupted. Each
+    debounced change re-reads the files and diffs the merged tree against the in-memory snapshot
+    of the last sync, so only the delta is written, over one connection held for the whole
+    session. Any database error drops the connection and snapshot; the next change reconnects
+    and diffs against the table. Profiles created after the start are picked up on restart.
+    """
+    conn = None
+    existing = None
+    deployer = None
+    file_state = load_file_state()
+    # Watching starts here, before the initial sync, so an edit made while it runs triggers a resync
+    changes = watch_files([path for _, path in bookmark_files], debounce=WATCH_DEBOUNCE_SECONDS)
+    print(f"Watching {len(bookmark_files)} Bookmarks file(s) (debounce {WATCH_DEBOUNCE_SECONDS:g}s). Press Ctrl+C to stop.")
+    try:
+        while True:
+            try:
+                signatures = {str(path): file_signature(path, allowed_folders) for _, path in bookmark_files}
+                if existing is not None and profiles_unchanged(file_state, signatures):
+                    next(changes)
+                    continue
+                rows, sources = read_profiles(bookmark_files, allowed_folders)
+            except (OSError, ValueError) as e:
+                print(f"Error reading or parsing the bookmarks file: {e}. Waiting for the next change.", file=sys.stderr)
+                next(changes)
+                continue
+
+            started = time.time()
+            try:
+                if conn is None or conn.closed:
+                    conn = get_db_connection()
+                    existing = None
+                cur = conn.cursor()
+                if existing is None:
+                    existing, legacy_by_path = load_existing_bookmarks(cur)
+                    counts = sync_bookmark_rows(cur, rows, sources, existing, legacy_by_path)
+                else:
+                    counts = sync_bookmark_rows(cur, rows, sources, existing)
+                conn.commit()
+            except psycopg2.Error as e:
+                print(f"Database error, will reconnect on the next change: {e}", file=sys.stderr)
+                existing = None
+                if conn is not None:
+                    conn.close()
+                    conn = None
+                next(changes)
+                continue
+            del rows
+
+            print(f"Synced in {time.time() - started:.2f}s: {counts['inserted']} new, {counts['updated']} updated, "
+                  f"{counts['repathed']} repathed, {counts['deleted']} deleted.")
+            file_state = signatures
+            save_file_state(file_state)
+            if counts['inserted'] or counts['updated'] or counts['deleted']:
+                deploy_if_changed(counts, wait=False)
+                # Builds the batch once it is due without blocking the watch loop
+                if deployer is None or not deployer.is_alive():
+                    deployer = threading.Thread(target=flush_deploys, daemon=True)
+                    deployer.start()
+            next(changes)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    finally:
+        changes.close()
+        if conn is not None:
+            conn.close()
+            print("Database connection closed.")
 
-    if node_data.get('type') == 'folder' and current_item_db_id is not None:
-        # Construct the parent_full_path for children of *this* node
-        childrens_parent_path = f"{parent_full_path}>>{node_name}" if parent_full_path else node_name
-        for child_node in node_data.get('children', []):
-            process_filtered_structure_for_db(child_node, current_item_db_id, 
-                                             childrens_parent_path,
-                                             source_key, existing_paths_in_db_set, cursor, connection)
 
 def main():
-    global newly_added_count_global, processed_count_global, deleted_count_global, processed_paths_this_run
-    newly_added_count_global = 0
-    processed_count_global = 0
-    deleted_count_global = 0 
-    processed_paths_this_run = set()
+    counts = {'processed': 0, 'inserted': 0, 'updated': 0, 'repathed': 0, 'unchanged': 0, 'deleted': 0}
 
     if not DB_HOST or not DB_PASSWORD:
         print("Error: Database credentials (SUPABASE_DB_HOST, SUPABASE_DB_PASSWORD) not set in environment variables.", file=sys.stderr)
         sys.exit(1)
 
-    bookmarks_path = get_chrome_bookmarks_path()
-    # output_filename = "chrome_bookmarks.json" # No longer primary output
-    # script_dir = Path(__file__).parent.resolve()
-    # output_path = script_dir / output_filename # No longer primary output
-
-    allowed_folders = {
-        "AI", 
-        "Tech & Engineering",
-        "Coding Games",
-        "No-Code",
-        "Data Science & Machine Learning",
-        "Startups & Business", 
-        "Research",
-        "Academic Tools", 
-        "Reference/Citation Map",
-        "Digital Humanities",
-        "Media Analytics",
-        "Design & Creative",
-        "Education",
-        "Journalism"
-    }
+    bookmark_files = find_bookmark_files()
+    allowed_folders = ALLOWED_FOLDERS
 
-    if not bookmarks_path:
+    if not bookmark_files:
         print("Error: Could not automatically locate a Chrome bookmarks file.", file=sys.stderr)
         print("Please ensure Chrome is installed and check your profile directories.", file=sys.stderr)
         sys.exit(1)
 
+    if '--watch' in sys.argv:
+        watch(bookmark_files, allowed_folders)
+        http.print_stats()
+        return
+
+    file_state = load_file_state()
+    signatures = {str(path): file_signature(path, allowed_folders) for _, path in bookmark_files}
+    if '--force' not in sys.argv and profiles_unchanged(file_state, signatures):
+        print(f"All {len(signatures)} Bookmarks file(s) unchanged since the last sync. Nothing to do; use --force to resync.")
+        return
+
     conn = None
     sync_failed = False
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        print("Successfully connected to the database.")
-
-        existing_db_paths = set()
-        try:
-            cur.execute("SELECT path FROM chrome_bookmarks")
-            for row in cur.fetchall():
-                if row[0] is not None: # Paths can be NULL if there was an issue
-                    existing_db_paths.add(row[0])
-            print(f"Fetched {len(existing_db_paths)} existing bookmark paths from the database.")
-        except psycopg2.Error as e:
-            print(f"Error fetching existing bookmarks: {e}", file=sys.stderr)
-            if conn: conn.close()
-            sys.exit(1)
-        
-        bookmarks_data = None
         try:
-            with open(bookmarks_path, 'r', encoding='utf-8') as f:
-                bookmarks_data = json.load(f)
-        except json.JSONDecodeError as e:
+            started = time.time()
+            rows, source_keys_processed_this_run = read_profiles(bookmark_files, allowed_folders)
+            print(f"Read {len(rows)} unique items from {len(bookmark_files)} profile(s) in {time.time() - started:.2f}s.")
+        except (OSError, ValueError) as e:
             print(f"Error reading or parsing the bookmarks file: {e}", file=sys.stderr)
-            if conn: conn.close()
-            sys.exit(1)
-        except IOError as e:
-            print(f"Error opening the bookmarks file: {e}", file=sys.stderr)
-            if conn: conn.close()
             sys.exit(1)
 
-        roots = bookmarks_data.get('roots')
-        if not roots or not isinstance(roots, dict):
-            print("Error: 'roots' key not found or not a dictionary in bookmarks file.", file=sys.stderr)
-            if conn: conn.close()
-            sys.exit(1)
+        conn = get_db_connection()
+        cur = conn.cursor()
+        print("Successfully connected to the database.")
 
-        # This structure will hold the filtered bookmarks, similar to the old structured_bookmarks
-        filtered_roots_for_db_processing = {}
-        source_keys_processed_this_run = [] # Track which roots we are managing
-
-        for root_key, root_node_from_chrome in roots.items():
-            if root_node_from_chrome and root_node_from_chrome.get('type') == 'folder':
-                current_root_data = {
-                    'type': 'folder',
-                    'name': root_node_from_chrome.get('name', root_key),
-                    'date_added': root_node_from_chrome.get('date_added'),
-                    'children': []
-                }
-                if 'children' in root_node_from_chrome:
-                    for child_of_root in root_node_from_chrome.get('children', []):
-                        processed_child = extract_bookmarks(child_of_root, allowed_folders)
-                        if processed_child:
-                            current_root_data['children'].append(processed_child)
-                
-                if current_root_data['name']:
-                     filtered_roots_for_db_processing[root_key] = current_root_data
-                     if root_key not in source_keys_processed_this_run: # Ensure we only add once
-                         source_keys_processed_this_run.append(root_key)
-            else:
-                print(f"Skipping root '{root_key}' as it's not a valid folder or is missing.", file=sys.stderr)
-
-        if not filtered_roots_for_db_processing:
+        if not rows:
             print("Warning: No valid bookmark roots found or all were empty after initial processing.", file=sys.stderr)
         else:
-            for root_source_key, root_data_to_insert in filtered_roots_for_db_processing.items():
-                print(f"\nProcessing and syncing bookmarks for root: {root_data_to_insert.get('name')} (Source: {root_source_key})")
-                try:
-                    process_filtered_structure_for_db(
-                        node_data=root_data_to_insert,
-                        parent_id_in_db=None,
-                        parent_full_path=None, 
-                        source_key=root_source_key,
-                        existing_paths_in_db_set=existing_db_paths, 
-                        cursor=cur,
-                        connection=conn
-                    )
-                    conn.commit() 
-                    print(f"Successfully processed and committed root: {root_data_to_insert.get('name')}")
-                except Exception as e:
-                    print(f"Critical error while processing root '{root_data_to_insert.get('name')}' : {e}. Rolling back changes for this root.", file=sys.stderr)
-                    conn.rollback()
-                    raise
-        
-        # --- Deletion Logic ---
-        if source_keys_processed_this_run:
-            print("\n--- Starting Deletion Sync ---")
-            db_paths_for_managed_sources = set()
+            print("\nSyncing bookmarks...")
+            started = time.time()
             try:
-                cur.execute("SELECT path FROM chrome_bookmarks WHERE source = ANY(%s)", (source_keys_processed_this_run,))
-                for row in cur.fetchall():
-                    if row[0] is not None:
-                        db_paths_for_managed_sources.add(row[0])
-                print(f"Fetched {len(db_paths_for_managed_sources)} paths from DB for managed sources: {source_keys_processed_this_run}")
-
-                paths_to_delete = db_paths_for_managed_sources - processed_paths_this_run
-                
-                if paths_to_delete:
-                    print(f"Found {len(paths_to_delete)} orphaned paths to delete.")
-                    # Example: print first 5 paths to be deleted for logging
-                    # for i, p_del in enumerate(list(paths_to_delete)[:5]):
-                    #     print(f"  Preview delete: {p_del}")
-                    # if len(paths_to_delete) > 5:
-                    #     print(f"  ...and {len(paths_to_delete) - 5} more.")
-
-                    for path_to_del in paths_to_delete:
-                        try:
-                            # Ensure deletion is only for managed sources to be safe
-                            cur.execute("DELETE FROM chrome_bookmarks WHERE path = %s AND source = ANY(%s)", 
-                                        (path_to_del, source_keys_processed_this_run))
-                            if cur.rowcount > 0:
-                                deleted_count_global += cur.rowcount
-                        except psycopg2.Error as e_del:
-                            print(f"Error deleting path '{path_to_del}': {e_del}", file=sys.stderr)
-                            conn.rollback() # Rollback this specific deletion attempt
-                            raise
-                    
-                    if deleted_count_global > 0: # Only commit if actual deletions happened
-                        conn.commit()
-                        print(f"Committed deletion of {deleted_count_global} orphaned items.")
-                    else:
-                        # This could happen if rowcount was 0 for all attempted deletions or errors occurred
-                        print("No items were confirmed deleted in this batch (or errors occurred during deletion attempts).")
-                else:
-                    print("No orphaned paths found. Database is in sync with current Chrome bookmarks for managed sources.")
-
-            except psycopg2.Error as e_sync:
-                print(f"Error during deletion sync phase: {e_sync}", file=sys.stderr)
+                counts = sync_bookmark_rows(cur, rows, source_keys_processed_this_run)
+                conn.commit()
+            except psycopg2.Error:
                 conn.rollback()
                 raise
-        else:
-            print("\nSkipping deletion sync as no bookmark sources were processed in this run.")
-
-        print("\n--- Sync Summary ---")
-        print(f"Total items processed from Chrome data (after filtering): {processed_count_global}")
-        print(f"New items added to the database: {newly_added_count_global}")
-        print(f"Items deleted from the database: {deleted_count_global}") # New summary line
-        
-        if processed_count_global == 0 and newly_added_count_global == 0 and deleted_count_global == 0:
-             if not any(filtered_roots_for_db_processing.values()):
-                 print("No bookmarks matched the allowed folder names or roots were empty.")
-             else:
-                 print("All found and filtered bookmarks were already present in the database.")
+            print(f"Synced {counts['processed']} items in {time.time() - started:.2f}s.")
+        save_file_state(signatures)
+        print_summary(counts)
 
     except psycopg2.Error as e:
         print(f"Database connection or operational error: {e}", file=sys.stderr)
@@ -461,18 +668,8 @@ def main():
             print("\nBookmark sync failed. Skipping Vercel build trigger.", file=sys.stderr)
             sys.exit(1)
         else:
-            # Trigger Vercel build if any changes were made
-            changes_made = newly_added_count_global > 0 or deleted_count_global > 0
-
-            if changes_made:
-                vercel_hook_url = os.getenv("VERCEL_DEPLOY_HOOK_URL")
-                if vercel_hook_url:
-                    print("\nAttempting to trigger Vercel deployment...")
-                    trigger_vercel_deploy(vercel_hook_url)
-                else:
-                    print("\nInfo: VERCEL_DEPLOY_HOOK_URL not set in environment. Skipping Vercel build trigger despite changes.", file=sys.stderr)
-            else:
-                print("\nNo changes detected in database. Skipping Vercel build trigger.")
+            deploy_if_changed(counts)
+        http.print_stats()
 
 if __name__ == "__main__":
     main() 
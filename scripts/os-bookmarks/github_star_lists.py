@@ -0,0 +1,318 @@
+"""
+Fetches a user's GitHub Star Lists membership over GraphQL.
+
+    python github_star_lists.py bench [--lists N] [--latency SECONDS] [--fixture lists.json]
+
+The lists query also asks for each list's first page of items, so most lists are done in
+one round trip. Lists with more items are paged by continuation queries that use aliases
+(l0: node(id: $id0) ..., l1: ...) to advance up to STAR_LISTS_BATCH lists at once. Those
+queries run STAR_LISTS_CONCURRENCY at a time over the shared http_client session. Every
+response updates a shared rate-limit budget from the x-ratelimit-* headers and the rateLimit
+{ cost remaining resetAt } field. When the budget runs low, requests wait for the reset.
+Secondary limits and 5xx responses are retried by http_client.
+
+`bench` compares this fetcher to the previous one-list-one-page-at-a-time walk. It runs
+against a local stand-in of the GraphQL endpoint that answers with a fixed dataset after a
+simulated network latency.
+"""
+import os
+import sys
+import json
+import time
+import random
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+from http_client import http as shared_http
+
+GRAPHQL_ENDPOINT = "https://api.github.com/graphql"
+STAR_LISTS_CONCURRENCY = int(os.getenv("STAR_LISTS_CONCURRENCY", "4"))
+STAR_LISTS_BATCH = int(os.getenv("STAR_LISTS_BATCH", "10"))
+# Stop and keep the stored list names rather than sleep longer than this for a rate-limit reset
+STAR_LISTS_MAX_WAIT = float(os.getenv("STAR_LISTS_MAX_WAIT", "120"))
+PAGE_SIZE = 100
+
+ITEMS_FIELDS = "pageInfo { hasNextPage endCursor } nodes { ... on Repository { databaseId } }"
+
+LISTS_QUERY = """
+query ($login: String!, $after: String) {
+  rateLimit { cost remaining resetAt }
+  user(login: $login) {
+    lists(first: %d, after: $after) {
+      pageInfo { hasNextPage endCursor }
+      nodes { id name items(first: %d) { %s } }
+    }
+  }
+}
+""" % (PAGE_SIZE, PAGE_SIZE, ITEMS_FIELDS)
+
+
+def items_query(count):
+    """Continuation query advancing `count` lists at once, aliased l0..l<count-1>."""
+    params = ", ".join(f"$id{i}: ID!, $after{i}: String" for i in range(count))
+    fields = "\n".join(
+        f"  l{i}: node(id: $id{i}) {{ ... on UserList {{ items(first: {PAGE_SIZE}, after: $after{i}) {{ {ITEMS_FIELDS} }} }} }}"
+        for i in range(count))
+    return f"query ({params}) {{\n  rateLimit {{ cost remaining resetAt }}\n{fields}\n}}"
+
+
+class StarListsError(Exception):
+    pass
+
+
+class RateLimit:
+    """Point budget shared by the concurrent requests, refreshed from every response."""
+
+    def __init__(self, max_wait=STAR_LISTS_MAX_WAIT):
+        self.lock = threading.Lock()
+        self.remaining = None
+        self.reset_at = None
+        self.cost = 1
+        self.max_wait = max_wait
+
+    def update(self, headers, rate_limit=None):
+        with self.lock:
+            if headers.get("x-ratelimit-remaining") is not None:
+                self.remaining = int(headers["x-ratelimit-remaining"])
+            if headers.get("x-ratelimit-reset") is not None:
+                self.reset_at = float(headers["x-ratelimit-reset"])
+            if rate_limit:
+                self.cost = max(1, int(rate_limit.get("cost") or 1))
+                if rate_limit.get("remaining") is not None:
+                    self.remaining = int(rate_limit["remaining"])
+                if rate_limit.get("resetAt"):
+                    self.reset_at = datetime.fromisoformat(rate_limit["resetAt"].replace("Z", "+00:00")).timestamp()
+
+    def acquire(self, reserve):
+        """Waits for the reset if fewer than `reserve` queries' worth of points are left."""
+        with self.lock:
+            if self.remaining is None or self.remaining >= self.cost * reserve:
+                if self.remaining is not None:
+                    self.remaining -= self.cost
+                return
+            delay = (self.reset_at or time.time()) - time.time()
+            if delay > self.max_wait:
+                raise StarListsError(f"GraphQL rate limit exhausted until {time.ctime(self.reset_at)}")
+            print(f"GitHub GraphQL rate limit low ({self.remaining} points left); waiting {max(delay, 0):.0f}s for reset.",
+                  file=sys.stderr)
+            # Held under the lock so the other workers wait for the same reset
+            time.sleep(max(delay, 0) + 1)
+            self.remaining = None
+
+
+class GraphQLClient:
+    def __init__(self, token, endpoint=GRAPHQL_ENDPOINT, concurrency=STAR_LISTS_CONCURRENCY, http=shared_http):
+        self.endpoint = endpoint
+        self.concurrency = concurrency
+        self.rate_limit = RateLimit()
+        self.http = http
+        self.headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+
+    def query(self, query, variables):
+        self.rate_limit.acquire(self.concurrency)
+        # Queries are read-only, so the POST is safe to retry
+        r = self.http.post(self.endpoint, json={"query": query, "variables": variables}, headers=self.headers, retry=True)
+        self.rate_limit.update(r.headers)
+        r.raise_for_status()
+        payload = r.json()
+        if payload.get("errors"):
+            raise StarListsError(f"GitHub GraphQL errors: {payload['errors']}")
+        data = payload.get("data") or {}
+        self.rate_limit.update({}, data.get("rateLimit"))
+        return data
+
+
+def next_cursor(connection):
+    pinfo = connection.get("pageInfo") or {}
+    return pinfo["endCursor"] if pinfo.get("hasNextPage") and pinfo.get("endCursor") else None
+
+
+def add_items(repo_to_lists, list_name, items_conn):
+    """Records one page of list items; returns the next cursor or None."""
+    for item in items_conn.get("nodes") or []:
+        rid = (item or {}).get("databaseId")
+        if rid is not None:
+            repo_to_lists.setdefault(int(rid), set()).add(list_name)
+    return next_cursor(items_conn)
+
+
+def fetch_star_lists(client, username):
+    """Returns {repo id: sorted list names}; raises StarListsError or requests errors on failure."""
+    repo_to_lists = {}
+    names = {}
+    pending = []  # (list id, cursor) still to page
+
+    lists_after = None
+    while True:
+        data = client.query(LISTS_QUERY, {"login": username, "after": lists_after})
+        user_data = data.get("user")
+        if not user_data:
+            raise StarListsError("GitHub GraphQL: user not found or lists unavailable.")
+        lists_conn = user_data.get("lists") or {}
+        for node in lists_conn.get("nodes") or []:
+            if not node.get("id") or not node.get("name"):
+                continue
+            names[node["id"]] = node["name"]
+            cursor = add_items(repo_to_lists, node["name"], node.get("items") or {})
+            if cursor:
+                pending.append((node["id"], cursor))
+        lists_after = next_cursor(lists_conn)
+        if not lists_after:
+            break
+
+    def page(batch):
+        variables = {}
+        for i, (list_id, cursor) in enumerate(batch):
+            variables[f"id{i}"] = list_id
+            variables[f"after{i}"] = cursor
+        return batch, client.query(items_query(len(batch)), variables)
+
+    with ThreadPoolExecutor(max_workers=client.concurrency, thread_name_prefix='star-lists') as executor:
+        running = set()
+        while pending or running:
+            while pending:
+                running.add(executor.submit(page, pending[:STAR_LISTS_BATCH]))
+                pending = pending[STAR_LISTS_BATCH:]
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch, data = future.result()
+                for i, (list_id, _) in enumerate(batch):
+                    items_conn = (data.get(f"l{i}") or {}).get("items") or {}
+                    cursor = add_items(repo_to_lists, names[list_id], items_conn)
+                    if cursor:
+                        pending.append((list_id, cursor))
+
+    # sorted stable output for DB / diffs
+    return {k: sorted(v) for k, v in repo_to_lists.items()}
+
+
+def get_star_lists_by_repo_id(username, token, endpoint=GRAPHQL_ENDPOINT):
+    """fetch_star_lists with its own client; None on any failure so callers keep the stored list names."""
+    try:
+        return fetch_star_lists(GraphQLClient(token, endpoint), username)
+    except (StarListsError, requests.exceptions.RequestException) as e:
+        print(f"GitHub GraphQL Star Lists fetch failed: {e}", file=sys.stderr)
+        return None
+
+
+# --- Benchmark -------------------------------------------------------------
+
+def legacy_star_lists(username, token, endpoint):
+    """The previous fetcher: one list at a time, one 100-item page per requests.post, no shared session."""
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    lists_query = "query ($login: String!, $after: String) { user(login: $login) { lists(first: 50, after: $after) { pageInfo { hasNextPage endCursor } nodes { id name } } } }"
+    one_list_query = "query ($id: ID!, $after: String) { node(id: $id) { ... on UserList { items(first: 100, after: $after) { %s } } } }" % ITEMS_FIELDS
+    repo_to_lists = {}
+    lists_after = None
+    while True:
+        lists_conn = requests.post(endpoint, json={"query": lists_query, "variables": {"login": username, "after": lists_after}},
+                                   headers=headers, timeout=90).json()["data"]["user"]["lists"]
+        for node in lists_conn["nodes"]:
+            items_after = None
+            while True:
+                items_conn = requests.post(endpoint, json={"query": one_list_query, "variables": {"id": node["id"], "after": items_after}},
+                                           headers=headers, timeout=90).json()["data"]["node"]["items"]
+                items_after = add_items(repo_to_lists, node["name"], items_conn)
+                if not items_after:
+                    break
+        lists_after = next_cursor(lists_conn)
+        if not lists_after:
+            break
+    return {k: sorted(v) for k, v in repo_to_lists.items()}
+
+
+def synthetic_lists(count, seed=7):
+    """A few large lists and many small ones, like a real account."""
+    rng = random.Random(seed)
+    repos = list(range(1, 20001))
+    return [{"id": f"UL_{i}", "name": f"List {i}", "items": rng.sample(repos, rng.choice([3, 20, 60, 150, 400, 1200]))}
+            for i in range(count)]
+
+
+def serve_stand_in(lists, latency):
+    """Starts a local GraphQL stand-in answering the queries above from `lists`; returns (server, url)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    by_id = {l["id"]: l for l in lists}
+
+    def items_page(items, after):
+        start = int(after or 0)
+        end = start + PAGE_SIZE
+        return {"pageInfo": {"hasNextPage": end < len(items), "endCursor": str(end)},
+                "nodes": [{"databaseId": rid} for rid in items[start:end]]}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            query, variables = body["query"], body["variables"]
+            time.sleep(latency)
+            if "login" in variables:
+                start = int(variables.get("after") or 0)
+                size = PAGE_SIZE if "items(first" in query else 50
+                page = lists[start:start + size]
+                nodes = [{"id": l["id"], "name": l["name"]} for l in page]
+                if "items(first" in query:
+                    for node, l in zip(nodes, page):
+                        node["items"] = items_page(l["items"], None)
+                data = {"user": {"lists": {"pageInfo": {"hasNextPage": start + size < len(lists), "endCursor": str(start + size)},
+                                           "nodes": nodes}}}
+            elif "id" in variables:
+                data = {"node": {"items": items_page(by_id[variables["id"]]["items"], variables["after"])}}
+            else:
+                data = {}
+                i = 0
+                while f"id{i}" in variables:
+                    data[f"l{i}"] = {"items": items_page(by_id[variables[f"id{i}"]]["items"], variables[f"after{i}"])}
+                    i += 1
+            data["rateLimit"] = {"cost": 1, "remaining": 4999, "resetAt": "2099-01-01T00:00:00Z"}
+            payload = json.dumps({"data": data}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.send_header("x-ratelimit-remaining", "4999")
+            self.send_header("x-ratelimit-reset", str(int(time.time()) + 3600))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/graphql"
+
+
+def benchmark(lists, latency):
+    server, url = serve_stand_in(lists, latency)
+    try:
+        items = sum(len(l["items"]) for l in lists)
+        print(f"{len(lists)} lists, {items} items, {latency * 1000:.0f}ms simulated latency")
+        started = time.perf_counter()
+        legacy = legacy_star_lists("bench", "token", url)
+        legacy_s = time.perf_counter() - started
+        started = time.perf_counter()
+        batched = get_star_lists_by_repo_id("bench", "token", url)
+        batched_s = time.perf_counter() - started
+        print(f"sequential: {legacy_s:.2f}s")
+        print(f"batched:    {batched_s:.2f}s ({legacy_s / batched_s:.1f}x), results identical: {legacy == batched}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "bench":
+        print(__doc__)
+        sys.exit(1)
+    args = sys.argv[2:]
+    option = lambda name, default: type(default)(args[args.index(name) + 1]) if name in args else default
+    if "--fixture" in args:
+        with open(option("--fixture", ""), "r", encoding="utf-8") as f:
+            bench_lists = json.load(f)
+    else:
+        bench_lists = synthetic_lists(option("--lists", 30))
+    benchmark(bench_lists, option("--latency", 0.08))
@@ -0,0 +1,184 @@
+"""
+HTTP layer shared by the sync scripts: one pooled keep-alive session, default timeouts, retries
+with backoff, an optional on-disk conditional-request cache, and per-host statistics.
+
+    from http_client import http
+    response = http.get(url, headers=...)
+
+Retries cover connection errors and 429/5xx responses (plus 403 carrying Retry-After, GitHub's
+secondary rate limit). The wait is Retry-After, else the x-ratelimit-reset / x-rate-limit-reset
+time, else exponential backoff. If the server asks for longer than HTTP_MAX_RETRY_WAIT, the
+response goes back to the caller, which may have its own policy for long rate-limit windows.
+Only GET/HEAD are retried unless the call passes retry=True.
+
+With HTTP_CACHE_DIR set, GET responses carrying an ETag or Last-Modified are stored there. The
+next identical request is sent conditionally, and a 304 is answered from the stored copy (its
+`from_cache` attribute is True). A request that sets its own If-None-Match bypasses the cache.
+"""
+import os
+import sys
+import json
+import time
+import base64
+import random
+import hashlib
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_MAX_RETRY_WAIT = float(os.getenv("HTTP_MAX_RETRY_WAIT", "60"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD"}
+CACHED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Link")
+
+
+def retry_delay(response, attempt):
+    """Seconds to wait before retrying `response`, from its headers or exponential backoff with jitter."""
+    headers = response.headers if response is not None else {}
+    if headers.get("Retry-After"):
+        try:
+            return float(headers["Retry-After"])
+        except ValueError:
+            pass
+    reset = headers.get("x-ratelimit-reset") or headers.get("x-rate-limit-reset")
+    if response is not None and response.status_code in (403, 429) and reset:
+        return max(float(reset) - time.time(), 0) + 1
+    return min(2 ** attempt, 30) * (0.5 + random.random() / 2)
+
+
+class HttpClient:
+    def __init__(self, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_TIMEOUT), retries=HTTP_RETRIES,
+                 max_retry_wait=HTTP_MAX_RETRY_WAIT, pool_size=HTTP_POOL_SIZE, cache_dir=HTTP_CACHE_DIR):
+        self.timeout = timeout
+        self.retries = retries
+        self.max_retry_wait = max_retry_wait
+        self.cache_dir = cache_dir
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def record(self, host, key, seconds=None):
+        with self.lock:
+            stats = self.stats.setdefault(host, {'requests': 0, 'retries': 0, 'errors': 0, 'not_modified': 0,
+                                                 'cache_hits': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            stats[key] += 1
+            if seconds is not None:
+                stats['seconds'] += seconds
+                stats['max_seconds'] = max(stats['max_seconds'], seconds)
+
+    def cache_path(self, method, url, kwargs):
+        headers = kwargs.get("headers") or {}
+        key = json.dumps([method, url, sorted((kwargs.get("params") or {}).items()),
+                          hashlib.sha1(str(headers.get("Authorization", "")).encode("utf-8")).hexdigest()], default=str)
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    def load_cached(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def store_cached(self, path, response):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {"url": response.url, "headers": {h: response.headers[h] for h in CACHED_HEADERS if h in response.headers},
+                 "body": base64.b64encode(response.content).decode("ascii")}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def cached_response(self, entry):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = entry["url"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = base64.b64decode(entry["body"])
+        response.encoding = "utf-8"
+        response.from_cache = True
+        return response
+
+    def request(self, method, url, retry=None, **kwargs):
+        method = method.upper()
+        retry = method in IDEMPOTENT_METHODS if retry is None else retry
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlsplit(url).netloc
+
+        cache_path = cached = None
+        headers = dict(kwargs.get("headers") or {})
+        if self.cache_dir and method == "GET" and "If-None-Match" not in headers:
+            cache_path = self.cache_path(method, url, kwargs)
+            cached = self.load_cached(cache_path)
+            if cached:
+                if cached["headers"].get("ETag"):
+                    headers["If-None-Match"] = cached["headers"]["ETag"]
+                if cached["headers"].get("Last-Modified"):
+                    headers["If-Modified-Since"] = cached["headers"]["Last-Modified"]
+                kwargs["headers"] = headers
+
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.record(host, 'requests', time.perf_counter() - started)
+                self.record(host, 'errors')
+                if not retry or attempt == self.retries:
+                    raise
+                delay = retry_delay(None, attempt)
+                print(f"{method} {host} failed ({e.__class__.__name__}); retrying in {delay:.1f}s.", file=sys.stderr)
+                self.record(host, 'retries')
+                time.sleep(delay)
+                continue
+            self.record(host, 'requests', time.perf_counter() - started)
+
+            retryable = response.status_code in RETRY_STATUSES or (response.status_code == 403 and "Retry-After" in response.headers)
+            if retryable and retry and attempt < self.retries:
+                delay = retry_delay(response, attempt)
+                if delay <= self.max_retry_wait:
+                    print(f"{method} {host} returned {response.status_code}; retrying in {delay:.1f}s.", file=sys.stderr)
+                    self.record(host, 'retries')
+                    time.sleep(delay)
+                    continue
+            if response.status_code >= 400:
+                self.record(host, 'errors')
+            elif response.status_code == 304:
+                self.record(host, 'not_modified')
+                if cached:
+                    self.record(host, 'cache_hits')
+                    return self.cached_response(cached)
+            elif cache_path and response.status_code == 200 and ("ETag" in response.headers or "Last-Modified" in response.headers):
+                self.store_cached(cache_path, response)
+            response.from_cache = False
+            return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def print_stats(self):
+        if not self.stats:
+            return
+        print("\n--- HTTP ---")
+        for host, s in sorted(self.stats.items()):
+            print(f"{host}: {s['requests']} requests, {s['retries']} retries, {s['errors']} errors, "
+                  f"{s['not_modified']} not modified ({s['cache_hits']} from cache), "
+                  f"avg {s['seconds'] / max(s['requests'], 1) * 1000:.0f}ms, max {s['max_seconds'] * 1000:.0f}ms")
+
+
+# Shared by every fetcher in the process, so they reuse one connection pool
+http = HttpClient()
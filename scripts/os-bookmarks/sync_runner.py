@@ -0,0 +1,80 @@
+"""Runs independent sync sources concurrently: each fetches from its API, then writes through a shared connection pool."""
+import sys
+import time
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_source(name, fetch, write, pool, slots=None, prepare=None):
+    """
+    Fetches one source and, unless fetch returned None (source skipped), writes it with a
+    connection borrowed from `pool`. With `prepare`, fetch is called with prepare(cursor)'s
+    result, e.g. the stored watermark an incremental fetch resumes from. Any error rolls back
+    only this source's uncommitted work. psycopg2 pools raise instead of blocking when
+    exhausted, so `slots` (a semaphore sized to the pool) makes a source wait for a free
+    connection.
+
+    Returns {'name', 'status' ('ok' | 'skipped' | 'failed'), 'rows', 'fetch_s', 'write_s', 'error'},
+    where rows is whatever write returned.
+    """
+    result = {'name': name, 'status': 'ok', 'rows': [], 'fetch_s': 0.0, 'write_s': 0.0, 'error': None}
+    started = time.perf_counter()
+    try:
+        if prepare:
+            with slots or nullcontext():
+                conn = pool.getconn()
+                try:
+                    prepared = prepare(conn.cursor())
+                    conn.commit()
+                finally:
+                    pool.putconn(conn)
+            data = fetch(prepared)
+        else:
+            data = fetch()
+    except Exception as e:
+        print(f"An error occurred while fetching {name}: {e}", file=sys.stderr)
+        result.update(status='failed', error=str(e), fetch_s=time.perf_counter() - started)
+        return result
+    result['fetch_s'] = time.perf_counter() - started
+    if data is None:
+        result['status'] = 'skipped'
+        return result
+
+    started = time.perf_counter()
+    with slots or nullcontext():
+        conn = pool.getconn()
+        try:
+            result['rows'] = write(conn, data)
+            conn.commit()
+        except Exception as e:
+            print(f"An error occurred while writing {name}: {e}", file=sys.stderr)
+            conn.rollback()
+            result.update(status='failed', error=str(e))
+        finally:
+            pool.putconn(conn)
+            result['write_s'] = time.perf_counter() - started
+    return result
+
+
+def run_sources(sources, pool, max_workers=None):
+    """
+    Runs {name: (fetch, write) or (fetch, write, prepare)} concurrently, one thread per source, so the wall time is the
+    slowest source rather than the sum. A source writes as soon as its own fetch is done.
+    Returns the run_source results in the order of `sources`.
+    """
+    if not sources:
+        return []
+    slots = threading.BoundedSemaphore(pool.maxconn)
+    with ThreadPoolExecutor(max_workers=max_workers or len(sources), thread_name_prefix='sync') as executor:
+        futures = [executor.submit(run_source, name, source[0], source[1], pool, slots, *source[2:])
+                   for name, source in sources.items()]
+        return [f.result() for f in futures]
+
+
+def print_timings(results):
+    for r in results:
+        line = f"{r['name']}: {r['status']}, fetch {r['fetch_s']:.1f}s, write {r['write_s']:.1f}s"
+        if r['error']:
+            line += f" ({r['error'].splitlines()[0]})"
+        print(line)
@@ -0,0 +1,329 @@
+"""
+IVF-PQ approximate nearest-neighbour index over the video embeddings, with a
+"similar videos" query API and a neighbours export for youtube-galaxy.html.
+
+    python ann_index.py build
+    python ann_index.py similar <video id> [k]
+    python ann_index.py search "<free text>" [k]
+    python ann_index.py bench [n_synthetic]
+"""
+import os
+import sys
+import json
+import time
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+from embedding_store import DATA_DIR
+
+INDEX_PATH = os.path.join(DATA_DIR, 'ann_index', 'index.npz')
+NEIGHBORS_PATH = os.path.join(DATA_DIR, 'video-neighbors.json')
+N_NEIGHBORS_EXPORT = 5
+PQ_SUBSPACES = 32
+PQ_TRAIN_SAMPLE = 10000
+
+
+def normalize(x):
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def brute_force_search(vectors, queries, k):
+    """Exact cosine top-k over unit-normalized vectors; returns (indices, similarities) per query."""
+    sims = queries @ vectors.T
+    top = np.argpartition(-sims, min(k, sims.shape[1] - 1), axis=1)[:, :k]
+    order = np.take_along_axis(sims, top, axis=1).argsort(axis=1)[:, ::-1]
+    top = np.take_along_axis(top, order, axis=1)
+    return top, np.take_along_axis(sims, top, axis=1)
+
+
+class IvfPqIndex:
+    """
+    Inverted-file index with product-quantized residuals, for unit-normalized vectors
+    (so L2 ranking equals cosine ranking).
+
+    A coarse k-means splits the corpus into n_lists cells. Each vector's residual r from
+    its cell centroid c is compressed to one byte per subspace. For a query q,
+
+        ||q - c - r||^2 = ||q - c||^2 + (||r||^2 + 2 c.r) - 2 q.r
+
+    The middle term is stored per vector when it is added, and q.r is a sum over one
+    (subspaces x 256) lookup table per query, shared by every probed cell. The best
+    candidates from the n_probe nearest cells are then re-ranked by exact cosine against
+    the full vectors when they are available.
+
+    `ids` optionally names the vector behind each row; it is saved with the index so that
+    load() can refuse an index built from a different corpus.
+    """
+
+    def __init__(self, coarse, codebooks, codes, terms, rows, offsets, dim, ids=None):
+        self.coarse = coarse
+        self.codebooks = codebooks
+        self.codes = codes
+        self.terms = terms
+        self.rows = rows
+        self.offsets = offsets
+        self.dim = dim
+        self.ids = ids
+
+    @property
+    def n_lists(self):
+        return len(self.coarse)
+
+    @classmethod
+    def train(cls, vectors, n_lists=None, n_subspaces=PQ_SUBSPACES, seed=42, ids=None):
+        x = normalize(vectors)
+        n, dim = x.shape
+        n_lists = n_lists or max(1, min(4096, int(4 * np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+        sample = x[rng.choice(n, min(n, PQ_TRAIN_SAMPLE), replace=False)]
+
+        coarse = MiniBatchKMeans(n_clusters=n_lists, init='random', random_state=seed, n_init=3, batch_size=4096).fit(sample).cluster_centers_.astype(np.float32)
+        assign = cls._assign(coarse, x)
+
+        # Pad so the dimension splits evenly into subspaces
+        n_subspaces = min(n_subspaces, dim)
+        padded = -(-dim // n_subspaces) * n_subspaces
+        sample_assign = cls._assign(coarse, sample)
+        residuals = cls._pad(sample - coarse[sample_assign], padded).reshape(len(sample), n_subspaces, -1)
+        n_codes = min(256, len(sample))
+        codebooks = np.stack([
+            MiniBatchKMeans(n_clusters=n_codes, init='random', random_state=seed, n_init=1, max_iter=20, batch_size=2048).fit(residuals[:, j]).cluster_centers_
+            for j in range(n_subspaces)
+        ]).astype(np.float32)
+
+        index = cls(coarse, codebooks, None, None, None, None, dim, ids)
+        index._add(x, assign)
+        return index
+
+    @staticmethod
+    def _pad(x, width):
+        return x if x.shape[1] == width else np.pad(x, ((0, 0), (0, width - x.shape[1])))
+
+    @staticmethod
+    def _assign(coarse, x, chunk=8192):
+        out = np.empty(len(x), dtype=np.int64)
+        c_sq = (coarse ** 2).sum(1)
+        for start in range(0, len(x), chunk):
+            block = np.asarray(x[start:start + chunk])
+            out[start:start + chunk] = (c_sq[None, :] - 2 * block @ coarse.T).argmin(1)
+        return out
+
+    def _encode(self, residuals):
+        m, n_codes, sub = self.codebooks.shape
+        r = self._pad(residuals, m * sub).reshape(len(residuals), m, sub)
+        codes = np.empty((len(residuals), m), dtype=np.uint8)
+        for j in range(m):
+            d = (r[:, j, None, :] - self.codebooks[j][None, :, :]) ** 2
+            codes[:, j] = d.sum(-1).argmin(1)
+        return codes
+
+    def _decode(self, codes):
+        m, n_codes, sub = self.codebooks.shape
+        return self.codebooks[np.arange(m), codes].reshape(len(codes), m * sub)[:, :self.dim]
+
+    def _add(self, x, assign):
+        order = np.argsort(assign, kind='stable')
+        codes = []
+        terms = []
+        for start in range(0, len(order), 4096):
+            chunk = order[start:start + 4096]
+            centroids = self.coarse[assign[chunk]]
+            chunk_codes = self._encode(x[chunk] - centroids)
+            r = self._decode(chunk_codes)
+            codes.append(chunk_codes)
+            terms.append((r ** 2).sum(1) + 2 * (centroids * r).sum(1))
+        self.rows = order.astype(np.int64)
+        self.codes = np.concatenate(codes) if codes else np.empty((0, len(self.codebooks)), dtype=np.uint8)
+        self.terms = np.concatenate(terms).astype(np.float32) if terms else np.empty(0, dtype=np.float32)
+        self.offsets = np.searchsorted(assign[order], np.arange(self.n_lists + 1))
+
+    def search(self, query, k=10, n_probe=8, vectors=None, rerank=None):
+        """
+        Returns (rows, scores) of the k nearest vectors to query. With `vectors` (the full
+        matrix the index was built from, e.g. a memmap) the best `rerank` ADC candidates are
+        re-scored by exact cosine; otherwise scores are approximate negative squared distances.
+        """
+        q = normalize(query)
+        m, n_codes, sub = self.codebooks.shape
+        cell_dist = ((self.coarse - q) ** 2).sum(1)
+        probes = np.argpartition(cell_dist, n_probe - 1)[:n_probe] if n_probe < self.n_lists else np.arange(self.n_lists)
+        spans = [np.arange(self.offsets[c], self.offsets[c + 1]) for c in probes]
+        positions = np.concatenate(spans)
+        if not len(positions):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # (m, n_codes) table of q_j . codeword, shared by every probed cell
+        table = np.einsum('jcs,js->jc', self.codebooks, self._pad(q[None, :], m * sub).reshape(m, sub))
+        qr = table[np.arange(m), self.codes[positions]].sum(1)
+        base = np.repeat(cell_dist[probes], [len(s) for s in spans])
+        dist = base + self.terms[positions] - 2 * qr
+        rows = self.rows[positions]
+
+        shortlist = min(len(rows), k if vectors is None else (rerank or k * 10))
+        top = np.argpartition(dist, shortlist - 1)[:shortlist] if shortlist < len(rows) else np.arange(len(rows))
+        if vectors is None:
+            top = top[np.argsort(dist[top])][:k]
+            return rows[top], -dist[top]
+        cand = rows[top]
+        order = np.argsort(cand)
+        cand = cand[order]
+        sims = normalize(vectors[cand]) @ q
+        best = np.argsort(-sims)[:k]
+        return cand[best], sims[best]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        ids = {} if self.ids is None else {'ids': np.asarray([str(i) for i in self.ids])}
+        np.savez(tmp_path, coarse=self.coarse, codebooks=self.codebooks, codes=self.codes, terms=self.terms,
+                 rows=self.rows, offsets=self.offsets, dim=self.dim, **ids)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, ids=None):
+        """
+        Loads a saved index. With `ids`, the ids the rows must belong to, in order, raises
+        ValueError if the index was built from a different corpus (or saved without ids).
+        """
+        data = np.load(path)
+        saved_ids = data['ids'].tolist() if 'ids' in data.files else None
+        if ids is not None and saved_ids != [str(i) for i in ids]:
+            raise ValueError(f"{path} was built from a different set of videos; rebuild it with `python ann_index.py build`")
+        return cls(data['coarse'], data['codebooks'], data['codes'], data['terms'], data['rows'], data['offsets'],
+                   int(data['dim']), saved_ids)
+
+
+class VideoSearch:
+    """
+    "Similar videos" queries over an IvfPqIndex. Rows of the index align with `videos`, and
+    `vectors` (usually the cache's memmap selection) is used for exact re-ranking.
+    """
+
+    def __init__(self, index, videos, vectors, n_probe=8):
+        self.index = index
+        self.videos = videos
+        self.vectors = vectors
+        self.n_probe = n_probe
+        self.row_by_id = {str(v['id']): i for i, v in enumerate(videos)}
+
+    def _results(self, rows, scores, skip=None):
+        return [{'id': str(self.videos[r]['id']), 'title': self.videos[r]['title'], 'score': float(s)}
+                for r, s in zip(rows, scores) if r != skip]
+
+    def similar_to_video(self, video_id, k=10):
+        row = self.row_by_id[str(video_id)]
+        rows, scores = self.index.search(self.vectors[row], k + 1, self.n_probe, self.vectors)
+        return self._results(rows, scores, skip=row)[:k]
+
+    def similar_to_vector(self, vector, k=10):
+        rows, scores = self.index.search(vector, k, self.n_probe, self.vectors)
+        return self._results(rows, scores)
+
+    def similar_to_text(self, text, client, model, k=10):
+        """
+        Embeds text with `model`, the corpus's embedding model, and searches. Query vectors are
+        not stored: the embedding cache holds the video corpus only.
+        """
+        result = client.models.embed_content(model=model, contents=[text])
+        return self.similar_to_vector(result.embeddings[0].values, k)
+
+    def export_neighbors(self, path=NEIGHBORS_PATH, k=N_NEIGHBORS_EXPORT):
+        """Writes {video id: [k nearest video ids]} for the galaxy page's kNN overlay."""
+        started = time.time()
+        neighbors = {}
+        for video in self.videos:
+            neighbors[str(video['id'])] = [r['id'] for r in self.similar_to_video(video['id'], k)]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(neighbors, f, separators=(',', ':'))
+        print(f"Exported {k} neighbours for {len(neighbors)} videos to {path} in {time.time() - started:.1f}s.", flush=True)
+
+
+def build_index(videos, embeddings, path=INDEX_PATH):
+    started = time.time()
+    index = IvfPqIndex.train(embeddings, ids=[v['id'] for v in videos])
+    index.save(path)
+    print(f"Built IVF-PQ index over {len(videos)} videos ({index.n_lists} lists, {index.codebooks.shape[0]} subspaces) in {time.time() - started:.1f}s.", flush=True)
+    return VideoSearch(index, videos, embeddings)
+
+
+def benchmark(vectors, n_queries=500, k=10):
+    x = normalize(vectors)
+    rng = np.random.default_rng(0)
+    queries = x[rng.choice(len(x), min(n_queries, len(x)), replace=False)]
+
+    started = time.time()
+    index = IvfPqIndex.train(x)
+    print(f"Trained on {len(x)}x{x.shape[1]} in {time.time() - started:.1f}s: {index.n_lists} lists, {index.codebooks.shape[0]} subspaces, "
+          f"{index.codes.nbytes / 1e6:.1f} MB codes vs {x.nbytes / 1e6:.1f} MB float32")
+
+    started = time.time()
+    truth = np.vstack([brute_force_search(x, q[None, :], k)[0] for q in queries])
+    brute_qps = len(queries) / (time.time() - started)
+    print(f"{'method':<28} {'recall@' + str(k):>9} {'QPS':>9}")
+    print(f"{'brute force (numpy)':<28} {1.0:>9.3f} {brute_qps:>9.0f}")
+
+    for n_probe in (1, 4, 8, 16, 32):
+        for rerank in (False, True):
+            if n_probe > index.n_lists:
+                continue
+            started = time.time()
+            found = [index.search(q, k, n_probe, x if rerank else None)[0] for q in queries]
+            qps = len(queries) / (time.time() - started)
+            recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+            name = f"ivf-pq nprobe={n_probe}" + (" +rerank" if rerank else "")
+            print(f"{name:<28} {recall:>9.3f} {qps:>9.0f}")
+
+
+def synthetic_corpus(n, dim=768, n_topics=200, seed=0):
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    return normalize(topics[rng.integers(0, n_topics, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32))
+
+
+def load_corpus():
+    from embedding_cache import open_cache, select_videos
+    from embedding_pipeline import EMBEDDING_MODEL
+    from raw_videos import load_videos
+    videos = load_videos()
+    cache = open_cache(EMBEDDING_MODEL, videos)
+    valid_videos, _, embeddings = select_videos(cache, videos)
+    return cache, valid_videos, embeddings
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == 'bench':
+        if len(sys.argv) > 2:
+            benchmark(synthetic_corpus(int(sys.argv[2])))
+        else:
+            benchmark(load_corpus()[2])
+    elif command == 'build':
+        cache, videos, embeddings = load_corpus()
+        build_index(videos, embeddings).export_neighbors()
+    elif command in ('similar', 'search'):
+        cache, videos, embeddings = load_corpus()
+        try:
+            search = VideoSearch(IvfPqIndex.load(INDEX_PATH, ids=[v['id'] for v in videos]), videos, embeddings)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Rebuilding the index: {e}", file=sys.stderr)
+            search = build_index(videos, embeddings)
+        k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+        started = time.time()
+        if command == 'similar':
+            results = search.similar_to_video(sys.argv[2], k)
+        else:
+            from google import genai
+            from dotenv import load_dotenv
+            from embedding_pipeline import EMBEDDING_MODEL
+            load_dotenv()
+            results = search.similar_to_text(sys.argv[2], genai.Client(), EMBEDDING_MODEL, k)
+        elapsed = (time.time() - started) * 1000
+        for r in results:
+            print(f"{r['score']:.3f}  {r['id']:>8}  {r['title']}")
+        print(f"({elapsed:.1f} ms)")
+    else:
+        print(__doc__.strip(), file=sys.stderr)
+        sys.exit(1)
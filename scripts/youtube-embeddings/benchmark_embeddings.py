@@ -0,0 +1,32 @@
+"""
+Offline throughput benchmark for the embedding scheduler, using FakeEmbeddingClient.
+
+    python benchmark_embeddings.py [n_videos]
+"""
+import sys
+import tempfile
+
+from embedding_cache import EmbeddingCache
+from embedding_pipeline import embed_videos
+from fake_clients import FakeEmbeddingClient
+
+n_videos = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+videos = [{'id': i, 'title': f"Synthetic video title {i}"} for i in range(n_videos)]
+
+scenarios = [
+    ("unthrottled, batch 1", dict(), dict(batch_size=1, concurrency=10, max_rps=1000)),
+    ("unthrottled, batch 100", dict(), dict(batch_size=100, concurrency=4, max_rps=1000)),
+    ("quota 10 rps, batch 10", dict(quota_rps=10), dict(batch_size=10, concurrency=16, max_rps=1000)),
+    ("quota 10 rps + 8 concurrent, 2% 503s", dict(quota_rps=10, max_concurrent=8, server_error_rate=0.02),
+     dict(batch_size=10, concurrency=16, max_rps=1000)),
+]
+
+print(f"Embedding {n_videos} synthetic titles against the fake client (80ms/request, 1ms/item, 1% item drops)")
+print(f"{'scenario':<38} {'requests':>9} {'429/5xx':>8} {'items/s':>9} {'req/s':>7} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'conc':>5} {'rps cap':>6}")
+for name, server, scheduler in scenarios:
+    client = FakeEmbeddingClient(item_failure_rate=0.01, **server)
+    with tempfile.TemporaryDirectory() as tmp:
+        stats = embed_videos(client, videos, EmbeddingCache('fake-embedding', tmp), backoff_base=0.05, backoff_cap=1.0, **scheduler)
+    print(f"{name:<38} {stats['requests']:>9} {stats['throttled']:>8} {stats['embedded'] / stats['elapsed']:>9.0f} "
+          f"{stats['requests_per_second']:>7.1f} {stats['latency_p50']*1000:>7.0f} {stats['latency_p95']*1000:>7.0f} "
+          f"{stats['latency_p99']*1000:>7.0f} {stats['final_concurrency']:>5} {stats['final_rps_limit']:>6.1f}")
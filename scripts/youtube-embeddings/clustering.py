@@ -0,0 +1,164 @@
+"""
+Pluggable clustering stage for the galaxy colouring.
+
+    CLUSTER_METHOD   kmeans | minibatch | streaming   (default minibatch)
+    CLUSTER_K        auto | <n>                       (default auto)
+    CLUSTER_SELECT   silhouette | elbow               (default silhouette, used when CLUSTER_K=auto)
+    CLUSTER_PCA      0 | <n components>               (default 0, cluster on the raw embeddings)
+
+Cluster ids are kept stable across refits by matching the new clusters to the previous
+run's clusters on shared videos, so cluster_labels.json stays valid.
+"""
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.metrics import silhouette_score
+
+ClusterConfig = namedtuple('ClusterConfig', ['method', 'k', 'select', 'pca'])
+
+METHODS = ('kmeans', 'minibatch', 'streaming')
+# k selection fits every candidate on a sample of at most this many points
+SELECTION_SAMPLE = 5000
+SILHOUETTE_SAMPLE = 2000
+STREAM_CHUNK = 4096
+MAX_AUTO_K = 30
+
+
+def config_from_env():
+    config = ClusterConfig(
+        method=os.environ.get("CLUSTER_METHOD", "minibatch"),
+        k=os.environ.get("CLUSTER_K", "auto"),
+        select=os.environ.get("CLUSTER_SELECT", "silhouette"),
+        pca=int(os.environ.get("CLUSTER_PCA", "0")),
+    )
+    if config.method not in METHODS:
+        raise ValueError(f"CLUSTER_METHOD must be one of {METHODS}, got {config.method!r}")
+    if config.select not in ('silhouette', 'elbow'):
+        raise ValueError(f"CLUSTER_SELECT must be silhouette or elbow, got {config.select!r}")
+    return config
+
+
+def candidate_ks(n_points):
+    return range(2, max(3, min(MAX_AUTO_K, int(np.sqrt(n_points / 2))) + 1))
+
+
+def elbow_k(ks, inertias):
+    """Picks the k whose inertia lies furthest below the chord from the first to the last candidate."""
+    ks = np.asarray(ks, dtype=np.float64)
+    inertias = np.asarray(inertias, dtype=np.float64)
+    x = (ks - ks[0]) / max(ks[-1] - ks[0], 1)
+    y = (inertias - inertias[-1]) / max(inertias[0] - inertias[-1], 1e-12)
+    return int(ks[np.argmax((1 - x) - y)])
+
+
+def match_labels(labels, previous, n_clusters):
+    """
+    Maps freshly fitted cluster labels onto previous cluster ids by maximum overlap on the
+    videos both runs clustered. Clusters without a counterpart get ids above every previous id.
+    `previous` holds the old id per point, or -1 for points that were not clustered before.
+    """
+    shared = previous >= 0
+    if not shared.any():
+        return np.arange(n_clusters)
+    old_ids = np.unique(previous[shared])
+    overlap = np.zeros((n_clusters, len(old_ids)), dtype=np.int64)
+    np.add.at(overlap, (labels[shared], np.searchsorted(old_ids, previous[shared])), 1)
+    rows, cols = linear_sum_assignment(-overlap)
+
+    mapping = np.full(n_clusters, -1, dtype=np.int64)
+    for r, c in zip(rows, cols):
+        if overlap[r, c]:
+            mapping[r] = old_ids[c]
+    unmatched = np.flatnonzero(mapping < 0)
+    mapping[unmatched] = old_ids.max() + 1 + np.arange(len(unmatched))
+    return mapping
+
+
+class ClusterModel:
+    """
+    Optional PCA reduction followed by k-means, fitted by one of METHODS, with a label mapping
+    applied on top of the raw k-means labels so ids survive refits.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.reducer = None
+        self.kmeans = None
+        self.mapping = None
+
+    def _reduce(self, embeddings):
+        x = np.asarray(embeddings, dtype=np.float32)
+        return self.reducer.transform(x).astype(np.float32) if self.reducer is not None else x
+
+    def _fit_reducer(self, embeddings):
+        n_components = min(self.config.pca, embeddings.shape[0], embeddings.shape[1])
+        if not self.config.pca or n_components >= embeddings.shape[1]:
+            return
+        if self.config.method == 'streaming':
+            self.reducer = IncrementalPCA(n_components=n_components)
+            for start in range(0, len(embeddings), max(STREAM_CHUNK, n_components)):
+                chunk = np.asarray(embeddings[start:start + max(STREAM_CHUNK, n_components)], dtype=np.float32)
+                if len(chunk) >= n_components:
+                    self.reducer.partial_fit(chunk)
+        else:
+            self.reducer = PCA(n_components=n_components, random_state=42).fit(np.asarray(embeddings, dtype=np.float32))
+
+    def _new_kmeans(self, k):
+        if self.config.method == 'kmeans':
+            return KMeans(n_clusters=k, random_state=42, n_init='auto')
+        return MiniBatchKMeans(n_clusters=k, random_state=42, n_init=3, batch_size=STREAM_CHUNK)
+
+    def _select_k(self, x):
+        if self.config.k != 'auto':
+            return max(2, min(int(self.config.k), len(x) - 1))
+        rng = np.random.default_rng(42)
+        sample = x[rng.choice(len(x), min(len(x), SELECTION_SAMPLE), replace=False)]
+        ks = [k for k in candidate_ks(len(x)) if k < len(sample)]
+        if not ks:
+            return 2
+        scores = []
+        for k in ks:
+            model = MiniBatchKMeans(n_clusters=k, random_state=42, n_init=3, batch_size=STREAM_CHUNK).fit(sample)
+            if self.config.select == 'elbow':
+                scores.append(model.inertia_)
+            else:
+                scores.append(silhouette_score(sample, model.labels_, sample_size=min(len(sample), SILHOUETTE_SAMPLE), random_state=42))
+        k = elbow_k(ks, scores) if self.config.select == 'elbow' else ks[int(np.argmax(scores))]
+        print(f"Selected k={k} by {self.config.select} over k={ks[0]}..{ks[-1]}.", flush=True)
+        return k
+
+    def fit_predict(self, embeddings, previous=None):
+        """
+        Fits the model and returns one cluster id per row. `previous` optionally holds each
+        row's cluster id from the last run (-1 where there is none) to keep ids stable.
+        """
+        started = time.time()
+        self._fit_reducer(embeddings)
+        x = self._reduce(embeddings)
+        k = self._select_k(x)
+        self.kmeans = self._new_kmeans(k)
+        if self.config.method == 'streaming':
+            for start in range(0, len(x), STREAM_CHUNK):
+                self.kmeans.partial_fit(x[start:start + STREAM_CHUNK])
+            labels = self.kmeans.predict(x)
+        else:
+            labels = self.kmeans.fit_predict(x)
+
+        self.mapping = np.arange(k)
+        if previous is not None:
+            self.mapping = match_labels(labels, np.asarray(previous, dtype=np.int64), k)
+        print(f"Clustered {len(x)} points into {k} clusters with {self.config.method}"
+              f"{f' on {x.shape[1]} PCA components' if self.reducer is not None else ''} in {time.time() - started:.1f}s.", flush=True)
+        return self.mapping[labels]
+
+    def predict(self, embeddings):
+        return self.mapping[self.kmeans.predict(self._reduce(embeddings))]
+
+    def transform(self, embeddings):
+        """Distances from each row to every cluster centre, in the reduced space."""
+        return self.kmeans.transform(self._reduce(embeddings))
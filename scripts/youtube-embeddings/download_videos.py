@@ -1,26 +1,90 @@
+"""
+Exports liked_videos to raw_videos.jsonl through a server-side cursor, one row at a time.
+
+    python download_videos.py [--full]
+
+After the first export only rows whose updated_at is at or past the saved watermark are
+pulled; they replace their old lines while the previous file is streamed into the new one,
+and videos no longer in the table are dropped. --full re-exports everything.
+"""
 import os
+import sys
 import json
+import time
+from datetime import datetime
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 
+from raw_videos import RAW_VIDEOS_PATH, iter_videos, load_state, save_state
+
 load_dotenv()
 
 DB_URL = f"postgresql://{os.environ.get('SUPABASE_DB_USER')}:{os.environ.get('SUPABASE_DB_PASSWORD')}@{os.environ.get('SUPABASE_DB_HOST')}:{os.environ.get('SUPABASE_DB_PORT')}/{os.environ.get('SUPABASE_DB_NAME')}"
+ITERSIZE = 2000
+
+VIDEO_COLUMNS = "id, title, url, thumbnail_url, video_owner_channel_title as channel_title, CAST(extract(year from published_at) AS INTEGER) as year"
+
+
+def stream_rows(conn, where="", params=()):
+    """Yields (video dict, updated_at) from a named cursor, fetching ITERSIZE rows per round trip."""
+    with conn.cursor(name='liked_videos_export', cursor_factory=RealDictCursor) as cursor:
+        cursor.itersize = ITERSIZE
+        cursor.execute(f"SELECT {VIDEO_COLUMNS}, updated_at FROM liked_videos {where} ORDER BY id;", params)
+        for row in cursor:
+            updated_at = row.pop('updated_at')
+            yield dict(row), updated_at
+
+
+def write_line(f, video):
+    f.write(json.dumps(video, ensure_ascii=False, separators=(',', ':')))
+    f.write('\n')
+
 
 print("Connecting to database...")
 conn = psycopg2.connect(DB_URL)
-cursor = conn.cursor(cursor_factory=RealDictCursor)
+started = time.time()
+state = None if '--full' in sys.argv or not os.path.exists(RAW_VIDEOS_PATH) else load_state()
+os.makedirs(os.path.dirname(RAW_VIDEOS_PATH), exist_ok=True)
+tmp_path = RAW_VIDEOS_PATH + '.tmp'
+watermark = datetime.fromisoformat(state['watermark']) if state and state.get('watermark') else None
+count = 0
 
-print("Fetching all videos...")
-cursor.execute("SELECT id, title, url, thumbnail_url, video_owner_channel_title as channel_title, CAST(extract(year from published_at) AS INTEGER) as year FROM liked_videos;")
-videos = cursor.fetchall()
-print(f"Fetched {len(videos)} videos.")
+with open(tmp_path, 'w', encoding='utf-8') as f:
+    if watermark is None:
+        print("Exporting all videos...")
+        for video, updated_at in stream_rows(conn):
+            write_line(f, video)
+            count += 1
+            if updated_at and (watermark is None or updated_at > watermark):
+                watermark = updated_at
+    else:
+        print(f"Exporting videos changed since {watermark}...")
+        # >= rather than >, so rows committed later with the watermark's own timestamp are not missed
+        changed = {}
+        for video, updated_at in stream_rows(conn, "WHERE updated_at >= %s", (watermark,)):
+            changed[video['id']] = video
+            if updated_at and updated_at > watermark:
+                watermark = updated_at
+        with conn.cursor(name='liked_videos_ids') as cursor:
+            cursor.itersize = ITERSIZE * 10
+            cursor.execute("SELECT id FROM liked_videos;")
+            live_ids = {row[0] for row in cursor}
 
-output_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'public', 'data', 'raw_videos.json')
-os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        kept = removed = 0
+        for video in iter_videos(RAW_VIDEOS_PATH):
+            if video['id'] not in live_ids:
+                removed += 1
+            elif video['id'] not in changed:
+                write_line(f, video)
+                kept += 1
+        for video in changed.values():
+            write_line(f, video)
+        count = kept + len(changed)
+        print(f"{len(changed)} new or changed, {kept} unchanged, {removed} removed.")
 
-with open(output_path, 'w', encoding='utf-8') as f:
-    json.dump([dict(v) for v in videos], f, ensure_ascii=False, indent=2)
+os.replace(tmp_path, RAW_VIDEOS_PATH)
+save_state({'watermark': watermark.isoformat() if watermark else None, 'count': count})
+conn.close()
 
-print(f"Saved raw videos to {output_path}")
+print(f"Saved {count} videos to {RAW_VIDEOS_PATH} in {time.time() - started:.1f}s")
@@ -0,0 +1,154 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import unicodedata
+
+from embedding_store import DATA_DIR, EmbeddingStore
+
+CACHE_DIR = os.path.join(DATA_DIR, 'embedding_cache')
+# Layouts from before the cache was keyed by content: vectors keyed by liked_videos.id
+LEGACY_STORE_DIR = os.path.join(DATA_DIR, 'embedding_store')
+LEGACY_CHECKPOINT_PATH = os.path.join(DATA_DIR, 'embeddings_checkpoint.jsonl')
+# Compact the cache once this fraction of its rows is no longer referenced by any video
+PRUNE_THRESHOLD = 0.1
+
+
+def video_text(video):
+    return video['title'] or "Unknown Title"
+
+
+def normalize_text(text):
+    """NFKC-normalizes, case-folds and collapses whitespace, so trivially different titles share a vector."""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text)).strip().casefold()
+
+
+def text_key(text):
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()[:32]
+
+
+def model_dir_name(model):
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', model)
+
+
+class EmbeddingCache:
+    """
+    Embeddings keyed by (model, normalized text hash).
+
+    Each model gets its own EmbeddingStore directory, and the model name is pinned in that
+    store's metadata, so vectors from different models can never be mixed. A title edit
+    changes the key, so the stale vector is simply no longer looked up and is dropped on
+    the next prune.
+    """
+
+    def __init__(self, model, root=CACHE_DIR):
+        self.model = model
+        self.store = EmbeddingStore(os.path.join(root, model_dir_name(model)), meta={'model': model})
+
+    def __len__(self):
+        return len(self.store)
+
+    def __contains__(self, key):
+        return key in self.store
+
+    def put_many(self, items):
+        """Stores (key, embedding) pairs."""
+        self.store.add_many(items)
+
+    def select(self, keys):
+        return self.store.select(keys)
+
+    def evict(self, keys):
+        """Removes the given keys. Returns the number of entries removed."""
+        keys = set(keys)
+        return self.store.compact({k for k in self.store.rows if k not in keys})
+
+    def prune(self, referenced_keys, threshold=0.0):
+        """
+        Drops vectors whose keys are not in referenced_keys, but only once they make up more
+        than `threshold` of the cache, so routine runs stay append-only.
+        """
+        stale = sum(1 for k in self.store.rows if k not in referenced_keys)
+        if not stale or stale <= threshold * len(self.store):
+            return 0
+        return self.store.compact(referenced_keys)
+
+
+def select_videos(cache, videos):
+    """
+    Returns (videos with a cached embedding, their cache keys, their embedding matrix), reading
+    the matrix straight from the cache's memory map.
+    """
+    valid = [(v, k) for v, k in ((v, text_key(video_text(v))) for v in videos) if k in cache]
+    keys = [k for _, k in valid]
+    return [v for v, _ in valid], keys, cache.select(keys)
+
+
+def migrate_legacy(cache, videos, store_dir=LEGACY_STORE_DIR, checkpoint_path=LEGACY_CHECKPOINT_PATH, batch_size=1000):
+    """
+    One-time import of id-keyed vectors (the embedding_store directory, or the older
+    embeddings_checkpoint.jsonl) into a content-keyed cache, re-keyed by each video's
+    current title. Returns the number of vectors imported.
+    """
+    key_by_id = {str(v['id']): text_key(video_text(v)) for v in videos}
+    migrated = 0
+    batch = []
+
+    def flush():
+        nonlocal migrated, batch
+        cache.put_many(batch)
+        migrated += len(batch)
+        batch = []
+
+    if os.path.exists(os.path.join(store_dir, 'meta.json')):
+        legacy = EmbeddingStore(store_dir)
+        matrix = legacy.matrix()
+        for vid_id, row in legacy.rows.items():
+            key = key_by_id.get(vid_id)
+            if key and key not in cache:
+                batch.append((key, matrix[row]))
+            if len(batch) >= batch_size:
+                flush()
+    elif os.path.exists(checkpoint_path):
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip(): continue
+                try:
+                    data = json.loads(line)
+                except Exception as e:
+                    continue
+                key = key_by_id.get(str(data['id']))
+                if key and key not in cache:
+                    batch.append((key, data['embedding']))
+                if len(batch) >= batch_size:
+                    flush()
+    flush()
+    return migrated
+
+
+def open_cache(model, videos, root=CACHE_DIR):
+    """Opens the cache for model, importing legacy id-keyed vectors the first time it is empty."""
+    cache = EmbeddingCache(model, root)
+    if len(cache) == 0 and (os.path.exists(LEGACY_STORE_DIR) or os.path.exists(LEGACY_CHECKPOINT_PATH)):
+        print(f"Importing legacy id-keyed embeddings into {cache.store.path}...", flush=True)
+        migrated = migrate_legacy(cache, videos)
+        print(f"Imported {migrated} embeddings. The legacy files are no longer read and can be deleted.", flush=True)
+    return cache
+
+
+if __name__ == "__main__":
+    from embedding_pipeline import EMBEDDING_MODEL
+    from raw_videos import load_videos
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ('stats', 'prune'):
+        print("Usage: python embedding_cache.py stats|prune", file=sys.stderr)
+        sys.exit(1)
+
+    videos = load_videos()
+    cache = open_cache(EMBEDDING_MODEL, videos)
+    referenced = {text_key(video_text(v)) for v in videos}
+    stale = sum(1 for k in cache.store.rows if k not in referenced)
+    print(f"Cache {cache.store.path}: {len(cache)} vectors, {len(referenced)} referenced by {len(videos)} videos, {stale} stale.")
+    if sys.argv[1] == 'prune':
+        print(f"Pruned {cache.prune(referenced)} stale vectors.")
@@ -0,0 +1,200 @@
+import os
+import time
+import asyncio
+from collections import deque
+
+from rate_limit import TokenBucket, AimdLimiter, backoff_delay, percentile
+from embedding_cache import text_key, video_text
+
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", 'gemini-embedding-2')
+# The Gemini batch embedding endpoint accepts up to 100 texts per request
+DEFAULT_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "100"))
+DEFAULT_CONCURRENCY = int(os.environ.get("EMBED_CONCURRENCY", "4"))
+MAX_CONCURRENCY = int(os.environ.get("EMBED_MAX_CONCURRENCY", "32"))
+MAX_RPS = float(os.environ.get("EMBED_MAX_RPS", "20"))
+MIN_RPS = 0.5
+MAX_ATTEMPTS = 6
+
+
+def error_status(exc):
+    """Best-effort HTTP status of an API exception (google.genai.errors.APIError exposes `.code`)."""
+    for attr in ('code', 'status_code'):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def retry_after(exc):
+    value = getattr(exc, 'retry_after', None)
+    if value is None:
+        headers = getattr(getattr(exc, 'response', None), 'headers', None) or {}
+        value = headers.get('Retry-After')
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class EmbeddingScheduler:
+    """
+    Asyncio embedding scheduler for (cache key, text) items. Requests draw from a token bucket and the number in flight is
+    capped by a concurrency limit; both follow AIMD. On a 429/5xx the concurrency limit is halved
+    and the bucket rate drops to half the rate actually achieved over the last second; each
+    success adds back one request per second over a window of `rate` requests, up to max_rps.
+
+    Items that fail are re-queued on their own. A throttled batch is retried whole after a
+    jittered exponential backoff; a batch that errors for any other reason, or an item that
+    comes back without a vector, is retried in batches half the previous size so a single bad
+    title is isolated without holding back the rest.
+    """
+
+    def __init__(self, client, cache, batch_size=DEFAULT_BATCH_SIZE,
+                 concurrency=DEFAULT_CONCURRENCY, max_concurrency=MAX_CONCURRENCY, max_rps=MAX_RPS,
+                 max_attempts=MAX_ATTEMPTS, backoff_base=1.0, backoff_cap=60.0):
+        self.client = client
+        self.cache = cache
+        self.model = cache.model
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_rps = max_rps
+        self.bucket = TokenBucket(max_rps)
+        self.limiter = AimdLimiter(initial=concurrency, maximum=max_concurrency)
+        self.latencies = []
+        self._sent_at = deque()
+        self.stats = {'requests': 0, 'throttled': 0, 'errors': 0, 'embedded': 0, 'failed': 0, 'retried': 0}
+
+    def _recent_rps(self, window=1.0):
+        now = time.monotonic()
+        while self._sent_at and now - self._sent_at[0] > window:
+            self._sent_at.popleft()
+        return len(self._sent_at) / window
+
+    def _on_throttle(self):
+        if self.limiter.on_throttle():
+            self.bucket.set_rate(max(MIN_RPS, min(self.bucket.rate, self._recent_rps()) * self.limiter.decrease))
+
+    def _on_success(self):
+        self.limiter.on_success()
+        self.bucket.set_rate(min(self.max_rps, self.bucket.rate + 1.0 / self.bucket.rate))
+
+    async def _send(self, batch, split):
+        """Returns a list of (item, attempts, split) entries to retry."""
+        await self.bucket.acquire()
+        texts = [text for (_, text), _ in batch]
+        self.stats['requests'] += 1
+        self._sent_at.append(time.monotonic())
+        started = time.monotonic()
+        try:
+            result = await self.client.aio.models.embed_content(model=self.model, contents=texts)
+        except Exception as e:
+            self.latencies.append(time.monotonic() - started)
+            status = error_status(e)
+            attempt = max(attempts for _, attempts in batch)
+            if status == 429 or (status is not None and status >= 500):
+                self.stats['throttled'] += 1
+                self._on_throttle()
+                wait = retry_after(e)
+                if wait is not None:
+                    self.bucket.pause(wait)
+                await asyncio.sleep(wait if wait is not None else backoff_delay(attempt, self.backoff_base, self.backoff_cap))
+                return [(v, attempts + 1, split) for v, attempts in batch]
+            self.stats['errors'] += 1
+            print(f"Error embedding batch of {len(batch)} (status {status}): {e}", flush=True)
+            await asyncio.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap))
+            return [(v, attempts + 1, split + 1) for v, attempts in batch]
+
+        self.latencies.append(time.monotonic() - started)
+        self._on_success()
+        embeddings = result.embeddings or []
+        embedded = []
+        failed = []
+        for i, (item, attempts) in enumerate(batch):
+            values = embeddings[i].values if i < len(embeddings) else None
+            if values:
+                embedded.append((item[0], values))
+            else:
+                failed.append((item, attempts + 1, split + 1))
+        self.cache.put_many(embedded)
+        self.stats['embedded'] += len(embedded)
+        return failed
+
+    async def run(self, items):
+        # Queues keyed by split level; level n is sent in batches of batch_size >> n
+        queues = {0: deque((item, 0) for item in items)}
+        total = len(items)
+        start_time = time.monotonic()
+        last_report = 0
+
+        def next_batch():
+            # Retries go first so stragglers don't pile up at the end of the run
+            for split in sorted(queues, reverse=True):
+                q = queues[split]
+                if q:
+                    size = max(1, self.batch_size >> split)
+                    return [q.popleft() for _ in range(min(size, len(q)))], split
+            return None, None
+
+        in_flight = set()
+        while True:
+            while len(in_flight) < self.limiter.limit:
+                batch, split = next_batch()
+                if not batch:
+                    break
+                in_flight.add(asyncio.ensure_future(self._send(batch, split)))
+            if not in_flight:
+                break
+
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                for item, attempts, split in task.result():
+                    if attempts >= self.max_attempts:
+                        print(f"Failed to embed {item[1]!r} after {attempts} attempts.", flush=True)
+                        self.stats['failed'] += 1
+                    else:
+                        self.stats['retried'] += 1
+                        queues.setdefault(split, deque()).append((item, attempts))
+
+            finished = self.stats['embedded'] + self.stats['failed']
+            if finished - last_report >= 500 or finished == total:
+                last_report = finished
+                print(f"Processed {finished}/{total} missing embeddings. Time elapsed: {time.monotonic()-start_time:.1f}s, concurrency limit {self.limiter.limit}", flush=True)
+
+        elapsed = time.monotonic() - start_time
+        self.stats.update({
+            'elapsed': elapsed,
+            'requests_per_second': self.stats['requests'] / elapsed if elapsed else 0.0,
+            'latency_p50': percentile(self.latencies, 50),
+            'latency_p95': percentile(self.latencies, 95),
+            'latency_p99': percentile(self.latencies, 99),
+            'final_concurrency': self.limiter.limit,
+            'final_rps_limit': self.bucket.rate,
+        })
+        return self.stats
+
+
+def embed_videos(client, videos, cache, **kwargs):
+    """
+    Embeds the distinct titles of videos that are not yet in cache and returns the scheduler
+    stats. Videos sharing a normalized title are sent once and served from the same vector.
+    """
+    missing = {}
+    for video in videos:
+        text = video_text(video)
+        key = text_key(text)
+        if key not in cache and key not in missing:
+            missing[key] = text
+    stats = asyncio.run(EmbeddingScheduler(client, cache, **kwargs).run(list(missing.items())))
+    stats['deduplicated'] = len(videos) - len(missing)
+    return stats
+
+
+def format_stats(stats):
+    return (f"{stats['embedded']} embedded ({stats['deduplicated']} served from cache or duplicates) in {stats['requests']} requests "
+            f"({stats['throttled']} throttled, {stats['retried']} retried, {stats['failed']} failed); "
+            f"{stats['requests_per_second']:.1f} req/s, latency p50 {stats['latency_p50']*1000:.0f}ms "
+            f"p95 {stats['latency_p95']*1000:.0f}ms p99 {stats['latency_p99']*1000:.0f}ms, "
+            f"final concurrency {stats['final_concurrency']}")
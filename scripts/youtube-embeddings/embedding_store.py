@@ -0,0 +1,131 @@
+import os
+import sys
+import json
+import threading
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'public', 'data')
+
+DTYPE = np.float32
+
+
+class EmbeddingStore:
+    """
+    Append-only embedding store: a raw float32 matrix file that can be memory-mapped,
+    plus a sidecar text index holding one id per matrix row.
+
+    Re-adding an id appends a new row; the latest row wins when the index is loaded.
+    """
+
+    def __init__(self, path, meta=None):
+        self.path = path
+        self.extra_meta = dict(meta or {})
+        self.matrix_path = os.path.join(path, 'vectors.f32')
+        self.index_path = os.path.join(path, 'ids.txt')
+        self.meta_path = os.path.join(path, 'meta.json')
+        self.dim = None
+        self.rows = {}
+        self._n_rows = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                stored_meta = json.load(f)
+            for key, value in self.extra_meta.items():
+                if stored_meta.get(key) != value:
+                    raise ValueError(f"Embedding store {self.path} has {key}={stored_meta.get(key)!r}, expected {value!r}.")
+            self.dim = stored_meta['dim']
+        if self.dim is None:
+            return
+
+        ids = []
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                ids = f.read().splitlines()
+        matrix_rows = os.path.getsize(self.matrix_path) // (self.dim * DTYPE().itemsize) if os.path.exists(self.matrix_path) else 0
+
+        # A crash between the two appends leaves one file a row ahead; trim both back to the shorter one
+        n = min(len(ids), matrix_rows)
+        if n != len(ids) or n != matrix_rows:
+            print(f"Warning: embedding store out of sync ({len(ids)} ids, {matrix_rows} rows). Truncating to {n}.", file=sys.stderr)
+            with open(self.matrix_path, 'r+b') as f:
+                f.truncate(n * self.dim * DTYPE().itemsize)
+            with open(self.index_path, 'w', encoding='utf-8') as f:
+                f.writelines(i + '\n' for i in ids[:n])
+            ids = ids[:n]
+
+        self._n_rows = n
+        self.rows = {vid_id: row for row, vid_id in enumerate(ids)}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, vid_id):
+        return str(vid_id) in self.rows
+
+    def add(self, vid_id, embedding):
+        self.add_many([(vid_id, embedding)])
+
+    def add_many(self, items):
+        """Appends (id, embedding) pairs to the matrix and index files."""
+        if not items:
+            return
+        block = np.asarray([emb for _, emb in items], dtype=DTYPE)
+        with self._lock:
+            if self.dim is None:
+                os.makedirs(self.path, exist_ok=True)
+                self.dim = int(block.shape[1])
+                with open(self.meta_path, 'w', encoding='utf-8') as f:
+                    json.dump({'dim': self.dim, 'dtype': 'float32', **self.extra_meta}, f)
+            elif block.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {block.shape[1]} does not match store dimension {self.dim}.")
+
+            with open(self.matrix_path, 'ab') as f:
+                f.write(block.tobytes())
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.writelines(str(vid_id) + '\n' for vid_id, _ in items)
+            for vid_id, _ in items:
+                self.rows[str(vid_id)] = self._n_rows
+                self._n_rows += 1
+
+    def compact(self, keep_ids):
+        """
+        Rewrites the store keeping only the latest row of each id in keep_ids, dropping
+        superseded rows and everything else. Returns the number of ids removed.
+        """
+        keep = sorted((i for i in self.rows if i in keep_ids), key=self.rows.get)
+        removed = len(self.rows) - len(keep)
+        if removed == 0 and len(keep) == self._n_rows:
+            return 0
+        with self._lock:
+            block = np.asarray(self.matrix()[[self.rows[i] for i in keep]]) if keep else np.empty((0, self.dim), dtype=DTYPE)
+            tmp_matrix = self.matrix_path + '.tmp'
+            tmp_index = self.index_path + '.tmp'
+            with open(tmp_matrix, 'wb') as f:
+                f.write(block.astype(DTYPE).tobytes())
+            with open(tmp_index, 'w', encoding='utf-8') as f:
+                f.writelines(i + '\n' for i in keep)
+            os.replace(tmp_matrix, self.matrix_path)
+            os.replace(tmp_index, self.index_path)
+            self.rows = {vid_id: row for row, vid_id in enumerate(keep)}
+            self._n_rows = len(keep)
+        return removed
+
+    def matrix(self):
+        """Returns the whole store as a read-only memory-mapped (rows, dim) array."""
+        if not self._n_rows:
+            return np.empty((0, self.dim or 0), dtype=DTYPE)
+        return np.memmap(self.matrix_path, dtype=DTYPE, mode='r', shape=(self._n_rows, self.dim))
+
+    def select(self, ids):
+        """
+        Returns the embeddings for ids, in order. When the ids cover the matrix rows
+        in storage order the memmap itself is returned, so nothing is copied.
+        """
+        row_idx = np.fromiter((self.rows[str(i)] for i in ids), dtype=np.int64, count=len(ids))
+        mat = self.matrix()
+        if len(row_idx) == self._n_rows and np.array_equal(row_idx, np.arange(self._n_rows)):
+            return mat
+        return mat[row_idx]
@@ -0,0 +1,156 @@
+"""
+Local stand-ins for the google-genai client, so the pipeline can be exercised and
+benchmarked offline. They mirror only the attributes the scripts actually use.
+"""
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+
+
+class FakeApiError(Exception):
+    """Mimics google.genai.errors.APIError: carries the HTTP status in `.code`."""
+
+    def __init__(self, code, message, retry_after=None):
+        super().__init__(f"{code} {message}")
+        self.code = code
+        self.retry_after = retry_after
+
+
+class _FakeEmbeddingModels:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def embed_content(self, model, contents):
+        delay, result = self._owner._handle(contents)
+        time.sleep(delay)
+        return result()
+
+
+class _FakeAsyncEmbeddingModels:
+    def __init__(self, owner):
+        self._owner = owner
+
+    async def embed_content(self, model, contents):
+        delay, result = self._owner._handle(contents)
+        await asyncio.sleep(delay)
+        return result()
+
+
+class FakeEmbeddingClient:
+    """
+    Deterministic fake of client.models.embed_content / client.aio.models.embed_content.
+
+    Each request takes request_latency plus per_item_latency per text. The fake server
+    admits at most quota_rps requests per second (bursting to quota_burst) and at most
+    max_concurrent in flight, answering 429 past either limit; it also answers 503 with
+    probability server_error_rate and drops single items with probability item_failure_rate.
+    """
+
+    def __init__(self, dim=768, request_latency=0.08, per_item_latency=0.001, item_failure_rate=0.0,
+                 quota_rps=None, quota_burst=None, max_concurrent=None, server_error_rate=0.0, seed=0):
+        self.dim = dim
+        self.request_latency = request_latency
+        self.per_item_latency = per_item_latency
+        self.item_failure_rate = item_failure_rate
+        self.quota_rps = quota_rps
+        self.quota_burst = quota_burst or quota_rps
+        self.max_concurrent = max_concurrent
+        self.server_error_rate = server_error_rate
+        self.requests = 0
+        self.throttled = 0
+        self._in_flight = 0
+        self._quota_tokens = self.quota_burst or 0
+        self._quota_updated = time.monotonic()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.models = _FakeEmbeddingModels(self)
+        self.aio = SimpleNamespace(models=_FakeAsyncEmbeddingModels(self))
+
+    def vector_for(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+        vec = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return (vec / np.linalg.norm(vec)).tolist()
+
+    def _admit(self):
+        """Returns an error to raise, or None if the request is admitted."""
+        if self.quota_rps:
+            now = time.monotonic()
+            self._quota_tokens = min(self.quota_burst, self._quota_tokens + (now - self._quota_updated) * self.quota_rps)
+            self._quota_updated = now
+            if self._quota_tokens < 1:
+                return FakeApiError(429, "RESOURCE_EXHAUSTED: quota exceeded")
+        if self.max_concurrent and self._in_flight >= self.max_concurrent:
+            return FakeApiError(429, "RESOURCE_EXHAUSTED: too many concurrent requests")
+        if self._rng.random() < self.server_error_rate:
+            return FakeApiError(503, "UNAVAILABLE")
+        if self.quota_rps:
+            self._quota_tokens -= 1
+        return None
+
+    def _handle(self, contents):
+        """Admits or rejects a request; returns (latency, callable producing the response)."""
+        texts = [contents] if isinstance(contents, str) else list(contents)
+        with self._lock:
+            self.requests += 1
+            error = self._admit()
+            if error is not None:
+                if error.code == 429:
+                    self.throttled += 1
+                def fail():
+                    raise error
+                return self.request_latency / 4, fail
+            self._in_flight += 1
+            dropped = [self._rng.random() < self.item_failure_rate for _ in texts]
+
+        def respond():
+            with self._lock:
+                self._in_flight -= 1
+            return SimpleNamespace(embeddings=[
+                SimpleNamespace(values=None if drop else self.vector_for(t))
+                for t, drop in zip(texts, dropped)
+            ])
+        return self.request_latency + self.per_item_latency * len(texts), respond
+
+
+class _FakeAsyncGenerateModels:
+    def __init__(self, owner):
+        self._owner = owner
+
+    async def generate_content(self, model, contents):
+        with self._owner._lock:
+            self._owner.requests += 1
+            self._owner.prompts.append(contents)
+        await asyncio.sleep(self._owner.latency)
+        return SimpleNamespace(text=self._owner.label_for(contents))
+
+
+class FakeLabelClient:
+    """
+    Deterministic fake of client.aio.models.generate_content for cluster labelling: answers
+    with the two most common title words in the prompt, after `latency` seconds.
+    """
+
+    STOPWORDS = {'the', 'a', 'an', 'and', 'or', 'of', 'to', 'in', 'on', 'for', 'with', 'how', 'what', 'why', 'is', 'i', 'my', 'you', 'your'}
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.requests = 0
+        self.prompts = []
+        self._lock = threading.Lock()
+        self.aio = SimpleNamespace(models=_FakeAsyncGenerateModels(self))
+
+    def label_for(self, prompt):
+        counts = {}
+        for line in prompt.splitlines():
+            if line.startswith('- '):
+                for word in line[2:].lower().split():
+                    word = word.strip('.,:;!?()[]"\'|-')
+                    if word and word not in self.STOPWORDS:
+                        counts[word] = counts.get(word, 0) + 1
+        top = sorted(counts, key=lambda w: (-counts[w], w))[:2]
+        return ' '.join(w.title() for w in top) or "Misc"
@@ -0,0 +1,286 @@
+"""
+Compact, chunked galaxy payload read by youtube-galaxy.html, replacing one pretty-printed
+video-embeddings.json.
+
+    python galaxy_format.py convert <video-embeddings.json> [output dir]
+    python galaxy_format.py bench [video-embeddings.json]
+
+A galaxy directory holds manifest.json and a handful of chunk-<n>.bin files. Each chunk is
+
+    uint32 header length | UTF-8 JSON header, space-padded to a multiple of 4 bytes | columns
+
+The header carries the chunk's strings (video ids, titles, YouTube video keys, and urls or
+thumbnails that don't follow the usual YouTube pattern). The columns follow in the order and
+types listed in the manifest, widest first so every typed array view stays aligned:
+float32 x/y/z, the channel index into the manifest's de-duplicated channel list, year (0 when
+unknown) and cluster id (uint8 unless an id needs more). When the videos carry the legacy
+`neighbors` lists, an int32 neighbors column (after z) holds k values per video: each
+neighbour's position in the galaxy (the sum of the earlier chunks' counts plus its row in its
+own chunk), or -1 where a video has fewer than k neighbours. The manifest lists it as
+[name, type, k].
+
+Chunk 0 is a level-of-detail overview with one point per occupied cell of a coarse grid, so
+the page can draw the whole galaxy's shape from one small request. The remaining points are
+split into spatial tiles of at most CHUNK_POINTS points by recursive median splits on the
+widest axis, and streamed in after it.
+"""
+import os
+import re
+import sys
+import json
+import time
+import gzip
+
+import numpy as np
+
+from embedding_store import DATA_DIR
+
+GALAXY_DIR = os.path.join(DATA_DIR, 'galaxy')
+FORMAT_VERSION = 2
+CHUNK_POINTS = 2048
+OVERVIEW_GRID = 24
+
+YOUTUBE_URL = re.compile(r'https://www\.youtube\.com/watch\?v=([\w-]+)')
+THUMBNAIL_URL = 'https://i.ytimg.com/vi/{}/hqdefault.jpg'
+
+
+def column_dtype(values, candidates=(np.uint8, np.uint16, np.uint32)):
+    top = int(max(values, default=0))
+    for dtype in candidates:
+        if top <= np.iinfo(dtype).max:
+            return dtype
+    raise ValueError(f"Value {top} does not fit in {candidates[-1].__name__}")
+
+
+def overview_rows(coords, grid=OVERVIEW_GRID):
+    """One row per occupied grid cell: the point nearest the cell's mean."""
+    lo, hi = coords.min(axis=0), coords.max(axis=0)
+    cells = np.minimum(((coords - lo) / np.maximum(hi - lo, 1e-12) * grid).astype(np.int64), grid - 1)
+    cell_ids = np.ravel_multi_index(cells.T, (grid,) * coords.shape[1])
+    order = np.argsort(cell_ids, kind='stable')
+    starts = np.flatnonzero(np.r_[True, np.diff(cell_ids[order]) != 0])
+    rows = []
+    for group in np.split(order, starts[1:]):
+        distances = np.linalg.norm(coords[group] - coords[group].mean(axis=0), axis=1)
+        rows.append(group[np.argmin(distances)])
+    return np.sort(np.asarray(rows, dtype=np.int64))
+
+
+def spatial_tiles(coords, rows, max_points=CHUNK_POINTS):
+    """Splits rows into tiles of at most max_points by median splits on each tile's widest axis."""
+    if len(rows) <= max_points:
+        return [rows] if len(rows) else []
+    points = coords[rows]
+    axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+    order = rows[np.argsort(points[:, axis], kind='stable')]
+    half = len(order) // 2
+    return spatial_tiles(coords, order[:half], max_points) + spatial_tiles(coords, order[half:], max_points)
+
+
+def bounds(points):
+    return [[round(float(v), 4) for v in points.min(axis=0)], [round(float(v), 4) for v in points.max(axis=0)]]
+
+
+def neighbor_positions(videos, tiles):
+    """Each video's neighbour ids as positions in chunk order, padded with -1. None if no video has any."""
+    width = max((len(v.get('neighbors') or ()) for v in videos), default=0)
+    if not width:
+        return None
+    position = np.empty(len(videos), dtype=np.int64)
+    position[np.concatenate(tiles)] = np.arange(len(videos))
+    position_by_id = {str(v['id']): int(position[row]) for row, v in enumerate(videos)}
+    neighbors = np.full((len(videos), width), -1, dtype=np.int32)
+    for row, video in enumerate(videos):
+        found = [position_by_id[str(n)] for n in video.get('neighbors') or () if str(n) in position_by_id]
+        neighbors[row, :len(found)] = found
+    return neighbors
+
+
+def encode_chunk(rows, videos, coords, clusters, channel_index, columns, neighbors=None):
+    header = {'ids': [], 'titles': [], 'keys': [], 'urls': {}, 'thumbnails': {}}
+    for i, row in enumerate(rows):
+        video = videos[row]
+        url = video.get('url') or ""
+        thumbnail = video.get('thumbnail_url') or ""
+        match = YOUTUBE_URL.fullmatch(url)
+        key = match.group(1) if match else ""
+        header['ids'].append(str(video['id']))
+        header['titles'].append(video.get('title') or "Unknown Title")
+        header['keys'].append(key)
+        if not match:
+            header['urls'][i] = url
+        if thumbnail != (THUMBNAIL_URL.format(key) if key else ""):
+            header['thumbnails'][i] = thumbnail
+
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    header_bytes += b' ' * (-(4 + len(header_bytes)) % 4)
+    values = {
+        'x': coords[rows, 0],
+        'y': coords[rows, 1],
+        'z': coords[rows, 2] if coords.shape[1] > 2 else np.zeros(len(rows)),
+        'channel': [channel_index[videos[r].get('channel_title') or "Unknown Channel"] for r in rows],
+        'year': [videos[r].get('year') or 0 for r in rows],
+        'cluster': clusters[rows],
+        'neighbors': neighbors[rows] if neighbors is not None else None,
+    }
+    parts = [np.uint32(len(header_bytes)).tobytes(), header_bytes]
+    parts += [np.asarray(values[column[0]], dtype=column[1]).tobytes() for column in columns]
+    return b''.join(parts)
+
+
+def write_galaxy(videos, coords, clusters, out_dir=GALAXY_DIR, chunk_points=CHUNK_POINTS):
+    """Writes the manifest and chunks for one layout. Returns the manifest."""
+    coords = np.asarray(coords, dtype=np.float32)
+    clusters = np.asarray(clusters, dtype=np.int64)
+    channels = sorted({v.get('channel_title') or "Unknown Channel" for v in videos})
+    channel_index = {c: i for i, c in enumerate(channels)}
+    columns = [('x', np.float32), ('y', np.float32), ('z', np.float32),
+               ('channel', column_dtype([len(channels) - 1], (np.uint16, np.uint32))),
+               ('year', np.uint16), ('cluster', column_dtype(clusters))]
+
+    overview = overview_rows(coords) if len(videos) > chunk_points else np.arange(len(videos))
+    rest = np.setdiff1d(np.arange(len(videos)), overview)
+    tiles = [overview] + spatial_tiles(coords, rest, chunk_points)
+    neighbors = neighbor_positions(videos, tiles)
+    if neighbors is not None:
+        columns.append(('neighbors', np.int32, neighbors.shape[1]))
+    columns.sort(key=lambda c: -np.dtype(c[1]).itemsize)
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name in os.listdir(out_dir):
+        if name.startswith('chunk-') and name.endswith('.bin'):
+            os.remove(os.path.join(out_dir, name))
+    chunks = []
+    for n, rows in enumerate(tiles):
+        name = f"chunk-{n}.bin"
+        with open(os.path.join(out_dir, name), 'wb') as f:
+            f.write(encode_chunk(rows, videos, coords, clusters, channel_index, columns, neighbors))
+        chunks.append({'file': name, 'count': int(len(rows)), 'level': 0 if n == 0 else 1, 'bounds': bounds(coords[rows])})
+
+    manifest = {
+        'version': FORMAT_VERSION,
+        'count': len(videos),
+        'dimensions': int(coords.shape[1]),
+        'bounds': bounds(coords),
+        'columns': [[name, np.dtype(dtype).name, *width] for name, dtype, *width in columns],
+        'channels': channels,
+        'url_template': 'https://www.youtube.com/watch?v={key}',
+        'thumbnail_template': THUMBNAIL_URL.format('{key}'),
+        'chunks': chunks,
+    }
+    tmp_path = os.path.join(out_dir, 'manifest.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, os.path.join(out_dir, 'manifest.json'))
+    return manifest
+
+
+def decode_chunk(data, manifest):
+    """
+    Inverse of encode_chunk: returns a list of video dicts in the old video-embeddings.json shape,
+    except that `neighbors` holds galaxy positions; read_galaxy resolves them to video ids.
+    """
+    header_len = int(np.frombuffer(data, dtype=np.uint32, count=1)[0])
+    header = json.loads(data[4:4 + header_len].decode('utf-8'))
+    n = len(header['ids'])
+    offset = 4 + header_len
+    cols = {}
+    for name, dtype, *width in manifest['columns']:
+        cols[name] = np.frombuffer(data, dtype=dtype, count=n * (width[0] if width else 1), offset=offset)
+        if width:
+            cols[name] = cols[name].reshape(n, width[0])
+        offset += cols[name].nbytes
+
+    items = []
+    for i in range(n):
+        key = header['keys'][i]
+        item = {
+            'id': header['ids'][i],
+            'title': header['titles'][i],
+            'url': header['urls'].get(str(i), manifest['url_template'].format(key=key) if key else ""),
+            'thumbnail_url': header['thumbnails'].get(str(i), manifest['thumbnail_template'].format(key=key) if key else ""),
+            'channel_title': manifest['channels'][cols['channel'][i]],
+            'year': int(cols['year'][i]) or None,
+            'x': float(cols['x'][i]),
+            'y': float(cols['y'][i]),
+        }
+        if manifest['dimensions'] > 2:
+            item['z'] = float(cols['z'][i])
+        item['cluster'] = int(cols['cluster'][i])
+        if 'neighbors' in cols:
+            item['neighbors'] = [int(p) for p in cols['neighbors'][i] if p >= 0]
+        items.append(item)
+    return items
+
+
+def read_galaxy(out_dir=GALAXY_DIR):
+    with open(os.path.join(out_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    items = []
+    for chunk in manifest['chunks']:
+        with open(os.path.join(out_dir, chunk['file']), 'rb') as f:
+            items.extend(decode_chunk(f.read(), manifest))
+    for item in items:
+        if 'neighbors' in item:
+            item['neighbors'] = [items[p]['id'] for p in item['neighbors']]
+    return items
+
+
+def from_items(items):
+    """Splits old-format video-embeddings.json items into (videos, coords, clusters)."""
+    dims = 'xyz' if all('z' in item for item in items) else 'xy'
+    coords = np.array([[item[axis] for axis in dims] for item in items], dtype=np.float32)
+    return items, coords, np.array([item['cluster'] for item in items], dtype=np.int64)
+
+
+def benchmark(json_path, repeats=5):
+    import tempfile
+
+    with open(json_path, 'rb') as f:
+        raw = f.read()
+    items = json.loads(raw)
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.time()
+        manifest = write_galaxy(*from_items(items), out_dir=tmp)
+        encode_time = time.time() - started
+        files = [os.path.join(tmp, 'manifest.json')] + [os.path.join(tmp, c['file']) for c in manifest['chunks']]
+        blobs = [open(path, 'rb').read() for path in files]
+
+        def best(fn):
+            timings = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                fn()
+                timings.append(time.perf_counter() - started)
+            return min(timings) * 1000
+
+        def parse_columnar():
+            m = json.loads(blobs[0])
+            for blob in blobs[1:]:
+                decode_chunk(blob, m)
+
+        compact = json.dumps(items, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        first_chunk = len(blobs[0]) + len(blobs[1])
+        print(f"{len(items)} videos, {len(manifest['channels'])} distinct channels, {len(manifest['chunks'])} chunks "
+              f"(overview {manifest['chunks'][0]['count']} points), encoded in {encode_time * 1000:.0f} ms")
+        print(f"{'payload':<34} {'bytes':>10} {'gzip':>10} {'parse ms':>9}")
+        print(f"{'video-embeddings.json (indent=2)':<34} {len(raw):>10} {len(gzip.compress(raw)):>10} {best(lambda: json.loads(raw)):>9.1f}")
+        print(f"{'video-embeddings.json (compact)':<34} {len(compact):>10} {len(gzip.compress(compact)):>10} {best(lambda: json.loads(compact)):>9.1f}")
+        total = sum(len(b) for b in blobs)
+        print(f"{'galaxy/ (manifest + chunks)':<34} {total:>10} {sum(len(gzip.compress(b)) for b in blobs):>10} {best(parse_columnar):>9.1f}")
+        print(f"{'galaxy/ first paint (overview)':<34} {first_chunk:>10} {len(gzip.compress(blobs[0])) + len(gzip.compress(blobs[1])):>10}")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == 'convert' and len(sys.argv) > 2:
+        with open(sys.argv[2], 'r', encoding='utf-8') as f:
+            items = json.load(f)
+        out_dir = sys.argv[3] if len(sys.argv) > 3 else GALAXY_DIR
+        manifest = write_galaxy(*from_items(items), out_dir=out_dir)
+        print(f"Wrote {manifest['count']} videos in {len(manifest['chunks'])} chunks to {out_dir}")
+    elif command == 'bench':
+        benchmark(sys.argv[2] if len(sys.argv) > 2 else os.path.join(DATA_DIR, 'video-embeddings.json'))
+    else:
+        print(__doc__.strip().split('\n\n')[1], file=sys.stderr)
+        sys.exit(1)
@@ -1,55 +1,195 @@
+"""
+Labels each galaxy cluster with a short topic name from Gemini, writing cluster_labels.json.
+
+    python generate_labels.py [--relabel] [--fake]
+
+Labels are cached in label_cache.json with each cluster's member ids and centroid. A cluster
+keeps its cached label while its membership overlaps the labelled membership by at least
+LABEL_REUSE_JACCARD and its centroid has not moved past LABEL_REUSE_COSINE, so only clusters
+that actually changed are sent to the LLM. Those requests run concurrently. Each prompt lists
+the titles nearest the cluster centroid, so a relabel of the same membership sees the same prompt.
+--fake labels with the offline FakeLabelClient instead of the API.
+"""
 import os
+import sys
 import json
-import random
-from google import genai
-from dotenv import load_dotenv
-
-load_dotenv()
-
-API_KEY = os.environ.get("GEMINI_API_KEY")
-if not API_KEY:
-    raise ValueError("Please set GEMINI_API_KEY")
-
-client = genai.Client()
-
-input_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'public', 'data', 'video-embeddings.json')
-output_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'public', 'data', 'cluster_labels.json')
-
-with open(input_path, 'r', encoding='utf-8') as f:
-    data = json.load(f)
-
-# Group by cluster
-clusters = {}
-for item in data:
-    c = item['cluster']
-    if c not in clusters:
-        clusters[c] = []
-    clusters[c].append(item['title'])
-
-labels = {}
-print("Generating labels using Gemini...", flush=True)
-
-for c, titles in clusters.items():
-    sample_size = min(60, len(titles))
-    sample_titles = random.sample(titles, sample_size)
-    
-    prompt = "Analyze the following list of YouTube video titles. They belong to a single semantic cluster. Provide a short, concise 1 to 3 word label that best describes the overall theme or topic of these videos. Respond ONLY with the label, nothing else.\n\nTitles:\n"
-    for t in sample_titles:
-        prompt += f"- {t}\n"
-    
-    try:
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt
-        )
-        label = response.text.strip().replace('"', '')
-        print(f"Cluster {c}: {label}", flush=True)
-        labels[str(c)] = label
-    except Exception as e:
-        print(f"Error for cluster {c}: {e}")
-        labels[str(c)] = f"Cluster {c}"
-
-with open(output_path, 'w', encoding='utf-8') as f:
-    json.dump(labels, f, indent=2, ensure_ascii=False)
-
-print(f"Successfully saved labels to {output_path}", flush=True)
+import time
+import asyncio
+import hashlib
+
+import numpy as np
+
+from rate_limit import backoff_delay
+from embedding_cache import open_cache, normalize_text, select_videos
+from embedding_pipeline import EMBEDDING_MODEL, error_status
+from embedding_store import DATA_DIR
+from galaxy_format import GALAXY_DIR, read_galaxy
+from raw_videos import load_videos
+
+LABEL_MODEL = os.environ.get("LABEL_MODEL", 'gemini-2.5-flash')
+LABEL_CONCURRENCY = int(os.environ.get("LABEL_CONCURRENCY", "8"))
+LABEL_REUSE_JACCARD = float(os.environ.get("LABEL_REUSE_JACCARD", "0.8"))
+LABEL_REUSE_COSINE = float(os.environ.get("LABEL_REUSE_COSINE", "0.97"))
+SAMPLE_SIZE = 60
+MAX_ATTEMPTS = 5
+
+OUTPUT_PATH = os.path.join(DATA_DIR, 'cluster_labels.json')
+CACHE_PATH = os.path.join(DATA_DIR, 'label_cache.json')
+
+PROMPT = ("Analyze the following list of YouTube video titles. They belong to a single semantic cluster. "
+          "Provide a short, concise 1 to 3 word label that best describes the overall theme or topic of these videos. "
+          "Respond ONLY with the label, nothing else.\n\nTitles:\n")
+
+
+def membership_hash(member_ids):
+    return hashlib.sha256('\n'.join(sorted(member_ids)).encode('utf-8')).hexdigest()[:16]
+
+
+def jaccard(a, b):
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def representative_titles(titles, vectors, centroid, n=SAMPLE_SIZE):
+    """Distinct titles nearest the centroid by cosine, ties broken by title so the order is deterministic."""
+    norms = np.maximum(np.linalg.norm(vectors, axis=1), 1e-12)
+    sims = vectors @ centroid / (norms * max(np.linalg.norm(centroid), 1e-12))
+    chosen = []
+    seen = set()
+    for i in sorted(range(len(titles)), key=lambda i: (-round(float(sims[i]), 6), titles[i])):
+        key = normalize_text(titles[i])
+        if key not in seen:
+            seen.add(key)
+            chosen.append(titles[i])
+            if len(chosen) == n:
+                break
+    return chosen
+
+
+def load_clusters(galaxy_dir=GALAXY_DIR):
+    """
+    Returns {cluster id: {'ids', 'titles', 'vectors', 'centroid'}} from the galaxy layout and the
+    embedding cache. Videos whose embedding is no longer cached are left out of the centroid.
+    """
+    data = read_galaxy(galaxy_dir)
+    videos = load_videos()
+    cache = open_cache(EMBEDDING_MODEL, videos)
+    valid_videos, _, embeddings = select_videos(cache, videos)
+    row_by_id = {str(v['id']): i for i, v in enumerate(valid_videos)}
+
+    clusters = {}
+    for item in data:
+        if item['id'] in row_by_id:
+            cluster = clusters.setdefault(str(item['cluster']), {'ids': [], 'titles': [], 'rows': []})
+            cluster['ids'].append(item['id'])
+            cluster['titles'].append(item['title'])
+            cluster['rows'].append(row_by_id[item['id']])
+    for cluster in clusters.values():
+        cluster['vectors'] = np.asarray(embeddings[cluster.pop('rows')], dtype=np.float32)
+        cluster['centroid'] = cluster['vectors'].mean(axis=0)
+    return clusters
+
+
+def load_cache(path=CACHE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        cache = json.load(f)
+    return cache if cache.get('model') == LABEL_MODEL else {}
+
+
+def save_cache(cache, path=CACHE_PATH):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def cached_label(entry, cluster):
+    """Returns the cached label if the cluster has not changed meaningfully since it was labelled."""
+    if not entry:
+        return None
+    if entry['hash'] == membership_hash(cluster['ids']):
+        return entry['label']
+    centroid = np.asarray(entry['centroid'], dtype=np.float32)
+    cosine = float(centroid @ cluster['centroid']) / max(np.linalg.norm(centroid) * np.linalg.norm(cluster['centroid']), 1e-12)
+    if jaccard(entry['ids'], cluster['ids']) >= LABEL_REUSE_JACCARD and cosine >= LABEL_REUSE_COSINE:
+        return entry['label']
+    return None
+
+
+async def request_label(client, semaphore, cluster_id, titles):
+    prompt = PROMPT + ''.join(f"- {t}\n" for t in titles)
+    for attempt in range(MAX_ATTEMPTS):
+        async with semaphore:
+            try:
+                response = await client.aio.models.generate_content(model=LABEL_MODEL, contents=prompt)
+                return response.text.strip().replace('"', '')
+            except Exception as e:
+                status = error_status(e)
+                if attempt == MAX_ATTEMPTS - 1 or not (status == 429 or (status is not None and status >= 500)):
+                    print(f"Error for cluster {cluster_id}: {e}", flush=True)
+                    return None
+        await asyncio.sleep(backoff_delay(attempt))
+
+
+async def request_labels(client, prompts, concurrency=LABEL_CONCURRENCY):
+    """Labels {cluster id: titles} concurrently; returns {cluster id: label or None}."""
+    semaphore = asyncio.Semaphore(concurrency)
+    labels = await asyncio.gather(*(request_label(client, semaphore, c, titles) for c, titles in prompts.items()))
+    return dict(zip(prompts, labels))
+
+
+def generate_labels(client, clusters, relabel=False, cache_path=CACHE_PATH, output_path=OUTPUT_PATH):
+    """Writes cluster_labels.json, relabelling only the clusters that changed. Returns (reused, relabelled)."""
+    cache = load_cache(cache_path)
+    entries = cache.get('clusters', {})
+    labels = {}
+    prompts = {}
+    for c, cluster in clusters.items():
+        label = None if relabel else cached_label(entries.get(c), cluster)
+        if label is not None:
+            labels[c] = label
+        else:
+            prompts[c] = representative_titles(cluster['titles'], cluster['vectors'], cluster['centroid'])
+
+    if prompts:
+        started = time.time()
+        print(f"Labelling {len(prompts)} changed clusters with {LABEL_MODEL} ({len(labels)} reused from cache)...", flush=True)
+        for c, label in asyncio.run(request_labels(client, prompts)).items():
+            if label:
+                print(f"Cluster {c}: {label}", flush=True)
+                labels[c] = label
+                entries[c] = {
+                    'label': label,
+                    'hash': membership_hash(clusters[c]['ids']),
+                    'ids': clusters[c]['ids'],
+                    'centroid': [round(float(v), 6) for v in clusters[c]['centroid']],
+                }
+            else:
+                # Not cached, so the next run tries this cluster again
+                labels[c] = f"Cluster {c}"
+        print(f"Labelled in {time.time() - started:.1f}s.", flush=True)
+    else:
+        print(f"All {len(labels)} cluster labels reused from cache.", flush=True)
+
+    save_cache({'model': LABEL_MODEL, 'clusters': {c: e for c, e in entries.items() if c in clusters}}, cache_path)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(sorted(labels.items(), key=lambda kv: int(kv[0]))), f, indent=2, ensure_ascii=False)
+    print(f"Successfully saved labels to {output_path}", flush=True)
+    return len(clusters) - len(prompts), len(prompts)
+
+
+if __name__ == "__main__":
+    if '--fake' in sys.argv:
+        from fake_clients import FakeLabelClient
+        client = FakeLabelClient()
+    else:
+        from google import genai
+        from dotenv import load_dotenv
+        load_dotenv()
+        if not os.environ.get("GEMINI_API_KEY"):
+            raise ValueError("Please set GEMINI_API_KEY")
+        client = genai.Client()
+
+    generate_labels(client, load_clusters(), relabel='--relabel' in sys.argv)
@@ -0,0 +1,212 @@
+import os
+import time
+from collections import namedtuple
+
+import joblib
+import numpy as np
+import umap
+from umap.umap_ import nearest_neighbors
+
+from clustering import ClusterModel, config_from_env
+from embedding_store import DATA_DIR
+from galaxy_format import GALAXY_DIR, write_galaxy
+
+STATE_PATH = os.path.join(DATA_DIR, 'projection_state', 'projection.joblib')
+# Refit from scratch once new points since the last fit exceed this fraction of the fitted corpus
+REFIT_NEW_FRACTION = float(os.environ.get("PROJECTION_REFIT_FRACTION", "0.2"))
+# ...or once new points sit this many times further from their nearest cluster centre than the fitted ones did
+REFIT_DRIFT_RATIO = float(os.environ.get("PROJECTION_REFIT_DRIFT", "1.5"))
+
+Layout = namedtuple('Layout', ['name', 'n_components', 'n_neighbors', 'min_dist'])
+
+# The first layout is the one the galaxy page reads from the galaxy directory
+DEFAULT_LAYOUTS = [
+    Layout('3d', 3, 15, 0.1),
+    Layout('2d', 2, 15, 0.1),
+]
+
+
+def parse_layout(spec):
+    """Parses a --layout name:n_components:n_neighbors:min_dist argument."""
+    name, n_components, n_neighbors, min_dist = spec.split(':')
+    return Layout(name, int(n_components), int(n_neighbors), float(min_dist))
+
+
+def layouts_from_argv(argv):
+    extra = [parse_layout(argv[i + 1]) for i, arg in enumerate(argv[:-1]) if arg == '--layout']
+    return DEFAULT_LAYOUTS + [l for l in extra if l.name not in {d.name for d in DEFAULT_LAYOUTS}]
+
+
+def centroid_distances(clusterer, embeddings):
+    return clusterer.transform(embeddings).min(axis=1)
+
+
+class ProjectionEngine:
+    """
+    Produces every UMAP layout (2D, 3D and any n_neighbors/min_dist variants) plus the cluster
+    colouring (see clustering.py) from one embedding matrix, and persists them between runs.
+
+    The nearest-neighbour graph is the expensive part of UMAP and depends only on the data
+    and metric, so it is computed once at the largest n_neighbors any layout needs and handed
+    to every fit through precomputed_knn; UMAP trims it for layouts that use fewer neighbours.
+
+    Videos already in the layouts keep their coordinates and cluster. New videos (or videos
+    whose title, and so embedding key, changed) are placed with each reducer's transform()
+    and the cluster model's predict(). Everything is refit only when the new points since the
+    last fit pass REFIT_NEW_FRACTION of the fitted corpus, or drift from the fitted clusters by
+    more than REFIT_DRIFT_RATIO. A layout that was added or whose parameters changed is fit on
+    its own against the shared graph, and a changed clustering configuration only reclusters.
+    Refits keep cluster ids matched to the previous run's.
+    """
+
+    def __init__(self, layouts=DEFAULT_LAYOUTS, state_path=STATE_PATH, cluster_config=None):
+        self.layouts = list(layouts)
+        self.cluster_config = cluster_config or config_from_env()
+        self.state_path = state_path
+        self.state = joblib.load(state_path) if os.path.exists(state_path) else None
+        self._knn = None
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = self.state_path + '.tmp'
+        joblib.dump(self.state, tmp_path)
+        os.replace(tmp_path, self.state_path)
+
+    def _refit_reason(self, embeddings, new_idx):
+        state = self.state
+        if state is None:
+            return "no saved state"
+        if state['dim'] != embeddings.shape[1]:
+            return f"embedding dimension changed ({state['dim']} -> {embeddings.shape[1]})"
+        if not len(new_idx) or state.get('cluster_config') != self.cluster_config:
+            return None
+        new_since_fit = state['new_since_fit'] + len(new_idx)
+        if new_since_fit > REFIT_NEW_FRACTION * state['fitted_count']:
+            return f"{new_since_fit} new points since last fit (> {REFIT_NEW_FRACTION:.0%} of {state['fitted_count']})"
+        drift = centroid_distances(state['clusterer'], embeddings[new_idx]).mean() / state['baseline_distance']
+        if drift > REFIT_DRIFT_RATIO:
+            return f"new points drifted {drift:.2f}x from fitted clusters"
+        return None
+
+    def _knn_graph(self, embeddings):
+        if self._knn is None:
+            k = max(layout.n_neighbors for layout in self.layouts)
+            started = time.time()
+            self._knn = nearest_neighbors(embeddings, n_neighbors=k, metric='cosine', metric_kwds={},
+                                          angular=False, random_state=np.random.RandomState(42))
+            print(f"Built shared {k}-NN graph in {time.time() - started:.1f}s.", flush=True)
+        return self._knn
+
+    def _fit_layout(self, layout, embeddings):
+        started = time.time()
+        reducer = umap.UMAP(n_neighbors=layout.n_neighbors, min_dist=layout.min_dist, n_components=layout.n_components,
+                            metric='cosine', random_state=42, precomputed_knn=self._knn_graph(embeddings))
+        coords = reducer.fit_transform(embeddings)
+        print(f"[{layout.name}] UMAP fit in {time.time() - started:.1f}s.", flush=True)
+        return reducer, coords
+
+    def _previous_clusters(self, ids, entries):
+        return np.array([entries[vid][2] if vid in entries else -1 for vid in ids], dtype=np.int64)
+
+    def _cluster(self, ids, entries, embeddings):
+        clusterer = ClusterModel(self.cluster_config)
+        clusters = clusterer.fit_predict(embeddings, previous=self._previous_clusters(ids, entries))
+        return clusterer, clusters
+
+    def _full_fit(self, ids, keys, embeddings, entries):
+        clusterer, clusters = self._cluster(ids, entries, embeddings)
+        reducers = {}
+        coords = {}
+        for layout in self.layouts:
+            reducers[layout.name], coords[layout.name] = self._fit_layout(layout, embeddings)
+        self.state = {
+            'dim': embeddings.shape[1],
+            'clusterer': clusterer,
+            'cluster_config': self.cluster_config,
+            'layouts': {layout.name: layout for layout in self.layouts},
+            'reducers': reducers,
+            'fitted_count': len(ids),
+            'new_since_fit': 0,
+            'baseline_distance': float(centroid_distances(clusterer, embeddings).mean()),
+        }
+        return coords, clusters
+
+    def project(self, ids, keys, embeddings, force_refit=False):
+        """
+        Returns ({layout name: coords}, clusters) for the given video ids, embedding cache keys
+        and embedding matrix (rows aligned with ids), updating and saving the persisted state.
+        """
+        ids = [str(i) for i in ids]
+        entries = self.state['entries'] if self.state else {}
+        new_idx = np.array([i for i, (vid, key) in enumerate(zip(ids, keys))
+                            if entries.get(vid, (None,))[0] != key], dtype=np.int64)
+
+        reason = "refit requested" if force_refit else self._refit_reason(embeddings, new_idx)
+        started = time.time()
+        if reason:
+            print(f"Full projection fit on {len(ids)} points for layouts {[l.name for l in self.layouts]} ({reason})...", flush=True)
+            coords, clusters = self._full_fit(ids, keys, embeddings, entries)
+        else:
+            is_new = np.zeros(len(ids), dtype=bool)
+            is_new[new_idx] = True
+            old_idx = np.flatnonzero(~is_new)
+            recluster = self.state.get('cluster_config') != self.cluster_config
+            if recluster:
+                # Also covers state saved before the clustering stage was configurable
+                print(f"Clustering configuration changed to {self.cluster_config}; reclustering.", flush=True)
+                self.state['clusterer'], clusters = self._cluster(ids, entries, embeddings)
+                self.state['cluster_config'] = self.cluster_config
+                self.state['baseline_distance'] = float(centroid_distances(self.state['clusterer'], embeddings).mean())
+                self.state.pop('kmeans', None)
+            else:
+                clusters = np.empty(len(ids), dtype=np.int64)
+                clusters[old_idx] = [entries[ids[i]][2] for i in old_idx]
+            if len(new_idx):
+                print(f"Projecting {len(new_idx)} new points onto the existing layouts...", flush=True)
+                new_embeddings = np.asarray(embeddings[new_idx])
+                if not recluster:
+                    clusters[new_idx] = self.state['clusterer'].predict(new_embeddings)
+                self.state['new_since_fit'] += len(new_idx)
+
+            coords = {}
+            for layout in self.layouts:
+                if self.state['layouts'].get(layout.name) != layout:
+                    print(f"[{layout.name}] Layout is new or its parameters changed; fitting it on its own.", flush=True)
+                    self.state['reducers'][layout.name], coords[layout.name] = self._fit_layout(layout, embeddings)
+                    self.state['layouts'][layout.name] = layout
+                    continue
+                layout_coords = np.empty((len(ids), layout.n_components), dtype=np.float32)
+                layout_coords[old_idx] = [entries[ids[i]][1][layout.name] for i in old_idx]
+                if len(new_idx):
+                    layout_coords[new_idx] = self.state['reducers'][layout.name].transform(new_embeddings)
+                coords[layout.name] = layout_coords
+
+        # Rebuilding entries also forgets videos that were removed from the corpus, and layouts
+        # not requested this run, which are refit from scratch if they are asked for again
+        self.state['layouts'] = {layout.name: layout for layout in self.layouts}
+        self.state['reducers'] = {layout.name: self.state['reducers'][layout.name] for layout in self.layouts}
+        self.state['entries'] = {
+            vid: (key, {name: layout_coords[i] for name, layout_coords in coords.items()}, int(clusters[i]))
+            for i, (vid, key) in enumerate(zip(ids, keys))
+        }
+        self._save()
+        print(f"Layouts ready in {time.time() - started:.1f}s ({len(new_idx)} new, {len(ids) - len(new_idx)} unchanged).", flush=True)
+        return coords, clusters
+
+
+def run_projection(videos, keys, embeddings, layouts=DEFAULT_LAYOUTS, force_refit=False, output_dir=GALAXY_DIR):
+    """
+    Projects the corpus into every layout and writes one galaxy directory per layout (see
+    galaxy_format.py): the first layout to output_dir, the others alongside it as galaxy-<name>.
+    """
+    engine = ProjectionEngine(layouts)
+    coords, clusters = engine.project([v['id'] for v in videos], keys, embeddings, force_refit=force_refit)
+
+    print("Formatting data...", flush=True)
+    for i, layout in enumerate(layouts):
+        out_dir = output_dir if i == 0 else f"{output_dir}-{layout.name}"
+        manifest = write_galaxy(videos, coords[layout.name], clusters, out_dir=out_dir)
+        size = sum(os.path.getsize(os.path.join(out_dir, name)) for name in os.listdir(out_dir))
+        print(f"Saved {layout.name} layout for {manifest['count']} videos to {out_dir} "
+              f"({len(manifest['chunks'])} chunks, {size / 1e6:.2f} MB)", flush=True)
+    return coords, clusters
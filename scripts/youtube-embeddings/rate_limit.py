@@ -0,0 +1,96 @@
+import time
+import random
+import asyncio
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket: `rate` tokens per second, holding at most `capacity` (one second's
+    worth of tokens by default, rescaled whenever the rate changes).
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.fixed_capacity = capacity is not None
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_rate(self, rate):
+        self._refill(time.monotonic())
+        self.rate = float(rate)
+        if not self.fixed_capacity:
+            self.capacity = max(1.0, self.rate)
+            self.tokens = min(self.tokens, self.capacity)
+
+    def pause(self, seconds):
+        """Stops handing out tokens for `seconds`, e.g. to honour a Retry-After header."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    async def acquire(self, tokens=1.0):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+class AimdLimiter:
+    """
+    Additive-increase / multiplicative-decrease concurrency limit.
+
+    The limit grows by one after a full window of successes at the current limit and is
+    multiplied by `decrease` on throttling, at most once per `cooldown` seconds so a burst
+    of 429s from requests already in flight only counts as one congestion signal.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32, decrease=0.5, cooldown=1.0):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self._successes = 0
+        self._last_decrease = 0.0
+
+    def on_success(self):
+        self._successes += 1
+        if self._successes >= self.limit:
+            self._successes = 0
+            self.limit = min(self.maximum, self.limit + 1)
+
+    def on_throttle(self):
+        """Returns True if this signal caused a decrease (i.e. it was outside the cooldown)."""
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return False
+        self._last_decrease = now
+        self._successes = 0
+        self.limit = max(self.minimum, int(self.limit * self.decrease))
+        return True
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
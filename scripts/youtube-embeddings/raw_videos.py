@@ -0,0 +1,43 @@
+"""
+The liked-videos export every stage reads: raw_videos.jsonl, one video per line, plus
+raw_videos.state.json holding the updated_at watermark of the last export.
+"""
+import os
+import json
+
+from embedding_store import DATA_DIR
+
+RAW_VIDEOS_PATH = os.path.join(DATA_DIR, 'raw_videos.jsonl')
+STATE_PATH = os.path.join(DATA_DIR, 'raw_videos.state.json')
+# Written by download_videos.py before the export moved to JSON Lines
+LEGACY_PATH = os.path.join(DATA_DIR, 'raw_videos.json')
+
+
+def iter_videos(path=RAW_VIDEOS_PATH):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def load_videos(path=RAW_VIDEOS_PATH):
+    if not os.path.exists(path) and os.path.exists(LEGACY_PATH):
+        with open(LEGACY_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Input file {path} not found. Run download_videos.py first.")
+    return list(iter_videos(path))
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_PATH):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
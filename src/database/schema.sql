@@ -10,9 +10,15 @@ CREATE TABLE IF NOT EXISTS liked_videos (
     video_owner_channel_title TEXT,
     published_at TIMESTAMP WITH TIME ZONE,
     thumbnail_url TEXT,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP, -- Watermark for incremental exports (scripts/youtube-embeddings/download_videos.py)
+    content_hash TEXT -- Fingerprint of the synced columns; unchanged rows are skipped (scripts/os-bookmarks/curated_db_update.py)
 );
 
+ALTER TABLE liked_videos ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE liked_videos ADD COLUMN IF NOT EXISTS content_hash TEXT;
+CREATE INDEX IF NOT EXISTS idx_liked_videos_updated_at ON liked_videos (updated_at);
+
 -- Table: github_stars
 CREATE TABLE IF NOT EXISTS github_stars (
     repo_id BIGINT PRIMARY KEY,
@@ -27,9 +33,12 @@ CREATE TABLE IF NOT EXISTS github_stars (
     owner_avatar_url TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     starred_at TIMESTAMP WITH TIME ZONE,
-    star_list_names TEXT[]
+    star_list_names TEXT[],
+    content_hash TEXT -- Fingerprint of the synced columns except star_list_names (scripts/os-bookmarks/curated_db_update.py)
 );
 
+ALTER TABLE github_stars ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
 -- Table: chrome_bookmarks
 CREATE TABLE IF NOT EXISTS chrome_bookmarks (
     id SERIAL PRIMARY KEY,
@@ -39,11 +48,22 @@ CREATE TABLE IF NOT EXISTS chrome_bookmarks (
     date_added BIGINT,
     parent_id INTEGER REFERENCES chrome_bookmarks(id) ON DELETE CASCADE,
     source TEXT,
-    path TEXT UNIQUE,
+    path TEXT,
     parent_path TEXT,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    content_hash TEXT, -- Fingerprint of the synced columns; unchanged rows are skipped (scripts/os-bookmarks/get_chrome_bookmarks.py)
+    guid TEXT UNIQUE, -- Chrome's stable node guid, the sync key; path is derived and may repeat for same-named siblings
+    profile TEXT -- Browser profile the node was read from, e.g. 'google-chrome/Default'; the first one found for nodes in several
 );
 
+ALTER TABLE chrome_bookmarks ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE chrome_bookmarks ADD COLUMN IF NOT EXISTS guid TEXT;
+ALTER TABLE chrome_bookmarks ADD COLUMN IF NOT EXISTS profile TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS chrome_bookmarks_guid_key ON chrome_bookmarks (guid);
+ALTER TABLE chrome_bookmarks DROP CONSTRAINT IF EXISTS chrome_bookmarks_path_key;
+CREATE INDEX IF NOT EXISTS idx_chrome_bookmarks_path ON chrome_bookmarks (path);
+CREATE INDEX IF NOT EXISTS idx_chrome_bookmarks_parent_id ON chrome_bookmarks (parent_id);
+
 -- Table: x_tweets
 CREATE TABLE IF NOT EXISTS x_tweets (
     id TEXT PRIMARY KEY,
@@ -64,9 +84,21 @@ CREATE TABLE IF NOT EXISTS x_tweets (
     entities JSONB DEFAULT '{}',
     synced_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     id_num BIGINT GENERATED ALWAYS AS (id::bigint) STORED,
+    content_hash TEXT, -- Fingerprint of the synced columns except the is_* flags (scripts/os-bookmarks/curated_db_update.py)
     CONSTRAINT valid_type CHECK (is_bookmark = TRUE OR is_like = TRUE OR is_retweet = TRUE)
 );
 
+ALTER TABLE x_tweets ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- Table: sync_state
+-- Per-source cursors for incremental syncs (watermarks, ETags, last full pass) (scripts/os-bookmarks/db_sync.py),
+-- and under key 'deploy' the pending Vercel build batch shared by all sync runs (scripts/os-bookmarks/deploy_hook.py)
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value JSONB NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Table: reading_list
 CREATE TABLE IF NOT EXISTS reading_list (
     id SERIAL PRIMARY KEY,